@@ -0,0 +1,270 @@
+"""
+Pushing notes and audio straight into a running Anki through the AnkiConnect add-on
+(https://foosoft.net/projects/anki-connect/), instead of writing an .apkg to import.
+
+The note type and deck are created if missing. Notes the collection already has
+(of the ankify note types, compared like `KnownNotesIndex` does) are skipped, audio
+files it already has under the same content-hash name (see `media_file_name`) are
+not uploaded again. The remaining media files are uploaded concurrently, then the
+notes are added in batches of `addNotes` calls.
+"""
+
+import base64
+import json
+import urllib.error
+import urllib.request
+from collections.abc import Collection, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from ..logging import get_logger
+from ..settings import NoteType
+from ..vocab_entry import VocabEntry
+from .anki_deck_creator import AnkiDeckCreator
+from .known_notes import KnownNotesIndex, normalized_key
+
+_logger = get_logger("ankify.anki.anki_connect")
+
+# the API version of AnkiConnect this client speaks
+_API_VERSION = 6
+
+# names of the audio files ankify writes, see `media_file_name`
+_MEDIA_PATTERN = "ankify-*"
+
+
+class AnkiConnectError(RuntimeError):
+    pass
+
+
+def _batched(items: list, size: int) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class AnkiConnectClient:
+    def __init__(
+        self,
+        url: str = "http://127.0.0.1:8765",
+        api_key: str | None = None,
+        timeout: float = 30,
+    ) -> None:
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def invoke(self, action: str, **params: Any) -> Any:
+        """Result of an AnkiConnect action. Raises AnkiConnectError on errors."""
+        request: dict[str, Any] = {
+            "action": action,
+            "version": _API_VERSION,
+            "params": params,
+        }
+        if self.api_key:
+            request["key"] = self.api_key
+        http_request = urllib.request.Request(
+            self.url,
+            data=json.dumps(request).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+                answer = json.loads(response.read())
+        except (urllib.error.URLError, OSError) as e:
+            raise AnkiConnectError(
+                f"Cannot reach AnkiConnect at {self.url} "
+                f"(is Anki running with the AnkiConnect add-on?): {e}"
+            ) from e
+        return self._result(action, answer)
+
+    def multi(self, actions: list[tuple[str, dict[str, Any]]]) -> list[Any]:
+        """Results of several actions, sent in one request."""
+        answers = self.invoke(
+            "multi",
+            actions=[
+                {"action": action, "version": _API_VERSION, "params": params}
+                for action, params in actions
+            ],
+        )
+        return [
+            self._result(action, answer)
+            for (action, _), answer in zip(actions, answers, strict=True)
+        ]
+
+    @staticmethod
+    def _result(action: str, answer: Any) -> Any:
+        if not isinstance(answer, dict) or set(answer) != {"result", "error"}:
+            raise AnkiConnectError(f"Unexpected AnkiConnect answer to '{action}'")
+        if answer["error"] is not None:
+            raise AnkiConnectError(f"AnkiConnect '{action}' failed: {answer['error']}")
+        return answer["result"]
+
+
+@dataclass
+class AnkiConnectPushResult:
+    added: int = 0
+    # notes the collection already had
+    skipped: int = 0
+    # notes Anki refused, e.g. with an empty front
+    failed: int = 0
+    media_uploaded: int = 0
+
+
+class AnkiConnectDeckWriter:
+    def __init__(
+        self,
+        client: AnkiConnectClient,
+        deck_name: str,
+        note_type: NoteType,
+        batch_size: int = 500,
+        max_workers: int = 8,
+    ) -> None:
+        """
+        batch_size: notes per `addNotes` and `notesInfo` request
+        max_workers: concurrent media uploads
+        """
+        self.client = client
+        self.deck_name = deck_name
+        self.note_type = note_type
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.model = AnkiDeckCreator(None, deck_name, note_type).anki_note_model
+        self.field_names = [f["name"] for f in self.model.fields]
+        self._known: KnownNotesIndex | None = None
+        self._media: set[str] = set()
+
+    @property
+    def existing_media(self) -> Collection[str]:
+        """Names of the ankify audio files in the collection."""
+        self._prepare()
+        return self._media
+
+    def new_entries(self, vocab: list[VocabEntry]) -> list[VocabEntry]:
+        """The entries that are not in the collection yet, without duplicates."""
+        self._prepare()
+        seen = KnownNotesIndex(self._known.keys)
+        new = []
+        for entry in vocab:
+            if entry not in seen:
+                seen.add(entry)
+                new.append(entry)
+        return new
+
+    def push(self, vocab: list[VocabEntry]) -> AnkiConnectPushResult:
+        """Add the notes of `vocab` that are new, with their audio, to the deck."""
+        new = self.new_entries(vocab)
+        result = AnkiConnectPushResult(skipped=len(vocab) - len(new))
+        result.media_uploaded = self._upload_media(new)
+
+        for batch in _batched(new, self.batch_size):
+            note_ids = self.client.invoke(
+                "addNotes", notes=[self._note(entry) for entry in batch]
+            )
+            for entry, note_id in zip(batch, note_ids, strict=True):
+                if note_id is None:
+                    result.failed += 1
+                    continue
+                result.added += 1
+                self._known.add(entry)
+
+        _logger.info(
+            "Pushed %d notes and %d media files to the deck '%s' "
+            "(%d already in Anki, %d failed)",
+            result.added,
+            result.media_uploaded,
+            self.deck_name,
+            result.skipped,
+            result.failed,
+        )
+        return result
+
+    def _prepare(self) -> None:
+        """Look up the collection once, creating the note type and deck if missing."""
+        if self._known is not None:
+            return
+        version, model_names, _, media_names, note_ids = self.client.multi(
+            [
+                ("version", {}),
+                ("modelNames", {}),
+                ("createDeck", {"deck": self.deck_name}),
+                ("getMediaFilesNames", {"pattern": _MEDIA_PATTERN}),
+                ("findNotes", {"query": f'"note:{self.model.name}"'}),
+            ]
+        )
+        if version < _API_VERSION:
+            raise AnkiConnectError(
+                f"AnkiConnect API version {version} is too old, {_API_VERSION} needed"
+            )
+        if self.model.name not in model_names:
+            self._create_model()
+        self._media = set(media_names)
+
+        known = KnownNotesIndex()
+        for batch in _batched(note_ids, self.batch_size):
+            for note in self.client.invoke("notesInfo", notes=batch):
+                fields = note.get("fields", {})
+                values = [
+                    fields.get(name, {}).get("value", "") for name in self.field_names
+                ]
+                known.keys.add(normalized_key(*values[:4]))
+        self._known = known
+        _logger.info(
+            "Anki has %d '%s' notes and %d ankify media files",
+            len(known),
+            self.model.name,
+            len(self._media),
+        )
+
+    def _create_model(self) -> None:
+        _logger.info("Creating the note type '%s' in Anki", self.model.name)
+        self.client.invoke(
+            "createModel",
+            modelName=self.model.name,
+            inOrderFields=self.field_names,
+            css=self.model.css,
+            isCloze=False,
+            cardTemplates=[
+                {
+                    "Name": template["name"],
+                    "Front": template["qfmt"],
+                    "Back": template["afmt"],
+                }
+                for template in self.model.templates
+            ],
+        )
+
+    def _upload_media(self, vocab: list[VocabEntry]) -> int:
+        paths = {
+            Path(path).name: Path(path)
+            for entry in vocab
+            for path in (entry.front_audio, entry.back_audio)
+            if path is not None
+        }
+        uploads = [
+            path for name, path in sorted(paths.items()) if name not in self._media
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            stored = list(executor.map(self._store_media_file, uploads))
+        self._media.update(stored)
+        return len(stored)
+
+    def _store_media_file(self, path: Path) -> str:
+        return self.client.invoke(
+            "storeMediaFile",
+            filename=path.name,
+            data=base64.b64encode(path.read_bytes()).decode("ascii"),
+        )
+
+    def _note(self, entry: VocabEntry) -> dict[str, Any]:
+        return {
+            "deckName": self.deck_name,
+            "modelName": self.model.name,
+            "fields": dict(
+                zip(self.field_names, AnkiDeckCreator._note_fields(entry), strict=True)
+            ),
+            # duplicates are found by front, back and languages before, Anki's own
+            # check only compares the first field
+            "options": {"allowDuplicate": True},
+            "tags": [],
+        }
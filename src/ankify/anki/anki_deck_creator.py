@@ -1,61 +1,330 @@
+import glob
 import hashlib
+import os
+import re
 import secrets
 import genanki
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from importlib import resources
+from collections.abc import Collection
+from typing import BinaryIO
 
 from ..vocab_entry import VocabEntry
 from ..logging import get_logger
-from ..settings import NoteType
+from ..settings import AnkiPackageFormat, AnkiWriter, NoteType
+from .anki_package_merger import ExistingAnkiPackage, MergedAnkiPackage
+from .sqlite_anki_package import SQLiteAnkiPackage
+
+
+def shard_path(output_file: Path, index: int) -> Path:
+    """Package file of the `index`-th (1-based) shard: `deck.apkg` -> `deck.part1.apkg`."""
+    output_file = Path(output_file)
+    return output_file.with_name(f"{output_file.stem}.part{index}{output_file.suffix}")
+
+
+def deck_files(output_file: Path) -> list[Path]:
+    """The existing package files of a deck: `output_file` and its shards, in order."""
+    output_file = Path(output_file)
+    shard_name = re.compile(
+        rf"{re.escape(output_file.stem)}\.part([1-9][0-9]*){re.escape(output_file.suffix)}"
+    )
+    shards = {}
+    for path in output_file.parent.glob(
+        f"{glob.escape(output_file.stem)}.part*{glob.escape(output_file.suffix)}"
+    ):
+        match = shard_name.fullmatch(path.name)
+        if match and path.is_file():
+            shards[int(match.group(1))] = path
+    files = [output_file] if output_file.is_file() else []
+    return files + [shards[index] for index in sorted(shards)]
+
+
+def shard_vocabulary(
+    vocab: list[VocabEntry],
+    max_notes: int | None = None,
+    max_bytes: int | None = None,
+) -> list[list[VocabEntry]]:
+    """
+    Split the vocabulary, in order, into shards of at most `max_notes` notes and
+    about `max_bytes` of media and text. Audio shared by several notes counts once
+    per shard. A note that alone exceeds the byte budget gets a shard of its own.
+    """
+    shards: list[list[VocabEntry]] = []
+    shard: list[VocabEntry] = []
+    shard_media: set[Path] = set()
+    shard_bytes = 0
+    for entry in vocab:
+        entry_bytes = _entry_size(entry, shard_media)
+        if shard and (
+            (max_notes is not None and len(shard) >= max_notes)
+            or (max_bytes is not None and shard_bytes + entry_bytes > max_bytes)
+        ):
+            shards.append(shard)
+            shard, shard_media, shard_bytes = [], set(), 0
+            entry_bytes = _entry_size(entry, shard_media)
+        shard.append(entry)
+        shard_media.update(p for p in (entry.front_audio, entry.back_audio) if p)
+        shard_bytes += entry_bytes
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def _entry_size(entry: VocabEntry, known_media: set[Path]) -> int:
+    """Bytes the note adds to a package that already has `known_media`."""
+    size = len(entry.front.encode("utf-8")) + len(entry.back.encode("utf-8"))
+    media = {entry.front_audio, entry.back_audio} - known_media - {None}
+    return size + sum(_file_size(path) for path in media)
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return Path(path).stat().st_size
+    except OSError:
+        return 0
+
+
+def _write_shard(
+    output_file: Path,
+    deck_name: str,
+    note_type: NoteType,
+    writer: AnkiWriter,
+    package_format: AnkiPackageFormat,
+    vocab: list[VocabEntry],
+    existing_media: Collection[str],
+) -> Path:
+    # module-level, so that it can run in a worker process
+    AnkiDeckCreator(
+        output_file, deck_name, note_type, writer, package_format
+    ).write_anki_deck(vocab, existing_media=existing_media)
+    return Path(output_file)
 
 
 class AnkiDeckCreator:
-    def __init__(self, output_file: Path, deck_name: str, note_type: NoteType) -> None:
+    def __init__(
+        self,
+        output_file: Path,
+        deck_name: str,
+        note_type: NoteType,
+        writer: AnkiWriter = "genanki",
+        package_format: AnkiPackageFormat = "anki2",
+    ) -> None:
         self.logger = get_logger("ankify.anki.anki_deck_creator")
         self.output_file = output_file
         self.deck_name = deck_name
+        self.note_type = note_type
+        # genanki writes only the anki2 format
+        self.writer = "sqlite" if package_format == "anki21b" else writer
+        self.package_format = package_format
         self._fix_genanki_sort_type()
         self.anki_note_model = self._create_anki_note_model(note_type)
 
-    def write_anki_deck(self, vocab: list[VocabEntry]) -> None:
+    def write_anki_deck(
+        self,
+        vocab: list[VocabEntry],
+        output_stream: BinaryIO | None = None,
+        existing_media: Collection[str] = (),
+    ) -> None:
+        """
+        Write the deck to `output_file`, or to `output_stream` if given.
+        The stream does not need to be seekable, so the package can be uploaded while it is written.
+        Media files named in `existing_media` are already in the target collection:
+        the notes reference them, but they are left out of the package.
+        """
         if not vocab:
             self.logger.info("Empty vocabulary; skipping Anki deck creation")
             return
 
         self.logger.info("Creating Anki deck with %d notes", len(vocab))
 
+        media_files = self._media_files(vocab, existing_media)
+        if self.writer == "sqlite":
+            package = self._create_sqlite_package(vocab, media_files)
+        else:
+            package = self._create_genanki_package(vocab, media_files)
+
+        if output_stream is not None:
+            self.logger.debug("Deck created. Writing it to the output stream")
+            package.write_to_file(output_stream)
+            return
+
         output_path = Path(self.output_file)
         output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger.debug("Deck created. Writing it to %s", str(output_path.resolve()))
+        package.write_to_file(str(output_path))
+
+    def merge_anki_deck(
+        self,
+        existing: ExistingAnkiPackage,
+        vocab: list[VocabEntry],
+        output_stream: BinaryIO | None = None,
+    ) -> None:
+        """
+        Write the `existing` package with the notes of `vocab` added to its deck,
+        to `output_file` (which may be the existing package) or to `output_stream`.
+        `vocab` should only have the new entries, see `ExistingAnkiPackage.new_entries`.
+        Media files the package already has are copied from it, not from `vocab`.
+        """
+        if existing.note_type != self.note_type:
+            raise ValueError(
+                f"Cannot add '{self.note_type}' notes to a deck of "
+                f"'{existing.note_type}' notes"
+            )
+        self.logger.info(
+            "Adding %d notes to the deck '%s' of %s",
+            len(vocab),
+            existing.deck_name,
+            existing.path,
+        )
+        media_files = self._media_files(vocab, existing.media)
+        package = MergedAnkiPackage(
+            existing,
+            self._create_sqlite_package(vocab, media_files, deck_id=existing.deck_id),
+        )
+        if output_stream is not None:
+            package.write_to_file(output_stream)
+            return
 
+        # the output file may be the existing package, which is read while writing
+        output_path = Path(self.output_file)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = output_path.with_name(f".{output_path.name}.tmp")
+        try:
+            package.write_to_file(str(tmp_path))
+            os.replace(tmp_path, output_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def write_anki_deck_shards(
+        self,
+        vocab: list[VocabEntry],
+        max_notes: int | None = None,
+        max_bytes: int | None = None,
+        max_workers: int | None = None,
+        existing_media: Collection[str] = (),
+        shards: list[list[VocabEntry]] | None = None,
+    ) -> list[Path]:
+        """
+        Write the deck split into shards of bounded size (see `shard_vocabulary`),
+        each its own package with a subdeck `<deck name>::Part <n>`, to the files
+        given by `shard_path`. The packages are written in parallel processes.
+        A vocabulary that fits into one shard is written to `output_file` as usual.
+        `shards` may be given if the caller has split `vocab` already.
+        Package files of an earlier run (see `deck_files`) that were not written
+        again are removed. Returns the written package files in shard order.
+        """
+        if shards is None:
+            shards = shard_vocabulary(vocab, max_notes, max_bytes)
+        output_files = self._write_shards(vocab, shards, max_workers, existing_media)
+        for stale_file in set(deck_files(self.output_file)) - set(output_files):
+            self.logger.info("Removing the outdated deck file %s", stale_file)
+            stale_file.unlink(missing_ok=True)
+        return output_files
+
+    def _write_shards(
+        self,
+        vocab: list[VocabEntry],
+        shards: list[list[VocabEntry]],
+        max_workers: int | None,
+        existing_media: Collection[str],
+    ) -> list[Path]:
+        if len(shards) <= 1:
+            self.write_anki_deck(vocab, existing_media=existing_media)
+            return [Path(self.output_file)] if vocab else []
+
+        self.logger.info("Splitting %d notes into %d decks", len(vocab), len(shards))
+        with self._shard_executor(max_workers, len(shards)) as executor:
+            futures = [
+                executor.submit(
+                    _write_shard,
+                    shard_path(self.output_file, index),
+                    f"{self.deck_name}::Part {index}",
+                    self.note_type,
+                    self.writer,
+                    self.package_format,
+                    shard,
+                    existing_media,
+                )
+                for index, shard in enumerate(shards, start=1)
+            ]
+            return [future.result() for future in futures]
+
+    def _shard_executor(self, max_workers: int | None, num_shards: int) -> Executor:
+        if max_workers is not None:
+            max_workers = min(max_workers, num_shards)
+        try:
+            return ProcessPoolExecutor(max_workers=max_workers)
+        except (OSError, NotImplementedError) as e:
+            # e.g. AWS Lambda has no /dev/shm for multiprocessing primitives
+            self.logger.warning(
+                "Process pool unavailable (%s); packaging decks in threads", e
+            )
+            return ThreadPoolExecutor(max_workers=max_workers)
+
+    def _media_files(
+        self, vocab: list[VocabEntry], existing_media: Collection[str]
+    ) -> list[str]:
+        media_files = {str(entry.front_audio) for entry in vocab}
+        media_files.update(str(entry.back_audio) for entry in vocab)
+        skipped = {path for path in media_files if Path(path).name in existing_media}
+        if skipped:
+            self.logger.info(
+                "Skipping %d media files already in the target collection",
+                len(skipped),
+            )
+        return sorted(media_files - skipped)
+
+    def _create_genanki_package(
+        self, vocab: list[VocabEntry], media_files: list[str]
+    ) -> genanki.Package:
         deck = genanki.Deck(AnkiGuidGenerator.random_int_guid(), self.deck_name)
-        media_files = set()
         for entry in vocab:
             note = self._create_anki_note(entry)
             deck.add_note(note)
-            media_files.add(str(entry.front_audio))
-            media_files.add(str(entry.back_audio))
 
         package = genanki.Package(deck)
-        package.media_files = list(media_files)
+        package.media_files = media_files
+        return package
 
-        self.logger.debug("Deck created. Writing it to %s", str(output_path.resolve()))
-        package.write_to_file(str(output_path))
+    def _create_sqlite_package(
+        self,
+        vocab: list[VocabEntry],
+        media_files: list[str],
+        deck_id: int | None = None,
+    ) -> SQLiteAnkiPackage:
+        notes = [
+            (AnkiGuidGenerator.random_base91_guid(), self._note_fields(entry))
+            for entry in vocab
+        ]
+        return SQLiteAnkiPackage(
+            model=self.anki_note_model,
+            deck_id=deck_id or AnkiGuidGenerator.random_int_guid(),
+            deck_name=self.deck_name,
+            notes=notes,
+            media_files=media_files,
+            package_format=self.package_format,
+        )
 
     def _create_anki_note(self, entry: VocabEntry) -> genanki.Note:
         note = genanki.Note(
             model=self.anki_note_model,
-            fields=[
-                entry.front,
-                entry.back,
-                entry.front_language,
-                entry.back_language,
-                f"[sound:{entry.front_audio.name}]",
-                f"[sound:{entry.back_audio.name}]",
-            ],
+            fields=self._note_fields(entry),
             guid=AnkiGuidGenerator.random_base91_guid(),
         )
         return note
 
+    @staticmethod
+    def _note_fields(entry: VocabEntry) -> list[str]:
+        return [
+            entry.front,
+            entry.back,
+            entry.front_language,
+            entry.back_language,
+            f"[sound:{entry.front_audio.name}]",
+            f"[sound:{entry.back_audio.name}]",
+        ]
+
     def _create_anki_note_model(self, note_type: NoteType) -> genanki.Model:
         def _load(package: str, filename: str) -> str:
             try:
@@ -0,0 +1,261 @@
+"""
+Adding notes to an Anki package (.apkg) written by ankify.
+
+The package is indexed first (`ExistingAnkiPackage`): its deck, note type, notes
+and media file names. Only the vocabulary it does not have yet needs audio, and
+clips it already has under the same content-hash name (see `media_file_name`)
+are not synthesized again. The updated package is the same collection with the
+new notes inserted; the existing media files are copied over byte for byte.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import zipfile
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, get_args
+
+from ..logging import get_logger
+from ..settings import AnkiPackageFormat, NoteType
+from ..vocab_entry import VocabEntry
+from .sqlite_anki_package import (
+    SQLiteAnkiPackage,
+    decode_media_entries,
+    encode_media_entries,
+    load_collection,
+    write_zstd_stored,
+    zstd_compressor,
+    zstd_decompress,
+)
+
+_logger = get_logger("ankify.anki.anki_package_merger")
+
+# the schema version of collections written by genanki and SQLiteAnkiPackage
+_LEGACY_SCHEMA_VERSION = 11
+
+
+def note_key(fields: list[str]) -> tuple[str, ...]:
+    """Front, back and their languages: what makes a note a duplicate."""
+    return tuple(fields[:4])
+
+
+def read_package(
+    path: Path,
+) -> tuple[AnkiPackageFormat, bytes, dict[str, str], list[tuple[str, int, bytes]]]:
+    """
+    Format, collection database, media (file name -> name in the zip archive)
+    and, for anki21b, the media entries of a package.
+    """
+    with zipfile.ZipFile(path) as z:
+        names = set(z.namelist())
+        if "collection.anki21b" in names:
+            media_entries = decode_media_entries(zstd_decompress(z.read("media")))
+            return (
+                "anki21b",
+                zstd_decompress(z.read("collection.anki21b")),
+                {name: str(i) for i, (name, _, _) in enumerate(media_entries)},
+                media_entries,
+            )
+        if "collection.anki2" in names:
+            media_map = json.loads(z.read("media")) if "media" in names else {}
+            return (
+                "anki2",
+                z.read("collection.anki2"),
+                {name: idx for idx, name in media_map.items()},
+                [],
+            )
+    raise ValueError(f"{path} is not an Anki package")
+
+
+def ankify_models(conn: sqlite3.Connection) -> dict[int, NoteType]:
+    """
+    Ids and note types of the ankify note models of a collection, in the schema of
+    ankify packages or in the newer one of Anki's own collections and exports.
+    """
+    note_types = {f"Ankify_{note_type}": note_type for note_type in get_args(NoteType)}
+    has_notetypes_table = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notetypes'"
+    ).fetchone()
+    if has_notetypes_table:
+        models = conn.execute("SELECT id, name FROM notetypes").fetchall()
+    else:
+        (models_json,) = conn.execute("SELECT models FROM col").fetchone()
+        models = [
+            (model["id"], model["name"])
+            for model in json.loads(models_json or "{}").values()
+        ]
+    return {
+        int(model_id): note_types[name]
+        for model_id, name in models
+        if name in note_types
+    }
+
+
+@dataclass
+class ExistingAnkiPackage:
+    path: Path
+    package_format: AnkiPackageFormat
+    note_type: NoteType
+    deck_id: int
+    deck_name: str
+    note_keys: set[tuple[str, ...]]
+    # media file name -> name of its file in the zip archive
+    media: dict[str, str]
+    # name, size and SHA-1 of the media files of an anki21b package, in order
+    media_entries: list[tuple[str, int, bytes]] = field(default_factory=list)
+
+    @classmethod
+    def open(cls, path: Path) -> "ExistingAnkiPackage":
+        """
+        Index a package. Raises ValueError if it is not a package written by ankify,
+        e.g. one exported by Anki itself.
+        """
+        path = Path(path)
+        package_format, collection, media, media_entries = read_package(path)
+        conn = sqlite3.connect(":memory:")
+        try:
+            load_collection(conn, collection)
+            return cls(
+                path=path,
+                package_format=package_format,
+                media=media,
+                media_entries=media_entries,
+                **cls._index_collection(conn, path),
+            )
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _index_collection(conn: sqlite3.Connection, path: Path) -> dict:
+        (version,) = conn.execute("SELECT ver FROM col").fetchone()
+        if version != _LEGACY_SCHEMA_VERSION:
+            raise ValueError(f"{path} was not written by ankify")
+        models = ankify_models(conn)
+        if not models:
+            raise ValueError(f"{path} has no ankify note type")
+        model_id, note_type = next(iter(models.items()))
+        (decks_json,) = conn.execute("SELECT decks FROM col").fetchone()
+
+        decks = json.loads(decks_json)
+        deck_ids = Counter(
+            did
+            for (did,) in conn.execute(
+                "SELECT did FROM cards JOIN notes ON notes.id = cards.nid "
+                "WHERE notes.mid = ?",
+                (model_id,),
+            )
+        )
+        if deck_ids:
+            deck_id = deck_ids.most_common(1)[0][0]
+        else:
+            # a deck without notes
+            deck_id = next((int(i) for i in decks if int(i) != 1), None)
+            if deck_id is None:
+                raise ValueError(f"{path} has no deck")
+
+        note_keys = {
+            note_key(flds.split("\x1f"))
+            for (flds,) in conn.execute(
+                "SELECT flds FROM notes WHERE mid = ?", (model_id,)
+            )
+        }
+        return {
+            "note_type": note_type,
+            "deck_id": deck_id,
+            "deck_name": decks[str(deck_id)]["name"],
+            "note_keys": note_keys,
+        }
+
+    def new_entries(self, vocab: list[VocabEntry]) -> list[VocabEntry]:
+        """The entries that are not in the package yet, without duplicates."""
+        seen = set(self.note_keys)
+        new = []
+        for entry in vocab:
+            key = (entry.front, entry.back, entry.front_language, entry.back_language)
+            if key not in seen:
+                seen.add(key)
+                new.append(entry)
+        return new
+
+    def read_collection(self) -> bytes:
+        with zipfile.ZipFile(self.path) as z:
+            if self.package_format == "anki21b":
+                return zstd_decompress(z.read("collection.anki21b"))
+            return z.read("collection.anki2")
+
+
+class MergedAnkiPackage:
+    """
+    An existing package with more notes and media files,
+    written with the same interface as `SQLiteAnkiPackage`.
+    """
+
+    def __init__(self, existing: ExistingAnkiPackage, additions: SQLiteAnkiPackage):
+        """additions: the new notes and the media files that are not in `existing`"""
+        self.existing = existing
+        self.additions = additions
+
+    def write_to_file(
+        self, file: str | BinaryIO, timestamp: float | None = None
+    ) -> None:
+        collection = self.additions.add_to_collection(
+            self.existing.read_collection(), timestamp
+        )
+        with (
+            zipfile.ZipFile(self.existing.path) as src,
+            zipfile.ZipFile(file, "w") as dst,
+        ):
+            if self.existing.package_format == "anki21b":
+                self._write_anki21b(src, dst, collection)
+            else:
+                self._write_anki2(src, dst, collection)
+        _logger.debug(
+            "Added %d notes and %d media files to %s",
+            len(self.additions.notes),
+            len(self.additions.media_files),
+            self.existing.path,
+        )
+
+    def _write_anki2(
+        self, src: zipfile.ZipFile, dst: zipfile.ZipFile, collection: bytes
+    ) -> None:
+        dst.writestr("collection.anki2", collection)
+        media = {idx: name for name, idx in self.existing.media.items()}
+        first_idx = max((int(idx) for idx in media), default=-1) + 1
+        new_media = {
+            str(first_idx + i): path
+            for i, path in enumerate(self.additions.media_files)
+        }
+        media.update({idx: os.path.basename(p) for idx, p in new_media.items()})
+        dst.writestr("media", json.dumps(media))
+
+        self._copy_existing_media(src, dst)
+        for idx, path in new_media.items():
+            dst.write(path, idx)
+
+    def _write_anki21b(
+        self, src: zipfile.ZipFile, dst: zipfile.ZipFile, collection: bytes
+    ) -> None:
+        compressor = zstd_compressor()
+        dst.writestr("meta", src.read("meta"))
+        dst.writestr("collection.anki21b", compressor.compress(collection))
+        dst.writestr("collection.anki2", src.read("collection.anki2"))
+
+        self._copy_existing_media(src, dst)
+        entries = list(self.existing.media_entries)
+        for path in self.additions.media_files:
+            with open(path, "rb") as f, dst.open(str(len(entries)), "w") as out:
+                size, sha1 = write_zstd_stored(f, out)
+            entries.append((os.path.basename(path), size, sha1))
+        dst.writestr("media", compressor.compress(encode_media_entries(entries)))
+
+    def _copy_existing_media(self, src: zipfile.ZipFile, dst: zipfile.ZipFile) -> None:
+        for member in self.existing.media.values():
+            info = src.getinfo(member)
+            copy = zipfile.ZipInfo(info.filename, info.date_time)
+            copy.compress_type = info.compress_type
+            with src.open(info) as f, dst.open(copy, "w") as out:
+                shutil.copyfileobj(f, out)
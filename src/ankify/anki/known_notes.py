@@ -0,0 +1,140 @@
+"""
+Index of the ankify notes a user already has, to leave them out of new decks.
+
+The notes are read from Anki collections (`collection.anki2` in the Anki profile
+folder, which Anki desktop locks while the profile is open) or from .apkg
+packages. Only notes of the ankify note types are indexed,
+by front, back and both languages, compared without HTML, case and extra spaces.
+"""
+
+import re
+import sqlite3
+import unicodedata
+from collections.abc import Iterable
+from contextlib import closing
+from pathlib import Path
+
+from ..logging import get_logger
+from ..resource_registry import resolve_language_alias
+from ..vocab_entry import VocabEntry
+from .anki_package_merger import ankify_models, note_key, read_package
+from .sqlite_anki_package import load_collection, strip_html_media
+
+_logger = get_logger("ankify.anki.known_notes")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFC", strip_html_media(text))
+    return _WHITESPACE.sub(" ", text).casefold()
+
+
+def normalized_key(
+    front: str, back: str, front_language: str, back_language: str
+) -> tuple[str, str, str, str]:
+    return (
+        normalize_text(front),
+        normalize_text(back),
+        resolve_language_alias(front_language.strip()),
+        resolve_language_alias(back_language.strip()),
+    )
+
+
+def _unicase(a: str, b: str) -> int:
+    a, b = a.casefold(), b.casefold()
+    return (a > b) - (a < b)
+
+
+class KnownNotesIndex:
+    def __init__(self, keys: Iterable[tuple[str, str, str, str]] = ()) -> None:
+        self.keys = set(keys)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, entry: VocabEntry) -> bool:
+        return (
+            normalized_key(
+                entry.front, entry.back, entry.front_language, entry.back_language
+            )
+            in self.keys
+        )
+
+    def add(self, entry: VocabEntry) -> None:
+        self.keys.add(
+            normalized_key(
+                entry.front, entry.back, entry.front_language, entry.back_language
+            )
+        )
+
+    @classmethod
+    def from_files(cls, paths: Iterable[Path]) -> "KnownNotesIndex":
+        index = cls()
+        for path in paths:
+            index.add_file(Path(path).expanduser())
+        return index
+
+    def add_file(self, path: Path) -> None:
+        """Index an .apkg package or an Anki collection database."""
+        collection = None
+        if path.suffix == ".apkg":
+            _, collection, _, _ = read_package(path)
+            conn = sqlite3.connect(":memory:")
+        else:
+            # read-only, so the collection is never modified. Anki desktop locks
+            # its open collection exclusively, waiting for the lock is pointless.
+            conn = sqlite3.connect(
+                f"{path.resolve().as_uri()}?mode=ro", uri=True, timeout=0
+            )
+        with closing(conn):
+            try:
+                if collection is not None:
+                    load_collection(conn, collection)
+                # the text collation of Anki's own collections
+                conn.create_collation("unicase", _unicase)
+                added = self.add_collection(conn)
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                raise RuntimeError(
+                    f"Cannot read {path}, it is locked by a running Anki. Close Anki, "
+                    "or export the collection as an .apkg and use that instead."
+                ) from e
+        _logger.info("Indexed %d known notes from %s", added, path)
+
+    def add_collection(self, conn: sqlite3.Connection) -> int:
+        model_ids = list(ankify_models(conn))
+        if not model_ids:
+            return 0
+        before = len(self.keys)
+        for (flds,) in conn.execute(
+            f"SELECT flds FROM notes WHERE mid IN ({','.join('?' * len(model_ids))})",
+            model_ids,
+        ):
+            fields = note_key(flds.split("\x1f"))
+            if len(fields) == 4:
+                self.keys.add(normalized_key(*fields))
+        return len(self.keys) - before
+
+    def terms(self, language: str) -> set[str]:
+        """Normalized texts of the known notes in a language, front or back."""
+        language = resolve_language_alias(language.strip())
+        terms = set()
+        for front, back, front_language, back_language in self.keys:
+            if front_language == language:
+                terms.add(front)
+            if back_language == language:
+                terms.add(back)
+        return terms
+
+    def drop_known(self, vocab: list[VocabEntry]) -> list[VocabEntry]:
+        """The entries that are not known yet."""
+        new = [entry for entry in vocab if entry not in self]
+        if len(new) < len(vocab):
+            _logger.info(
+                "Dropped %d of %d vocabulary entries already in the Anki collection",
+                len(vocab) - len(new),
+                len(vocab),
+            )
+        return new
@@ -0,0 +1,172 @@
+"""
+Local pre-filter of the input text, to send the LLM fewer tokens.
+
+The text is split into words, and the words the learner does not need a card for
+are dropped: the most frequent words of the language (see `common_words`), words
+the user already knows, numbers and too short words. The LLM gets the remaining
+words, each once, grouped under the sentence they first appear in: every sentence
+with new words is sent once (long ones cut to the parts around those words) and
+the sentences without any are left out. If that is not shorter than the text, the
+text is sent as it is. Expressions of several words are only kept as their single
+words.
+"""
+
+import itertools
+import re
+import unicodedata
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from ..logging import get_logger
+from ..resource_registry import common_words
+
+_WORD = re.compile(r"\w+(?:['’-]\w+)*")
+_SENTENCE = re.compile(r"[^.!?…\n]+[.!?…]*")
+
+_HEADER = "Passages of a text, each followed by its words worth a card:"
+_HEADER_WITHOUT_CONTEXT = "Words of a text worth a card:"
+
+
+def normalize_word(word: str) -> str:
+    return unicodedata.normalize("NFC", word).replace("’", "'").casefold()
+
+
+@dataclass
+class Candidate:
+    word: str
+    context: str
+
+
+class InputFilter:
+    def __init__(
+        self,
+        language: str,
+        num_common_words: int = 100,
+        min_word_length: int = 2,
+        context_chars: int = 40,
+        known_terms: Iterable[str] = (),
+    ) -> None:
+        """
+        language: language of the input text (language_a)
+        known_terms: words or terms the user knows; a term of several words
+            also marks its last word as known if the others are common words
+            (e.g. "der Hund", "to run")
+        """
+        self.logger = get_logger("ankify.llm.input_filter")
+        self.min_word_length = min_word_length
+        self.context_chars = context_chars
+        all_common = {normalize_word(w) for w in common_words(language)}
+        self.dropped = {
+            normalize_word(w) for w in common_words(language)[:num_common_words]
+        }
+        if not all_common:
+            self.logger.warning(
+                "No list of common words for language '%s'; only known words "
+                "are dropped",
+                language,
+            )
+        for term in known_terms:
+            words = [normalize_word(w) for w in _WORD.findall(term)]
+            if len(words) == 1 or (words and all(w in all_common for w in words[:-1])):
+                self.dropped.add(words[-1])
+
+    def candidates(self, text: str) -> list[Candidate]:
+        """
+        Words worth a card, in the order they first appear. Candidates of the same
+        passage of a sentence share the same `context` string.
+        """
+        seen: set[str] = set()
+        candidates: list[Candidate] = []
+        for sentence in _SENTENCE.finditer(text):
+            words = []
+            for word in _WORD.finditer(sentence.group()):
+                key = normalize_word(word.group())
+                if (
+                    key in seen
+                    or key in self.dropped
+                    or len(key) < self.min_word_length
+                    or any(c.isdigit() for c in key)
+                ):
+                    continue
+                seen.add(key)
+                words.append(word)
+            candidates.extend(self._with_context(sentence.group(), words))
+        return candidates
+
+    def filter(self, text: str) -> str:
+        """
+        The candidates as LLM input: each passage once, followed by a line with its
+        words. "" if there are none, the text itself if that is not longer.
+        """
+        candidates = self.candidates(text)
+        if not candidates:
+            filtered = ""
+        elif self.context_chars <= 0:
+            words = ", ".join(c.word for c in candidates)
+            filtered = f"{_HEADER_WITHOUT_CONTEXT}\n{words}"
+        else:
+            lines = [_HEADER]
+            for context, group in itertools.groupby(candidates, lambda c: c.context):
+                lines.append(context)
+                lines.append("→ " + ", ".join(c.word for c in group))
+            filtered = "\n".join(lines)
+        self.logger.info(
+            "Input filter: %d words left of %d (%d of %d characters)",
+            len(candidates),
+            len(_WORD.findall(text)),
+            len(filtered),
+            len(text),
+        )
+        if candidates and len(filtered) >= len(text):
+            self.logger.info("The filtered input is not shorter; sending the text")
+            return text
+        return filtered
+
+    def _with_context(
+        self, sentence: str, words: list[re.Match[str]]
+    ) -> list[Candidate]:
+        """
+        The words with the passages of the sentence around them: the whole sentence
+        if it fits into `context_chars`, otherwise about `context_chars` around each
+        word, with overlapping passages merged.
+        """
+        if self.context_chars <= 0:
+            return [Candidate(word.group(), "") for word in words]
+        offset = len(sentence) - len(sentence.lstrip())
+        sentence = sentence.strip()
+        if len(sentence) <= self.context_chars:
+            return [Candidate(word.group(), sentence) for word in words]
+
+        # (left, right, words) of the passages, in order
+        passages: list[tuple[int, int, list[str]]] = []
+        for word in words:
+            left, right = self._window(
+                sentence, word.start() - offset, word.end() - offset
+            )
+            if passages and left <= passages[-1][1]:
+                prev_left, prev_right, prev_words = passages[-1]
+                passages[-1] = (prev_left, max(prev_right, right), prev_words)
+                prev_words.append(word.group())
+            else:
+                passages.append((left, right, [word.group()]))
+
+        candidates = []
+        for left, right, passage_words in passages:
+            context = sentence[left:right].strip()
+            context = (
+                f"{'…' if left > 0 else ''}{context}"
+                f"{'…' if right < len(sentence) else ''}"
+            )
+            candidates.extend(Candidate(word, context) for word in passage_words)
+        return candidates
+
+    def _window(self, sentence: str, start: int, end: int) -> tuple[int, int]:
+        """About `context_chars` of the sentence around a word, not cutting words."""
+        margin = max(0, (self.context_chars - (end - start)) // 2)
+        left = max(0, start - margin)
+        right = min(len(sentence), end + margin)
+        while left > 0 and not sentence[left - 1].isspace():
+            left -= 1
+        while right < len(sentence) and not sentence[right].isspace():
+            right += 1
+        return left, right
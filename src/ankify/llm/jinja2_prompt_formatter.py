@@ -1,5 +1,6 @@
 import jinja2
 
+from functools import lru_cache
 from typing import Any
 
 
@@ -7,17 +8,24 @@ def jinja2_raise(message: str) -> None:
     raise jinja2.TemplateRuntimeError(message)
 
 
+_environment = jinja2.Environment(
+    trim_blocks=True,
+    lstrip_blocks=True,
+    undefined=jinja2.StrictUndefined,
+)
+_environment.globals["fail"] = jinja2_raise
+
+
+@lru_cache(maxsize=32)
+def _compile(template_content: str) -> jinja2.Template:
+    return _environment.from_string(template_content)
+
+
 class PromptRenderer:
     @staticmethod
     def render(
         template_content: str,
         context: dict[str, Any],
     ) -> str:
-        env = jinja2.Environment(
-            trim_blocks=True,
-            lstrip_blocks=True,
-            undefined=jinja2.StrictUndefined,
-        )
-        env.globals["fail"] = jinja2_raise
-        template = env.from_string(template_content)
-        return template.render(**context)
+        # templates are compiled once per distinct content
+        return _compile(template_content).render(**context)
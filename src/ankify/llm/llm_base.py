@@ -1,36 +1,136 @@
 from abc import ABC, abstractmethod
+import asyncio
 import time
+import weakref
 
 from ..vocab_entry import VocabEntry
 from ..tsv import read_from_string
 from ..logging import get_logger
 from .llm_cost_tracker import LLMUsage
+from .llm_response_cache import LLMResponseCache
 
 
 class LLMClient(ABC):
-    def __init__(self, model: str) -> None:
+    def __init__(
+        self,
+        model: str,
+        reasoning_effort: str | None = None,
+        response_cache: LLMResponseCache | None = None,
+        max_concurrency: int = 4,
+        endpoint: str | None = None,
+    ) -> None:
         self._model = model
+        # where the model is served, None for the provider's default endpoint
+        self._endpoint = endpoint
+        self._reasoning_effort = reasoning_effort
+        self._response_cache = response_cache
+        self._max_concurrency = max_concurrency
+        # asyncio primitives are bound to the event loop they are used in
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
         self._logger = get_logger(f"ankify.llm.{self.__class__.__name__}")
 
     def generate_vocabulary(
         self, instructions: str, input_text: str
     ) -> list[VocabEntry]:
         self._logger.info("Generating vocabulary entries with LLM")
+        cache_key, vocab = self._load_cached_vocabulary(instructions, input_text)
+        if vocab is not None:
+            return vocab
+
         start_time = time.time()
         llm_answer, llm_usage = self._call_llm(
             instructions=instructions, input_text=input_text
         )
         end_time = time.time()
         self._logger.info("LLM call took %.2f seconds", end_time - start_time)
-        LLMUsage.from_openai_usage(self._model, llm_usage).print_table()
+        usage = LLMUsage.from_openai_usage(self._model, llm_usage)
+        return self._process_llm_answer(llm_answer, usage, cache_key)
+
+    async def generate_vocabulary_async(
+        self, instructions: str, input_text: str
+    ) -> list[VocabEntry]:
+        """
+        Same as `generate_vocabulary`, without blocking the event loop.
+        Any number of calls may run concurrently; at most `max_concurrency`
+        LLM requests of this client are in flight at a time.
+        """
+        self._logger.info("Generating vocabulary entries with LLM (async)")
+        cache_key, vocab = await asyncio.to_thread(
+            self._load_cached_vocabulary, instructions, input_text
+        )
+        if vocab is not None:
+            return vocab
+
+        async with self._semaphore():
+            start_time = time.time()
+            llm_answer, llm_usage = await self._call_llm_async(
+                instructions=instructions, input_text=input_text
+            )
+        end_time = time.time()
+        self._logger.info("LLM call took %.2f seconds", end_time - start_time)
+        # the pricing may be downloaded on first use
+        usage = await asyncio.to_thread(
+            LLMUsage.from_openai_usage, self._model, llm_usage
+        )
+        return await asyncio.to_thread(
+            self._process_llm_answer, llm_answer, usage, cache_key
+        )
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self._max_concurrency)
+        return self._semaphores[loop]
+
+    def _load_cached_vocabulary(
+        self, instructions: str, input_text: str
+    ) -> tuple[str | None, list[VocabEntry] | None]:
+        """The response cache key of the request, and its vocabulary if cached."""
+        if self._response_cache is None:
+            return None, None
+        cache_key = LLMResponseCache.key(
+            self._model,
+            self._reasoning_effort,
+            instructions,
+            input_text,
+            endpoint=self._endpoint,
+        )
+        cached = self._response_cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+
+        self._logger.info(
+            "Using the cached LLM answer (originally %d tokens)",
+            cached.token_usage.total,
+        )
+        LLMUsage.from_cache_hit(self._model).print_table()
+        vocab = self._parse_llm_answer(cached.answer)
+        self._logger.info("Generated %d vocabulary entries", len(vocab))
+        return cache_key, vocab
+
+    def _process_llm_answer(
+        self, llm_answer: str, usage: LLMUsage, cache_key: str | None
+    ) -> list[VocabEntry]:
+        usage.print_table()
         vocab = self._parse_llm_answer(llm_answer)
         self._logger.info("Generated %d vocabulary entries", len(vocab))
+        # an answer without entries is not worth reusing
+        if cache_key is not None and vocab:
+            self._response_cache.put(cache_key, llm_answer, usage.token_usage)
         return vocab
 
     @abstractmethod
     def _call_llm(self, instructions: str, input_text: str) -> tuple[str, dict]:
         raise NotImplementedError
 
+    async def _call_llm_async(
+        self, instructions: str, input_text: str
+    ) -> tuple[str, dict]:
+        """Clients without a native async API run the blocking call in a thread."""
+        return await asyncio.to_thread(self._call_llm, instructions, input_text)
+
     def _parse_llm_answer(self, llm_answer: str) -> list[VocabEntry]:
         self._logger.info("Parsing LLM answer into vocabulary entries")
         return read_from_string(llm_answer)
@@ -1,5 +1,9 @@
 import json
 import logging
+import os
+import tempfile
+import threading
+from bisect import bisect_left
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -9,6 +13,7 @@ from math import floor, log10
 from urllib.request import urlopen
 from urllib.error import URLError, HTTPError
 from io import StringIO
+from importlib import resources
 
 from rich.console import Console
 from rich.table import Table
@@ -183,10 +188,108 @@ class LLMCost:
         return self if other == 0 else NotImplemented
 
 
+PRICING_INDEX_FORMAT = "ankify-llm-pricing/1"
+
+
+class LLMPricingIndex:
+    """
+    Token prices of all models, indexed for lookups.
+
+    Only the prices used are kept: `[input, cached input or None, output]` per
+    model, as strings to be converted to Decimal on lookup. Model names without
+    a provider prefix (`openai/gpt-5` -> `gpt-5`) and a sorted list of names for
+    prefix matches (`gpt-5` -> `gpt-5-2025-08-07`) resolve fuzzy lookups without
+    scanning all models.
+    """
+
+    def __init__(self, models: dict[str, list[str | None]]) -> None:
+        self.models = models
+        self._aliases: dict[str, str] = {}
+        for key in models:
+            self._aliases.setdefault(key.rsplit("/", 1)[-1], key)
+        self._sorted_aliases = sorted(self._aliases)
+
+    @classmethod
+    def from_litellm(cls, data: dict[str, Any]) -> "LLMPricingIndex":
+        """Index the litellm model_prices_and_context_window.json."""
+        models: dict[str, list[str | None]] = {}
+        for key, model_data in data.items():
+            if not isinstance(model_data, dict):
+                continue
+            if "input_cost_per_token" not in model_data:
+                continue
+            if "output_cost_per_token" not in model_data:
+                continue
+            cached = model_data.get("cache_read_input_token_cost")
+            models[key] = [
+                str(model_data["input_cost_per_token"]),
+                None if cached is None else str(cached),
+                str(model_data["output_cost_per_token"]),
+            ]
+        return cls(models)
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> "LLMPricingIndex":
+        """Load an index saved with `to_json`, or index litellm data."""
+        if data.get("format") == PRICING_INDEX_FORMAT:
+            return cls(data["models"])
+        return cls.from_litellm(data)
+
+    def to_json(self) -> dict[str, Any]:
+        return {"format": PRICING_INDEX_FORMAT, "models": self.models}
+
+    def resolve(self, model: str) -> str | None:
+        """Key of the model in the index; exact, then without provider, then prefix."""
+        if model in self.models:
+            return model
+
+        name = model.rsplit("/", 1)[-1]
+        key = self._aliases.get(name)
+        if key is None:
+            i = bisect_left(self._sorted_aliases, name)
+            if i < len(self._sorted_aliases) and self._sorted_aliases[i].startswith(
+                name
+            ):
+                key = self._aliases[self._sorted_aliases[i]]
+        if key is not None:
+            _logger.warning(
+                "Found only fuzzy match for pricing model name: %s -> %s",
+                model,
+                key,
+            )
+        return key
+
+    def get(self, model: str) -> LLMPricing | None:
+        key = self.resolve(model)
+        if key is None:
+            return None
+
+        uncached_input, cached_input, output = self.models[key]
+        pricing = LLMPricing(
+            uncached_input=Decimal(uncached_input),
+            output=Decimal(output),
+            reasoning=Decimal(output),
+        )
+        if cached_input is None:
+            _logger.info(
+                "No cached input token cost found for model %s, set it to the input token cost",
+                model,
+            )
+            pricing.cached_input = pricing.uncached_input
+        else:
+            pricing.cached_input = Decimal(cached_input)
+        return pricing
+
+
 class LLMPricingLoader:
     """
     Download and cache pricing data for LLM models.
     Singleton to avoid re-loading from disk.
+
+    The pricing data is loaded on the first lookup, from a compact index in the
+    cache directory or, without one, from the snapshot bundled with ankify.
+    A missing or outdated index is refreshed in a background thread, so lookups
+    never wait for the network.
     """
 
     _instance = None
@@ -213,6 +316,9 @@ class LLMPricingLoader:
 
         self._initialized = True
         self._loaded_models_pricing: dict[str, LLMPricing] = {}
+        self._index: LLMPricingIndex | None = None
+        self._lock = threading.Lock()
+        self._refresh_thread: threading.Thread | None = None
 
         self._cache_dir = cache_dir or Path.home() / ".cache" / "llm_cost_tracker"
         self._cache_duration = cache_duration
@@ -223,47 +329,13 @@ class LLMPricingLoader:
         if model in self._loaded_models_pricing:
             return self._loaded_models_pricing[model]
 
-        data = self._get_data()
-        model_data = self._resolve_model_pricing(data, model)
-        if model_data is None:
+        pricing = self._get_index().get(model)
+        if pricing is None:
             _logger.warning(
                 "Model %s not found in pricing data, return all zeros", model
             )
-            self._loaded_models_pricing[model] = LLMPricing()
-            return self._loaded_models_pricing[model]
-
-        pricing = LLMPricing()
-
-        if "input_cost_per_token" in model_data:
-            pricing.uncached_input = Decimal(model_data["input_cost_per_token"])
-        else:
-            _logger.warning(
-                "No input token cost found for model %s, return all zeros", model
-            )
-            self._loaded_models_pricing[model] = LLMPricing()
-            return self._loaded_models_pricing[model]
-
-        if "cache_read_input_token_cost" in model_data:
-            pricing.cached_input = Decimal(model_data["cache_read_input_token_cost"])
-        else:
-            _logger.info(
-                "No cached input token cost found for model %s, set it to the input token cost",
-                model,
-            )
-            pricing.cached_input = pricing.uncached_input
-
-        if "output_cost_per_token" in model_data:
-            pricing.output = Decimal(model_data["output_cost_per_token"])
-        else:
-            _logger.warning(
-                "No output token cost found for model %s, return all zeros", model
-            )
-            self._loaded_models_pricing[model] = LLMPricing()
-            return self._loaded_models_pricing[model]
-
-        pricing.reasoning = pricing.output
-
-        if not pricing.is_valid:
+            pricing = LLMPricing()
+        elif not pricing.is_valid:
             _logger.warning(
                 "Pricing data for model %s is not valid: %s", model, pricing
             )
@@ -271,26 +343,15 @@ class LLMPricingLoader:
         self._loaded_models_pricing[model] = pricing
         return self._loaded_models_pricing[model]
 
-    def _resolve_model_pricing(
-        self, data: dict[str, Any], model: str
-    ) -> dict[str, Any] | None:
-        if model in data:
-            return data[model]
-
-        for key in data.keys():
-            if model in key:
-                _logger.warning(
-                    "Found only fuzzy match for pricing model name: %s -> %s",
-                    model,
-                    key,
-                )
-                return data[key]
-
-        return None
-
-    def _ensure_cache_dir(self) -> None:
-        """Ensure cache directory exists."""
-        self._cache_dir.mkdir(parents=True, exist_ok=True)
+    def _get_index(self) -> LLMPricingIndex:
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_cached_index()
+                if self._index is None or not self._is_cache_valid():
+                    self._start_refresh()
+                if self._index is None:
+                    self._index = self._load_snapshot()
+            return self._index
 
     def _is_cache_valid(self) -> bool:
         """Check if cached pricing data is still valid."""
@@ -302,26 +363,50 @@ class LLMPricingLoader:
         )
         return cache_age < self._cache_duration
 
-    def _load_cached_pricing(self) -> dict[str, Any] | None:
-        """Load pricing data from cache if valid."""
-        if not self._is_cache_valid():
-            return None
-
+    def _load_cached_index(self) -> LLMPricingIndex | None:
+        """Load the pricing index from cache, even if outdated."""
         try:
             with open(self._cache_file, encoding="utf-8") as f:
-                data = json.load(f, parse_float=Decimal)
-            _logger.debug("Loaded pricing data from cache %s", self._cache_file)
-            return data
+                data = json.load(f)
+            index = LLMPricingIndex.from_json(data)
+            is_current_format = data.get("format") == PRICING_INDEX_FORMAT
+        except FileNotFoundError:
+            return None
         except Exception as e:
+            # a malformed cache is the same as no cache
             _logger.warning("Failed to load cached pricing data: %s", e)
             return None
 
-    def _save_to_cache(self, data: dict[str, Any]) -> None:
+        if not is_current_format:
+            # full litellm data cached by older versions, keep its age
+            mtime = self._cache_file.stat().st_mtime
+            self._save_to_cache(index)
+            os.utime(self._cache_file, (mtime, mtime))
+        _logger.debug("Loaded pricing data from cache %s", self._cache_file)
+        return index
+
+    @staticmethod
+    def _load_snapshot() -> LLMPricingIndex:
+        """Pricing data bundled with ankify, for offline use."""
+        _logger.debug("Using the bundled pricing data snapshot")
+        content = (
+            resources.files("ankify.resources")
+            .joinpath("llm_pricing_snapshot.json")
+            .read_text(encoding="utf-8")
+        )
+        return LLMPricingIndex.from_json(json.loads(content))
+
+    def _save_to_cache(self, index: LLMPricingIndex) -> None:
         """Save pricing data to cache."""
         try:
-            self._ensure_cache_dir()
-            with open(self._cache_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, default=str)
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self._cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(index.to_json(), f)
+                os.replace(tmp_name, self._cache_file)
+            finally:
+                Path(tmp_name).unlink(missing_ok=True)
             _logger.debug("Saved pricing data to cache %s", self._cache_file)
         except Exception as e:
             _logger.warning("Failed to save pricing data to cache: %s", e)
@@ -337,25 +422,28 @@ class LLMPricingLoader:
         """Fetch pricing data from remote URL."""
         _logger.info("Fetching model pricing data from %s", self._source_url)
         with urlopen(self._source_url, timeout=30.0) as response:
-            data = json.loads(response.read().decode("utf-8"), parse_float=Decimal)
+            data = json.loads(response.read().decode("utf-8"))
         return data
 
-    def _get_data(self) -> dict[str, Any]:
-        """
-        Get pricing data, using cache if available and valid.
+    def _start_refresh(self) -> None:
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._refresh_thread = threading.Thread(
+            target=self._refresh, name="llm-pricing-refresh", daemon=True
+        )
+        self._refresh_thread.start()
 
-        Returns cached data if it's less than 24 hours old,
-        otherwise fetches fresh data from the remote URL.
-        """
-        # Try to load from cache first
-        cached_data = self._load_cached_pricing()
-        if cached_data is not None:
-            return cached_data
-
-        # Fetch fresh data
-        data = self._fetch_from_url()
-        self._save_to_cache(data)
-        return data
+    def _refresh(self) -> None:
+        """Download the pricing data, cache its index and use it for new lookups."""
+        try:
+            index = LLMPricingIndex.from_litellm(self._fetch_from_url())
+        except Exception as e:
+            _logger.warning("Failed to refresh pricing data: %s", e)
+            return
+        self._save_to_cache(index)
+        with self._lock:
+            self._index = index
+            self._loaded_models_pricing = {}
 
 
 @dataclass
@@ -365,6 +453,8 @@ class LLMUsage:
     token_usage: LLMTokenUsage
     cost: LLMCost
     num_calls: int = 1
+    # answers served from the response cache: no tokens used, no cost
+    cache_hits: int = 0
 
     @classmethod
     def from_openai_usage(cls, model: str, openai_usage: CompletionUsage) -> "LLMUsage":
@@ -374,6 +464,14 @@ class LLMUsage:
         cost = LLMCost.calculate(token_usage, pricing)
         return cls(model, pricing, token_usage, cost, 1)
 
+    @classmethod
+    def from_cache_hit(cls, model: str) -> "LLMUsage":
+        """Usage of an answer served from the response cache instead of an API call"""
+        pricing = LLMPricingLoader().get_pricing(model)
+        return cls(
+            model, pricing, LLMTokenUsage(), LLMCost(), num_calls=0, cache_hits=1
+        )
+
     def __add__(self, other: "LLMUsage") -> "LLMUsage":
         if self.model != other.model:
             raise ValueError("Models must be the same to add the LLM usage")
@@ -383,6 +481,7 @@ class LLMUsage:
             token_usage=self.token_usage + other.token_usage,
             cost=self.cost + other.cost,
             num_calls=self.num_calls + other.num_calls,
+            cache_hits=self.cache_hits + other.cache_hits,
         )
 
     def __radd__(self, other: int) -> "LLMUsage":
@@ -406,7 +505,7 @@ class LLMUsage:
         cost_formatter = _create_cost_formatter(_determine_cost_decimals(self.cost))
 
         table = Table(
-            title=f"[bold cyan]LLM API Usage Breakdown, $[/bold cyan]\n[dim]Model: {self.model}, number of calls: {self.num_calls}[/dim]",
+            title=f"[bold cyan]LLM API Usage Breakdown, $[/bold cyan]\n[dim]Model: {self.model}, number of calls: {self.num_calls}, cache hits: {self.cache_hits}[/dim]",
             title_justify="center",
             show_header=True,
             header_style="bold magenta",
@@ -1,5 +1,12 @@
 from ..settings import Settings
 from .llm_base import LLMClient
+from .llm_response_cache import LLMResponseCache
+from .openai_batch import (
+    BatchBackend,
+    LLMBatchRunner,
+    LocalBatchBackend,
+    OpenAIBatchBackend,
+)
 from .openai_llm import OpenAIClient
 from ..logging import get_logger
 
@@ -8,9 +15,48 @@ def create_llm_client(settings: Settings) -> LLMClient:
     logger = get_logger("ankify.llm.factory")
     llm_config = settings.llm
     provider = llm_config.provider
+    response_cache = None
+    if llm_config.response_cache.enabled:
+        response_cache = LLMResponseCache.from_config(llm_config.response_cache)
+        logger.debug("LLM answers are cached in %s", response_cache.directory)
     if provider == "openai":
         logger.debug("Creating OpenAI-compatible API LLM client")
         openai_access = settings.providers.openai
-        return OpenAIClient(llm_config=llm_config, openai_access=openai_access)
+        return OpenAIClient(
+            llm_config=llm_config,
+            openai_access=openai_access,
+            response_cache=response_cache,
+        )
     else:
         raise ValueError(f"Unsupported LLM provider: {provider}")
+
+
+def create_llm_batch_runner(settings: Settings) -> LLMBatchRunner:
+    logger = get_logger("ankify.llm.factory")
+    llm_config = settings.llm
+    if llm_config.provider != "openai":
+        raise ValueError(f"Unsupported LLM provider: {llm_config.provider}")
+
+    import openai
+
+    openai_access = settings.providers.openai
+    client = openai.OpenAI(
+        api_key=openai_access.api_key.get_secret_value(),
+        base_url=openai_access.base_url,
+    )
+    backend: BatchBackend
+    if settings.batch.api == "openai":
+        logger.debug("Creating OpenAI Batch API runner")
+        backend = OpenAIBatchBackend(client)
+    else:
+        logger.debug("Creating local batch runner over chat completions")
+        backend = LocalBatchBackend(
+            lambda body: client.chat.completions.create(**body).model_dump()
+        )
+    return LLMBatchRunner(
+        backend,
+        model=llm_config.options.model,
+        reasoning_effort=llm_config.options.reasoning_effort,
+        poll_interval_seconds=settings.batch.poll_interval_seconds,
+        timeout_seconds=settings.batch.timeout_seconds,
+    )
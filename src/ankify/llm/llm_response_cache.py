@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from ..logging import get_logger
+from ..settings import LLMResponseCacheConfig
+from .llm_cost_tracker import LLMTokenUsage
+
+
+@dataclass
+class CachedLLMResponse:
+    answer: str
+    # usage of the original call
+    token_usage: LLMTokenUsage
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    LLM answers stored as one JSON file per request.
+
+    Entries expire `ttl_seconds` after they were written. File modification times
+    track the last use, and the least recently used entries are evicted when the
+    cache grows beyond `max_size_bytes`.
+    """
+
+    def __init__(self, directory: Path, ttl_seconds: int, max_size_bytes: int) -> None:
+        self._logger = get_logger("ankify.llm.response_cache")
+        self.directory = Path(directory).expanduser()
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = max_size_bytes
+
+    @classmethod
+    def from_config(cls, config: LLMResponseCacheConfig) -> "LLMResponseCache":
+        return cls(
+            directory=config.directory,
+            ttl_seconds=config.ttl_seconds,
+            max_size_bytes=int(config.max_size_mb * 1024 * 1024),
+        )
+
+    @staticmethod
+    def key(
+        model: str,
+        reasoning_effort: str | None,
+        instructions: str,
+        input_text: str,
+        endpoint: str | None = None,
+    ) -> str:
+        """
+        Key of a request: endpoint, model, reasoning effort and hashes of prompt
+        and input. The same model name may be served by different providers.
+        """
+        parts = [
+            endpoint,
+            model,
+            reasoning_effort,
+            _sha256(instructions),
+            _sha256(input_text),
+        ]
+        return _sha256(json.dumps(parts))
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> CachedLLMResponse | None:
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self._logger.warning("Failed to read cached LLM response %s: %s", path, e)
+            return None
+
+        try:
+            expired = time.time() - data["created_at"] >= self.ttl_seconds
+            cached = CachedLLMResponse(
+                answer=data["answer"], token_usage=LLMTokenUsage(**data["token_usage"])
+            )
+        except (KeyError, TypeError) as e:
+            # written by another version, or not by ankify at all
+            self._logger.warning(
+                "Ignoring malformed cached LLM response %s: %r", path, e
+            )
+            return None
+
+        if expired:
+            self._logger.debug("Cached LLM response %s expired", path)
+            path.unlink(missing_ok=True)
+            return None
+
+        # mark as recently used for eviction
+        os.utime(path)
+        return cached
+
+    def put(self, key: str, answer: str, token_usage: LLMTokenUsage) -> None:
+        data = {
+            "created_at": time.time(),
+            "answer": answer,
+            "token_usage": asdict(token_usage),
+        }
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_name, self._path(key))
+            finally:
+                Path(tmp_name).unlink(missing_ok=True)
+        except OSError as e:
+            self._logger.warning("Failed to cache LLM response: %s", e)
+            return
+        self._logger.debug("Cached LLM response %s", self._path(key))
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self._logger.debug("Evicted cached LLM response %s", path)
@@ -0,0 +1,353 @@
+"""
+Bulk vocabulary generation as a single OpenAI Batch API job.
+
+All requests are written to one JSONL file, submitted as a batch, polled until
+the batch is done, and the JSONL output is parsed back into vocabularies.
+`LocalBatchBackend` runs the same job against a regular chat completions call,
+for OpenAI-compatible providers without a Batch API and for tests.
+"""
+
+import io
+import json
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from decimal import Decimal
+from typing import Any
+
+from openai.types.completion_usage import CompletionUsage
+
+from ..logging import get_logger
+from ..tsv import read_from_string
+from ..vocab_entry import VocabEntry
+from .llm_cost_tracker import LLMCost, LLMPricingLoader, LLMTokenUsage, LLMUsage
+
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+@dataclass
+class BatchStatus:
+    id: str
+    status: str
+    output_file_id: str | None = None
+    error_file_id: str | None = None
+    completed: int = 0
+    failed: int = 0
+    total: int = 0
+
+
+class BatchBackend(ABC):
+    """The Batch API operations the runner needs."""
+
+    # share of the regular token prices paid for batch requests
+    price_factor: Decimal = Decimal(1)
+
+    @abstractmethod
+    def upload(self, jsonl: bytes) -> str:
+        """Upload the input file, return its id."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create(self, input_file_id: str) -> BatchStatus:
+        raise NotImplementedError
+
+    @abstractmethod
+    def retrieve(self, batch_id: str) -> BatchStatus:
+        raise NotImplementedError
+
+    @abstractmethod
+    def cancel(self, batch_id: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def download(self, file_id: str) -> bytes:
+        raise NotImplementedError
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """The Batch API of OpenAI; batch requests cost half the regular price."""
+
+    price_factor = Decimal("0.5")
+
+    def __init__(self, client: Any) -> None:
+        # openai.OpenAI
+        self._client = client
+
+    def upload(self, jsonl: bytes) -> str:
+        uploaded = self._client.files.create(
+            file=("ankify_batch.jsonl", io.BytesIO(jsonl)), purpose="batch"
+        )
+        return uploaded.id
+
+    def create(self, input_file_id: str) -> BatchStatus:
+        batch = self._client.batches.create(
+            input_file_id=input_file_id,
+            endpoint=CHAT_COMPLETIONS_ENDPOINT,
+            completion_window="24h",
+            metadata={"source": "ankify"},
+        )
+        return self._status(batch)
+
+    def retrieve(self, batch_id: str) -> BatchStatus:
+        return self._status(self._client.batches.retrieve(batch_id))
+
+    def cancel(self, batch_id: str) -> None:
+        self._client.batches.cancel(batch_id)
+
+    def download(self, file_id: str) -> bytes:
+        return self._client.files.content(file_id).content
+
+    @staticmethod
+    def _status(batch: Any) -> BatchStatus:
+        counts = batch.request_counts
+        return BatchStatus(
+            id=batch.id,
+            status=batch.status,
+            output_file_id=batch.output_file_id,
+            error_file_id=batch.error_file_id,
+            completed=counts.completed if counts else 0,
+            failed=counts.failed if counts else 0,
+            total=counts.total if counts else 0,
+        )
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    Stand-in for the Batch API: the job runs when it is first polled,
+    each request with `complete(body)`, which returns a chat completion as a dict
+    (e.g. `client.chat.completions.create(**body).model_dump()`).
+    Requests that raise are reported in the error file, as the Batch API does.
+    """
+
+    def __init__(self, complete: Callable[[dict[str, Any]], dict[str, Any]]) -> None:
+        self._complete = complete
+        self._files: dict[str, bytes] = {}
+        self._batches: dict[str, BatchStatus] = {}
+        self._inputs: dict[str, str] = {}
+
+    def upload(self, jsonl: bytes) -> str:
+        file_id = f"file-{uuid.uuid4().hex}"
+        self._files[file_id] = jsonl
+        return file_id
+
+    def create(self, input_file_id: str) -> BatchStatus:
+        batch_id = f"batch-{uuid.uuid4().hex}"
+        lines = self._files[input_file_id].splitlines()
+        self._batches[batch_id] = BatchStatus(
+            id=batch_id, status="validating", total=len(lines)
+        )
+        self._inputs[batch_id] = input_file_id
+        return replace(self._batches[batch_id])
+
+    def retrieve(self, batch_id: str) -> BatchStatus:
+        status = self._batches[batch_id]
+        if status.status not in TERMINAL_STATUSES:
+            self._run(status)
+        return replace(status)
+
+    def cancel(self, batch_id: str) -> None:
+        status = self._batches[batch_id]
+        if status.status not in TERMINAL_STATUSES:
+            status.status = "cancelled"
+
+    def download(self, file_id: str) -> bytes:
+        return self._files[file_id]
+
+    def _run(self, status: BatchStatus) -> None:
+        outputs: list[str] = []
+        errors: list[str] = []
+        for line in self._files[self._inputs[status.id]].splitlines():
+            request = json.loads(line)
+            result: dict[str, Any] = {
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": request["custom_id"],
+                "response": None,
+                "error": None,
+            }
+            try:
+                body = self._complete(request["body"])
+            except Exception as e:
+                result["error"] = {"code": type(e).__name__, "message": str(e)}
+                errors.append(json.dumps(result))
+                status.failed += 1
+                continue
+            result["response"] = {"status_code": 200, "body": body}
+            outputs.append(json.dumps(result))
+            status.completed += 1
+
+        status.output_file_id = self.upload("\n".join(outputs).encode())
+        if errors:
+            status.error_file_id = self.upload("\n".join(errors).encode())
+        status.status = "completed"
+
+
+@dataclass
+class BatchResult:
+    vocabularies: dict[str, list[VocabEntry]]
+    # error messages of the requests that failed
+    errors: dict[str, str]
+    usage: LLMUsage | None
+
+
+class LLMBatchRunner:
+    def __init__(
+        self,
+        backend: BatchBackend,
+        model: str,
+        reasoning_effort: str | None = None,
+        poll_interval_seconds: float = 60.0,
+        timeout_seconds: float = 24 * 3600,
+    ) -> None:
+        self._logger = get_logger("ankify.llm.batch")
+        self._backend = backend
+        self._model = model
+        self._reasoning_effort = reasoning_effort
+        self._poll_interval_seconds = poll_interval_seconds
+        self._timeout_seconds = timeout_seconds
+
+    def build_input(self, instructions: str, inputs: dict[str, str]) -> bytes:
+        """One chat completions request per input, with the input key as custom_id."""
+        lines = []
+        for custom_id, input_text in inputs.items():
+            body: dict[str, Any] = {
+                "model": self._model,
+                "messages": [
+                    {"role": "system", "content": instructions},
+                    {"role": "user", "content": input_text},
+                ],
+            }
+            if self._reasoning_effort:
+                body["reasoning_effort"] = self._reasoning_effort
+            lines.append(
+                json.dumps(
+                    {
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": CHAT_COMPLETIONS_ENDPOINT,
+                        "body": body,
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        return "\n".join(lines).encode("utf-8")
+
+    def run(self, instructions: str, inputs: dict[str, str]) -> BatchResult:
+        """Generate a vocabulary for every input (keyed by an id) in one batch job."""
+        self._logger.info("Submitting a batch of %d LLM requests", len(inputs))
+        input_file_id = self._backend.upload(self.build_input(instructions, inputs))
+        status = self._backend.create(input_file_id)
+        self._logger.info("Created batch '%s'", status.id)
+        status = self._wait(status.id)
+
+        result = BatchResult({}, {}, None)
+        if status.error_file_id:
+            self._parse_output(self._backend.download(status.error_file_id), result)
+        if status.output_file_id:
+            self._parse_output(self._backend.download(status.output_file_id), result)
+        for custom_id in inputs:
+            if custom_id not in result.vocabularies and custom_id not in result.errors:
+                result.errors[custom_id] = f"no result (batch {status.status})"
+
+        if result.usage is not None:
+            result.usage.print_table()
+        self._logger.info(
+            "Batch '%s' %s: %d vocabularies, %d failed requests",
+            status.id,
+            status.status,
+            len(result.vocabularies),
+            len(result.errors),
+        )
+        return result
+
+    def _wait(self, batch_id: str) -> BatchStatus:
+        deadline = time.monotonic() + self._timeout_seconds
+        while True:
+            status = self._backend.retrieve(batch_id)
+            self._logger.info(
+                "Batch '%s' is %s (%d/%d done, %d failed)",
+                status.id,
+                status.status,
+                status.completed,
+                status.total,
+                status.failed,
+            )
+            if status.status in TERMINAL_STATUSES:
+                return status
+            if time.monotonic() >= deadline:
+                self._logger.error(
+                    "Batch '%s' did not finish in %.0fs, cancelling it",
+                    status.id,
+                    self._timeout_seconds,
+                )
+                self._backend.cancel(status.id)
+                raise TimeoutError(f"LLM batch '{status.id}' did not finish in time")
+            time.sleep(self._poll_interval_seconds)
+
+    def _parse_output(self, jsonl: bytes, result: BatchResult) -> None:
+        for line in jsonl.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            custom_id = item["custom_id"]
+            response = item.get("response") or {}
+            body = response.get("body") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                error = item.get("error") or body.get("error") or {}
+                result.errors[custom_id] = error.get("message", "unknown error")
+                continue
+
+            # a request without an answer is paid for all the same
+            if body.get("usage") is not None:
+                try:
+                    usage = self._usage(CompletionUsage.model_validate(body["usage"]))
+                except ValueError as e:
+                    self._logger.warning(
+                        "Ignoring malformed usage of batch item '%s': %s", custom_id, e
+                    )
+                else:
+                    result.usage = (
+                        usage if result.usage is None else result.usage + usage
+                    )
+            try:
+                result.vocabularies[custom_id] = self._vocabulary(body)
+            except ValueError as e:
+                result.errors[custom_id] = str(e)
+
+    @staticmethod
+    def _vocabulary(body: dict[str, Any]) -> list[VocabEntry]:
+        """The vocabulary of a chat completion. Raises ValueError without one."""
+        try:
+            choice = body["choices"][0]
+            message = choice["message"]
+        except (KeyError, IndexError, TypeError) as e:
+            raise ValueError(f"malformed response, no message: {e!r}") from e
+        content = message.get("content")
+        if content is None:
+            raise ValueError(
+                f"no answer (finish_reason: {choice.get('finish_reason')}, "
+                f"refusal: {message.get('refusal')})"
+            )
+        try:
+            return read_from_string(content)
+        except Exception as e:
+            raise ValueError(f"cannot parse the answer: {e}") from e
+
+    def _usage(self, openai_usage: CompletionUsage) -> LLMUsage:
+        """Usage at batch prices."""
+        pricing = LLMPricingLoader().get_pricing(self._model)
+        factor = self._backend.price_factor
+        pricing = replace(
+            pricing,
+            cached_input=pricing.cached_input * factor,
+            uncached_input=pricing.uncached_input * factor,
+            reasoning=pricing.reasoning * factor,
+            output=pricing.output * factor,
+        )
+        token_usage = LLMTokenUsage.from_openai_usage(openai_usage)
+        return LLMUsage(
+            self._model, pricing, token_usage, LLMCost.calculate(token_usage, pricing)
+        )
@@ -1,18 +1,52 @@
+import asyncio
+import threading
+import weakref
+
 import openai
 
 from .llm_base import LLMClient
+from .llm_response_cache import LLMResponseCache
 from ..settings import LLMConfig, OpenAIProviderAccess
 
 
+# Async clients (and their HTTP connection pools) shared by all OpenAIClient
+# instances of an endpoint. They are bound to the event loop they run in.
+_async_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[tuple[str, str | None], openai.AsyncOpenAI]
+] = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def _shared_async_client(api_key: str, base_url: str | None) -> openai.AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        if (api_key, base_url) not in clients:
+            clients[api_key, base_url] = openai.AsyncOpenAI(
+                api_key=api_key, base_url=base_url
+            )
+        return clients[api_key, base_url]
+
+
 class OpenAIClient(LLMClient):
     """Any OpenAI-compatible API"""
 
     def __init__(
-        self, llm_config: LLMConfig, openai_access: OpenAIProviderAccess
+        self,
+        llm_config: LLMConfig,
+        openai_access: OpenAIProviderAccess,
+        response_cache: LLMResponseCache | None = None,
     ) -> None:
-        super().__init__(llm_config.options.model)
+        super().__init__(
+            llm_config.options.model,
+            reasoning_effort=llm_config.options.reasoning_effort,
+            response_cache=response_cache,
+            max_concurrency=llm_config.options.max_concurrency,
+            endpoint=openai_access.base_url,
+        )
         api_key = openai_access.api_key.get_secret_value()
-        self._reasoning_effort = llm_config.options.reasoning_effort
+        self._api_key = api_key
+        self._base_url = openai_access.base_url
         self._client = openai.OpenAI(api_key=api_key, base_url=openai_access.base_url)
         endpoint = openai_access.base_url or "[OpenAI-default-endpoint]"
         self._logger.info(
@@ -22,10 +56,7 @@ class OpenAIClient(LLMClient):
             self._reasoning_effort,
         )
 
-    # we don't need retry here, it's handled within the openai sdk
-    def _call_llm(self, instructions: str, input_text: str) -> tuple[str, dict]:
-        self._logger.info("Calling LLM API, this may take a while...")
-
+    def _request_kwargs(self, instructions: str, input_text: str) -> dict:
         kwargs = {
             "model": self._model,
             "messages": [
@@ -35,9 +66,29 @@ class OpenAIClient(LLMClient):
         }
         if self._reasoning_effort:
             kwargs["reasoning_effort"] = self._reasoning_effort
+        return kwargs
+
+    # we don't need retry here, it's handled within the openai sdk
+    def _call_llm(self, instructions: str, input_text: str) -> tuple[str, dict]:
+        self._logger.info("Calling LLM API, this may take a while...")
 
         # using old-style API, because not all providers support the new responses API
-        response = self._client.chat.completions.create(**kwargs)
+        response = self._client.chat.completions.create(
+            **self._request_kwargs(instructions, input_text)
+        )
+        self._logger.info("LLM API call completed")
+
+        return response.choices[0].message.content, response.usage
+
+    async def _call_llm_async(
+        self, instructions: str, input_text: str
+    ) -> tuple[str, dict]:
+        self._logger.info("Calling LLM API (async), this may take a while...")
+
+        client = _shared_async_client(self._api_key, self._base_url)
+        response = await client.chat.completions.create(
+            **self._request_kwargs(instructions, input_text)
+        )
         self._logger.info("LLM API call completed")
 
         return response.choices[0].message.content, response.usage
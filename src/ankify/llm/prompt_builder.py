@@ -2,6 +2,7 @@ from pathlib import Path
 from typing import Any
 
 from ..logging import get_logger
+from ..resource_registry import read_text_file
 from ..settings import Settings
 from .jinja2_prompt_formatter import PromptRenderer
 
@@ -34,7 +35,7 @@ class PromptBuilder:
         if not path.is_file():
             raise ValueError(f"Prompt template file not found at {path.resolve()}")
         self._logger.info("Loaded prompt template from %s", path.resolve())
-        return path.read_text(encoding="utf-8").strip()
+        return read_text_file(path).strip()
 
     def _read_custom_instructions(self) -> str:
         path = self._settings.llm.options.custom_instructions
@@ -0,0 +1,181 @@
+"""
+Translation memory: accepted vocabulary entries stored per term in a local SQLite DB.
+
+A term is the normalized front text of a `language_a` -> `language_b` entry. With the
+`forward_only` note type, the reversed entries the LLM writes right after it belong
+to the same term. Entries are only reused for the same language pair, note type and
+prompt version (the hash of the rendered instructions), so editing the prompt starts
+a fresh memory.
+"""
+
+import hashlib
+import re
+import sqlite3
+import time
+import unicodedata
+from collections.abc import Iterable, Iterator
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+from ..logging import get_logger
+from ..settings import NoteType
+from ..vocab_entry import VocabEntry
+
+
+# SQLite limits the number of parameters of a statement
+_LOOKUP_CHUNK_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    term TEXT NOT NULL,
+    language_a TEXT NOT NULL,
+    language_b TEXT NOT NULL,
+    note_type TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    front TEXT NOT NULL,
+    back TEXT NOT NULL,
+    front_language TEXT NOT NULL,
+    back_language TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (language_a, language_b, note_type, prompt_version, term, position)
+)
+"""
+
+# list markers and trailing punctuation around a term on an input line
+_LINE_DECORATIONS = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+|[\s.,;:!?]+$")
+
+
+def normalize_term(text: str) -> str:
+    """Case-, whitespace- and Unicode-form-insensitive key of a term."""
+    text = unicodedata.normalize("NFC", text)
+    text = _LINE_DECORATIONS.sub("", text)
+    return " ".join(text.split()).casefold()
+
+
+def prompt_version(instructions: str) -> str:
+    return hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:16]
+
+
+class TranslationMemory:
+    def __init__(
+        self,
+        path: Path,
+        language_a: str,
+        language_b: str,
+        note_type: NoteType,
+        prompt_version: str,
+    ) -> None:
+        self.logger = get_logger("ankify.llm.translation_memory")
+        self.path = Path(path).expanduser()
+        self.language_a = language_a.lower()
+        self.language_b = language_b.lower()
+        self.note_type = note_type
+        self.prompt_version = prompt_version
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(_SCHEMA)
+        self.logger.debug("Opened translation memory at %s", self.path.resolve())
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.path)) as connection, connection:
+            yield connection
+
+    @property
+    def _scope(self) -> tuple[str, str, str, str]:
+        return self.language_a, self.language_b, self.note_type, self.prompt_version
+
+    def group_by_term(
+        self, entries: Iterable[VocabEntry]
+    ) -> dict[str, list[VocabEntry]]:
+        """
+        Entries by the term they translate. Reversed entries before the first
+        `language_a` entry have no term and are left out.
+        """
+        groups: dict[str, list[VocabEntry]] = {}
+        current: list[VocabEntry] | None = None
+        for entry in entries:
+            if entry.front_language.lower() == self.language_a:
+                current = groups.setdefault(normalize_term(entry.front), [])
+                current.append(entry)
+            elif entry.front_language.lower() == self.language_b and current:
+                current.append(entry)
+        return groups
+
+    def record(self, entries: list[VocabEntry]) -> int:
+        """Store accepted entries, replacing what was known for their terms."""
+        groups = self.group_by_term(entries)
+        now = time.time()
+        with self._connect() as connection:
+            for term, group in groups.items():
+                connection.execute(
+                    "DELETE FROM translations WHERE language_a = ? AND language_b = ? "
+                    "AND note_type = ? AND prompt_version = ? AND term = ?",
+                    (*self._scope, term),
+                )
+                connection.executemany(
+                    "INSERT INTO translations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            term,
+                            *self._scope,
+                            position,
+                            entry.front,
+                            entry.back,
+                            entry.front_language,
+                            entry.back_language,
+                            now,
+                        )
+                        for position, entry in enumerate(group)
+                    ],
+                )
+        self.logger.info("Recorded %d terms in the translation memory", len(groups))
+        return len(groups)
+
+    def lookup(self, terms: Iterable[str]) -> dict[str, list[VocabEntry]]:
+        """Known entries of the given (normalized) terms."""
+        terms = list(dict.fromkeys(terms))
+        known: dict[str, list[VocabEntry]] = {}
+        with self._connect() as connection:
+            for start in range(0, len(terms), _LOOKUP_CHUNK_SIZE):
+                chunk = terms[start : start + _LOOKUP_CHUNK_SIZE]
+                rows = connection.execute(
+                    "SELECT term, front, back, front_language, back_language "
+                    "FROM translations WHERE language_a = ? AND language_b = ? "
+                    "AND note_type = ? AND prompt_version = ? "
+                    f"AND term IN ({', '.join('?' * len(chunk))}) "
+                    "ORDER BY term, position",
+                    (*self._scope, *chunk),
+                )
+                for term, front, back, front_language, back_language in rows:
+                    known.setdefault(term, []).append(
+                        VocabEntry(front, back, front_language, back_language)
+                    )
+        return known
+
+    def split_known_terms(self, input_text: str) -> tuple[list[VocabEntry], str]:
+        """
+        Entries of the input lines that are known terms, and the rest of the input
+        for the LLM. Lines of running text never match a term and are all kept.
+        """
+        lines = input_text.splitlines()
+        known = self.lookup(normalize_term(line) for line in lines if line.strip())
+
+        entries: list[VocabEntry] = []
+        remaining: list[str] = []
+        used: set[str] = set()
+        for line in lines:
+            term = normalize_term(line)
+            if term not in known:
+                remaining.append(line)
+            elif term not in used:
+                used.add(term)
+                entries.extend(known[term])
+
+        self.logger.info(
+            "Translation memory: %d input terms known, %d lines left for the LLM",
+            len(used),
+            sum(1 for line in remaining if line.strip()),
+        )
+        return entries, "\n".join(remaining)
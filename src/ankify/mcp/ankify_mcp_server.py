@@ -1,23 +1,41 @@
-import json
 import logging
 import os
-import re
+import shutil
 import sys
 import fastmcp
 
-from importlib import resources
-from pathlib import Path
+from collections.abc import Collection
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
 from tempfile import TemporaryDirectory
+from urllib.parse import unquote, urlparse
 from uuid import uuid4
 from typing import Any
-from pydantic import Field
+from pydantic import Field, SecretStr
 from pydantic.fields import FieldInfo
 from dotenv import load_dotenv
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 
-from ankify.anki.anki_deck_creator import AnkiDeckCreator
+from ankify.anki.anki_deck_creator import (
+    AnkiDeckCreator,
+    shard_path,
+    shard_vocabulary,
+)
+from ankify.anki.anki_package_merger import ExistingAnkiPackage
 from ankify.llm.jinja2_prompt_formatter import PromptRenderer
+from ankify.mcp.credentials import azure_subscription_key_from_env
+from ankify.mcp.deck_result_cache import (
+    S3_KEY_PREFIX,
+    DeckResultCache,
+    safe_file_stem,
+)
+from ankify.mcp.s3_deck_uploader import S3DeckUploader
+from ankify.resource_registry import (
+    language_instructions,
+    packaged_text,
+    resolve_language_alias,
+)
 from ankify.settings import (
     AWSProviderAccess,
     AzureProviderAccess,
@@ -26,6 +44,7 @@ from ankify.settings import (
     Text2SpeechSettings,
 )
 from ankify.tsv import read_from_string
+from ankify.tts.tts_circuit_breaker import circuit_breakers
 from ankify.tts.tts_manager import TTSManager
 from ankify.vocab_entry import VocabEntry
 
@@ -116,71 +135,19 @@ else:
 decks_directory.mkdir(parents=True, exist_ok=True)
 
 
-def _upload_to_s3_if_lambda(local_path: Path) -> str:
-    """Upload file to S3 if running in Lambda, otherwise return local file URI."""
-    bucket = os.environ.get("ANKIFY_S3_BUCKET")
-    if not bucket:
-        return local_path.resolve().as_uri()
-
-    import boto3
-
-    region_name = os.environ.get("AWS_REGION", "eu-central-1")
-    s3_client = boto3.client(
-        "s3",
-        # Important for presigned URLs to work
-        # https://repost.aws/questions/QUbQp5wlMXTMOEdu8SZWzC7w/s3-presigned-url-doesn-t-work-from-newly-created-buckets
-        region_name=region_name,
-        endpoint_url=f"https://s3.{region_name}.amazonaws.com",
-    )
-    s3_key = f"decks/{local_path.name}"
-
-    s3_client.upload_file(
-        str(local_path),
-        bucket,
-        s3_key,
-        ExtraArgs={"ContentType": "application/octet-stream"},
-    )
-
-    expiry = int(os.environ.get("ANKIFY_PRESIGNED_URL_EXPIRY", "86400"))
-    presigned_url = s3_client.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": bucket, "Key": s3_key},
-        ExpiresIn=expiry,
-    )
-
-    logger.info("Uploaded deck to S3: %s", presigned_url)
-
-    # Clean up local file after successful upload
-    local_path.unlink(missing_ok=True)
-
-    return presigned_url
-
+# Created once per process, so the boto3 client is shared between requests
+s3_uploader = S3DeckUploader.from_env()
 
-def _get_azure_subscription_key() -> str | None:
-    """Get Azure subscription key from Secrets Manager or environment variable."""
-    # First check for Secrets Manager ARN (Lambda deployment)
-    secret_arn = os.environ.get("ANKIFY_AZURE_SECRET_ARN")
-    if secret_arn:
-        import boto3
 
-        client = boto3.client("secretsmanager")
-        response = client.get_secret_value(SecretId=secret_arn)
-        return response["SecretString"]
-    # Fall back to direct environment variable (local execution)
-    return os.getenv("ANKIFY__PROVIDERS__AZURE__SUBSCRIPTION_KEY")
-
-
-azure_subscription_key = _get_azure_subscription_key()
-if azure_subscription_key:
+# Only the source is resolved here: the secret is fetched on the first request
+# (not on cold start) and re-fetched when its TTL expires, to follow rotation
+azure_subscription_key = azure_subscription_key_from_env()
+if azure_subscription_key is not None:
     tts_settings = Text2SpeechSettings(
         default_provider="azure",
     )
-    provider_settings = ProviderAccessSettings(
-        azure=AzureProviderAccess(
-            subscription_key=azure_subscription_key,
-        ),
-    )
-    logger.info("Using Azure TTS provider: %s", provider_settings.azure)
+    provider_settings = ProviderAccessSettings(azure=AzureProviderAccess())
+    logger.info("Using Azure TTS provider: %s", provider_settings.azure.region)
 elif os.getenv("ANKIFY__PROVIDERS__AWS__ACCESS_KEY_ID"):
     tts_settings = Text2SpeechSettings(
         default_provider="aws",
@@ -200,6 +167,39 @@ else:
     logger.info("Using Edge TTS provider (as no AWS credentials found in env)")
 
 
+# Large vocabularies are split into several packages with subdecks
+# "<deck name>::Part <n>", which are faster to write, upload and import (0 disables)
+shard_max_notes = int(os.environ.get("ANKIFY_DECK_SHARD_MAX_NOTES", "0")) or None
+shard_max_mb = float(os.environ.get("ANKIFY_DECK_SHARD_MAX_MB", "0")) or None
+shard_max_bytes = int(shard_max_mb * 1024 * 1024) if shard_max_mb else None
+
+
+# Repeated tool calls with identical arguments reuse the already packaged deck.
+# TTS settings are part of the key, so a deployment with another voice/provider
+# does not pick up decks synthesized by the previous one.
+deck_cache_fingerprint = tts_settings.model_dump_json()
+if shard_max_notes or shard_max_bytes:
+    deck_cache_fingerprint += f"|shards:{shard_max_notes}:{shard_max_bytes}"
+deck_cache = DeckResultCache.from_env(
+    decks_directory=decks_directory,
+    s3_uploader=s3_uploader,
+    fingerprint=deck_cache_fingerprint,
+)
+
+
+def get_provider_settings() -> ProviderAccessSettings:
+    """Provider settings with the current value of the cached Azure key."""
+    if azure_subscription_key is None:
+        return provider_settings
+    return provider_settings.model_copy(
+        update={
+            "azure": provider_settings.azure.model_copy(
+                update={"subscription_key": SecretStr(azure_subscription_key.get())}
+            )
+        }
+    )
+
+
 def _fix_field_default_fastmcp_bug(value: Any) -> Any:
     if isinstance(value, FieldInfo):
         return value.default
@@ -217,7 +217,7 @@ def _deck_prompt(note_type: NoteType | str, deck_name: str) -> str:
 Create Anki deck from the vocabulary table with the note type: `{note_type}` and deck name: `{deck_name}`.
 Use the MCP tool `convert_TSV_to_Anki_deck` for this.
 If there are multiple vocabulary table versions in the chat, use the latest/actual/user-approved one.
-Always put a full valid explicit clickable URI of the generated .apkg file in your answer, not just the file name or path, even if the file is local. That URI is returned to you by the MCP tool.
+Always put full valid explicit clickable URIs of all the generated .apkg files in your answer, not just the file names or paths, even if the files are local. The URIs are returned to you by the MCP tool; a large deck is split into several files (parts), which all have to be imported.
 """
 
 
@@ -272,26 +272,7 @@ def deck_fb(
 
 
 def _resolve_language_alias(language: str) -> str:
-    language = language.lower()
-    # todo - all these configs (and tts manager) should be kept as singletons
-    aliases_content = (
-        resources.files("ankify.resources")
-        .joinpath("language_aliases.json")
-        .read_text(encoding="utf-8")
-    )
-    aliases: dict[str, str] = json.loads(aliases_content)
-    if language in aliases:
-        return aliases[language]
-    return language
-
-
-def _resolve_instructions_for_language(language: str) -> str:
-    instructions_path = resources.files(
-        "ankify.resources.prompts.language_specific"
-    ).joinpath(f"{language.lower()}.md")
-    if instructions_path.is_file():
-        return instructions_path.read_text(encoding="utf-8")
-    return ""
+    return resolve_language_alias(language)
 
 
 def _vocab_prompt(
@@ -321,18 +302,26 @@ def _vocab_prompt(
     if note_type not in ["forward_only", "forward_and_backward"]:
         raise ValueError("Invalid note type")
 
-    template_content = (
-        resources.files("ankify.resources.prompts")
-        .joinpath("mcp_prompt_template.md.j2")
-        .read_text(encoding="utf-8")
+    return _render_vocab_prompt(
+        _resolve_language_alias(language_a),
+        _resolve_language_alias(language_b),
+        note_type,
+        custom_instructions,
     )
-    language_a = _resolve_language_alias(language_a)
-    language_b = _resolve_language_alias(language_b)
-    language_a_instructions = _resolve_instructions_for_language(language_a)
-    language_b_instructions = _resolve_instructions_for_language(language_b)
+
+
+@lru_cache(maxsize=256)
+def _render_vocab_prompt(
+    language_a: str, language_b: str, note_type: str, custom_instructions: str
+) -> str:
+    """Rendered once per distinct combination of normalized arguments."""
+    language_a_instructions = language_instructions(language_a)
+    language_b_instructions = language_instructions(language_b)
 
     return PromptRenderer.render(
-        template_content=template_content,
+        template_content=packaged_text(
+            "ankify.resources.prompts", "mcp_prompt_template.md.j2"
+        ),
         context={
             "language_a": language_a,
             "language_b": language_b,
@@ -404,8 +393,15 @@ def vocab_ge_en_fb() -> str:
 
 @mcp.custom_route("/health", methods=["GET"])
 async def health_check(request: Request):
-    """Health check endpoint for Lambda Web Adapter."""
-    return JSONResponse({"status": "healthy"})
+    """
+    Health check endpoint for Lambda Web Adapter.
+    Always 200 (the server itself is up); "degraded" while a TTS provider circuit is open.
+    """
+    circuits = circuit_breakers.snapshot()
+    degraded = any(c["state"] != "closed" for c in circuits.values())
+    return JSONResponse(
+        {"status": "degraded" if degraded else "healthy", "tts_circuits": circuits}
+    )
 
 
 @mcp.tool()
@@ -419,7 +415,7 @@ def convert_TSV_to_Anki_deck(
     deck_name: str = Field(
         description="Name of the Anki deck (it's not the file name, it's the deck name within Anki)"
     ),
-) -> str:
+) -> list[str]:
     """
     Creates Anki deck (.apkg) from TSV vocabulary (string).
 
@@ -439,7 +435,8 @@ def convert_TSV_to_Anki_deck(
         deck_name: name of the Anki deck (it's not the file name, it's the deck name within Anki)
 
     Returns:
-        URI of the generated .apkg file
+        URIs of the generated .apkg files: one, or one per part of a large deck
+        (subdecks `<deck_name>::Part <n>`)
     """
     logger.info(
         "Received TOOL request: convert_TSV_to_Anki_deck: note_type '%s', deck_name '%s'",
@@ -454,24 +451,111 @@ def convert_TSV_to_Anki_deck(
         logger.error(msg)
         raise ValueError(msg)
 
+    file_name = deck_cache.file_name(vocab_entries, note_type, deck_name)
+    cached_uris = deck_cache.get_shards(file_name)
+    if cached_uris is not None:
+        return cached_uris
+
     with TemporaryDirectory(dir=decks_directory, prefix="media_") as audio_dir:
         synthesize_audio(vocab_entries, Path(audio_dir))
-        output_file = package_anki_deck(
-            vocab_entries, decks_directory, deck_name, note_type
+        return package_anki_deck(
+            vocab_entries, decks_directory, deck_name, note_type, file_name
         )
 
-    return _upload_to_s3_if_lambda(output_file)
 
+@mcp.tool()
+def add_TSV_to_Anki_deck(
+    tsv_vocabulary: str = Field(
+        description="String with the vocabulary to add, as a table in TSV format"
+    ),
+    deck_uri: str = Field(
+        description="URI of the .apkg file returned before by `convert_TSV_to_Anki_deck` or `add_TSV_to_Anki_deck`"
+    ),
+) -> str:
+    """
+    Adds vocabulary to an Anki deck (.apkg) created before with this server.
+
+    Only the rows that are not in the deck yet are added and get speech synthesized;
+    the audio of the deck is reused. The deck name and note type stay the same.
+    The updated deck is a new file, the given one is not changed.
+
+    Args:
 
-def synthesize_audio(vocab_entries: list[VocabEntry], audio_dir: Path) -> None:
+        tsv_vocabulary: string with vocabulary in TSV format:
+            `front_text<tab>back_text<tab>front_language<tab>back_language<newline>...`
+
+        deck_uri: URI of the deck returned by `convert_TSV_to_Anki_deck` or `add_TSV_to_Anki_deck`
+            (not a part of a deck that was split into several files)
+
+    Returns:
+        URI of the updated .apkg file
+    """
+    logger.info("Received TOOL request: add_TSV_to_Anki_deck: deck_uri '%s'", deck_uri)
+
+    try:
+        vocab_entries: list[VocabEntry] = read_from_string(tsv_vocabulary)
+    except Exception as e:
+        msg = f"Failed to parse vocabulary TSV: {e}"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    with TemporaryDirectory(dir=decks_directory, prefix="merge_") as work_dir:
+        existing = ExistingAnkiPackage.open(fetch_anki_deck(deck_uri, Path(work_dir)))
+        new_entries = existing.new_entries(vocab_entries)
+        logger.info(
+            "%d of %d vocabulary entries are not in the deck yet",
+            len(new_entries),
+            len(vocab_entries),
+        )
+        synthesize_audio(new_entries, Path(work_dir), existing_media=existing.media)
+        file_name = f"{safe_file_stem(existing.deck_name)}-{uuid4().hex}.apkg"
+        return package_merged_anki_deck(
+            existing, new_entries, decks_directory, file_name
+        )
+
+
+def fetch_anki_deck(deck_uri: str, work_dir: Path) -> Path:
+    """
+    Local path of a deck packaged before by this server. Only the file name is taken
+    from the URI, so nothing outside the decks directory or bucket prefix is read.
+    """
+    file_name = PurePosixPath(unquote(urlparse(deck_uri).path)).name
+    if not file_name.endswith(".apkg") or file_name.startswith("."):
+        raise ValueError(f"Not a URI of an Anki deck: {deck_uri}")
+
+    if s3_uploader is None:
+        path = decks_directory / file_name
+        if not path.is_file():
+            raise ValueError(f"Deck not found (it may have expired): {deck_uri}")
+        return path
+
+    path = work_dir / file_name
+    try:
+        with open(path, "wb") as f:
+            s3_uploader.download(S3_KEY_PREFIX + file_name, f)
+    except Exception as e:
+        msg = f"Deck not found (it may have expired): {deck_uri}"
+        logger.error("%s: %s", msg, e)
+        raise ValueError(msg)
+    return path
+
+
+def synthesize_audio(
+    vocab_entries: list[VocabEntry],
+    audio_dir: Path,
+    existing_media: Collection[str] = (),
+) -> None:
     logger.info("Synthesizing audio to %s", audio_dir)
     try:
         tts_manager = TTSManager(
             tts_settings=tts_settings,
-            provider_settings=provider_settings,
+            provider_settings=get_provider_settings(),
         )
-        tts_manager.synthesize(vocab_entries, audio_dir)
+        tts_manager.synthesize(vocab_entries, audio_dir, existing_media=existing_media)
     except Exception as e:
+        if azure_subscription_key is not None:
+            # the key may have been rotated, re-fetch it on the next request
+            azure_subscription_key.invalidate()
         msg = f"TTS synthesis failed: {e}"
         logger.error(msg)
         raise RuntimeError(msg)
@@ -482,23 +566,146 @@ def package_anki_deck(
     decks_directory: Path,
     deck_name: str,
     note_type: NoteType,
-) -> Path:
-    safe_deck_name = re.sub(r"\s+", "_", deck_name)
-    safe_deck_name = re.sub(r"[^a-zA-Z0-9_-]", "", safe_deck_name)
-    if not safe_deck_name:
-        safe_deck_name = "Ankify"
-    output_file = decks_directory / f"{safe_deck_name}-{uuid4()}.apkg"
-    logger.info("Packaging Anki deck to %s", output_file)
+    file_name: str,
+) -> list[str]:
+    """
+    Package the deck and return its URIs: presigned S3 URLs if an S3 bucket is configured
+    (a single package is uploaded while it is being written), otherwise local file URIs.
+    A deck over the shard limits is split into several packages.
+    """
+    shards = shard_vocabulary(vocab_entries, shard_max_notes, shard_max_bytes)
+    if len(shards) > 1:
+        return package_anki_deck_shards(
+            vocab_entries, shards, decks_directory, deck_name, note_type, file_name
+        )
+    return [
+        _package_single_anki_deck(
+            vocab_entries, decks_directory, deck_name, note_type, file_name
+        )
+    ]
+
+
+def package_anki_deck_shards(
+    vocab_entries: list[VocabEntry],
+    shards: list[list[VocabEntry]],
+    decks_directory: Path,
+    deck_name: str,
+    note_type: NoteType,
+    file_name: str,
+) -> list[str]:
+    """
+    Package the parts (see `shard_vocabulary`) in parallel to temporary files, then
+    publish them with part 1 last, as the deck cache takes part 1 as the sign of a
+    complete deck.
+    """
+    tmp_prefix = f".{file_name}.{uuid4()}"
+    creator = AnkiDeckCreator(
+        output_file=decks_directory / f"{tmp_prefix}.tmp",
+        deck_name=deck_name,
+        note_type=note_type,
+    )
+    try:
+        tmp_files = creator.write_anki_deck_shards(vocab_entries, shards=shards)
+        uris: list[str] = []
+        for index in range(len(tmp_files), 0, -1):
+            name = shard_path(Path(file_name), index).name
+            uris.append(_publish_package(tmp_files[index - 1], decks_directory, name))
+        uris.reverse()
+        return uris
+    except Exception as e:
+        msg = f"Anki deck packaging failed: {e}"
+        logger.error(msg)
+        raise RuntimeError(msg)
+    finally:
+        for tmp_file in decks_directory.glob(f"{tmp_prefix}.*"):
+            tmp_file.unlink(missing_ok=True)
+
+
+def _publish_package(package_file: Path, decks_directory: Path, file_name: str) -> str:
+    if s3_uploader is None:
+        output_file = decks_directory / file_name
+        os.replace(package_file, output_file)
+        logger.info("Packaged Anki deck to %s", output_file)
+        return output_file.resolve().as_uri()
+
+    s3_key = S3_KEY_PREFIX + file_name
+    logger.info("Uploading Anki deck to s3://%s/%s", s3_uploader.bucket, s3_key)
+    with open(package_file, "rb") as src, s3_uploader.open_writer(s3_key) as stream:
+        shutil.copyfileobj(src, stream)
+    presigned_url = s3_uploader.presigned_url(s3_key)
+    logger.info("Uploaded deck to S3: %s", presigned_url)
+    return presigned_url
+
+
+def _package_single_anki_deck(
+    vocab_entries: list[VocabEntry],
+    decks_directory: Path,
+    deck_name: str,
+    note_type: NoteType,
+    file_name: str,
+) -> str:
+    output_file = decks_directory / file_name
     try:
+        if s3_uploader is None:
+            # write under a unique name and rename, so that a concurrent identical
+            # request never sees (or overwrites) a partially written package
+            tmp_file = decks_directory / f".{file_name}.{uuid4()}.tmp"
+            creator = AnkiDeckCreator(
+                output_file=tmp_file, deck_name=deck_name, note_type=note_type
+            )
+            logger.info("Packaging Anki deck to %s", output_file)
+            try:
+                creator.write_anki_deck(vocab_entries)
+                os.replace(tmp_file, output_file)
+            finally:
+                tmp_file.unlink(missing_ok=True)
+            return output_file.resolve().as_uri()
+
         creator = AnkiDeckCreator(
             output_file=output_file, deck_name=deck_name, note_type=note_type
         )
-        creator.write_anki_deck(vocab_entries)
+        s3_key = S3_KEY_PREFIX + file_name
+        logger.info("Packaging Anki deck to s3://%s/%s", s3_uploader.bucket, s3_key)
+        with s3_uploader.open_writer(s3_key) as stream:
+            creator.write_anki_deck(vocab_entries, output_stream=stream)
+        presigned_url = s3_uploader.presigned_url(s3_key)
+        logger.info("Uploaded deck to S3: %s", presigned_url)
+        return presigned_url
+    except Exception as e:
+        msg = f"Anki deck packaging failed: {e}"
+        logger.error(msg)
+        raise RuntimeError(msg)
+
+
+def package_merged_anki_deck(
+    existing: ExistingAnkiPackage,
+    vocab_entries: list[VocabEntry],
+    decks_directory: Path,
+    file_name: str,
+) -> str:
+    """Package the existing deck with the new entries added and return its URI."""
+    output_file = decks_directory / file_name
+    creator = AnkiDeckCreator(
+        output_file=output_file,
+        deck_name=existing.deck_name,
+        note_type=existing.note_type,
+        writer="sqlite",
+        package_format=existing.package_format,
+    )
+    try:
+        if s3_uploader is None:
+            creator.merge_anki_deck(existing, vocab_entries)
+            return output_file.resolve().as_uri()
+
+        s3_key = S3_KEY_PREFIX + file_name
+        logger.info("Packaging Anki deck to s3://%s/%s", s3_uploader.bucket, s3_key)
+        with s3_uploader.open_writer(s3_key) as stream:
+            creator.merge_anki_deck(existing, vocab_entries, output_stream=stream)
+        return s3_uploader.presigned_url(s3_key)
     except Exception as e:
         msg = f"Anki deck packaging failed: {e}"
         logger.error(msg)
         raise RuntimeError(msg)
-    return output_file
 
 
 async def _test_vocab() -> None:
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from ankify.logging import get_logger
+
+
+logger = get_logger("ankify.mcp.credentials")
+
+
+class CachedSecret:
+    """
+    Secret value fetched lazily on first use and cached in memory for `ttl_seconds`.
+
+    During the last `refresh_ahead_seconds` of the TTL the cached value is still
+    returned, while a background thread fetches a new one, so rotated secrets are
+    picked up without blocking requests. After the TTL the value is re-fetched
+    synchronously; if that fails, the stale value is used and the error is logged.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], str],
+        name: str,
+        ttl_seconds: float = 3600,
+        refresh_ahead_seconds: float = 300,
+    ) -> None:
+        self._fetch = fetch
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.refresh_ahead_seconds = min(refresh_ahead_seconds, ttl_seconds)
+        self._value: str | None = None
+        self._fetched_at = float("-inf")
+        self._lock = threading.Lock()
+        self._refresh_thread: threading.Thread | None = None
+
+    def get(self) -> str:
+        age = time.monotonic() - self._fetched_at
+        if self._value is not None and age < self.ttl_seconds:
+            if age >= self.ttl_seconds - self.refresh_ahead_seconds:
+                self._refresh_in_background()
+            return self._value
+
+        with self._lock:
+            # another thread may have fetched it while we were waiting
+            if self._value is not None and (
+                time.monotonic() - self._fetched_at < self.ttl_seconds
+            ):
+                return self._value
+            try:
+                self._refresh()
+            except Exception as e:
+                if self._value is None:
+                    raise
+                logger.warning(
+                    "Failed to refresh %s, using stale value: %s", self.name, e
+                )
+            return self._value
+
+    def invalidate(self) -> None:
+        """Force a fetch on the next `get` (e.g. after an authentication error)."""
+        self._fetched_at = float("-inf")
+
+    def _refresh(self) -> None:
+        value = self._fetch()
+        self._value = value
+        self._fetched_at = time.monotonic()
+        logger.debug("Fetched %s", self.name)
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._background_refresh,
+                name=f"ankify-refresh-{self.name}",
+                daemon=True,
+            )
+            self._refresh_thread.start()
+
+    def _background_refresh(self) -> None:
+        try:
+            with self._lock:
+                self._refresh()
+        except Exception as e:
+            logger.warning("Background refresh of %s failed: %s", self.name, e)
+
+
+def secrets_manager_fetcher(secret_id: str) -> Callable[[], str]:
+    """Fetch a secret string from AWS Secrets Manager; the client is created on first use."""
+    client = None
+
+    def fetch() -> str:
+        nonlocal client
+        if client is None:
+            import boto3
+
+            client = boto3.client("secretsmanager")
+        return client.get_secret_value(SecretId=secret_id)["SecretString"]
+
+    return fetch
+
+
+def file_fetcher(path: Path) -> Callable[[], str]:
+    """Read a secret from a local file (a stand-in for Secrets Manager, re-read on refresh)."""
+    return lambda: path.read_text(encoding="utf-8").strip()
+
+
+def env_fetcher(name: str) -> Callable[[], str]:
+    def fetch() -> str:
+        value = os.environ.get(name)
+        if not value:
+            raise KeyError(f"Environment variable {name} is not set")
+        return value
+
+    return fetch
+
+
+def azure_subscription_key_from_env() -> CachedSecret | None:
+    """
+    Azure subscription key source, from the first of:
+    `ANKIFY_AZURE_SECRET_ARN` (Secrets Manager, Lambda deployment),
+    `ANKIFY_AZURE_SECRET_FILE` (local file),
+    `ANKIFY__PROVIDERS__AZURE__SUBSCRIPTION_KEY` (environment variable).
+    Nothing is fetched here; the TTL is set with `ANKIFY_SECRET_TTL` (seconds).
+    """
+    if secret_arn := os.environ.get("ANKIFY_AZURE_SECRET_ARN"):
+        fetch = secrets_manager_fetcher(secret_arn)
+    elif secret_file := os.environ.get("ANKIFY_AZURE_SECRET_FILE"):
+        fetch = file_fetcher(Path(secret_file))
+    elif os.environ.get("ANKIFY__PROVIDERS__AZURE__SUBSCRIPTION_KEY"):
+        fetch = env_fetcher("ANKIFY__PROVIDERS__AZURE__SUBSCRIPTION_KEY")
+    else:
+        return None
+    return CachedSecret(
+        fetch,
+        name="Azure subscription key",
+        ttl_seconds=float(os.environ.get("ANKIFY_SECRET_TTL", "3600")),
+    )
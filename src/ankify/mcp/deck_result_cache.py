@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from ankify.anki.anki_deck_creator import shard_path
+from ankify.logging import get_logger
+from ankify.mcp.s3_deck_uploader import S3DeckUploader
+from ankify.settings import NoteType
+from ankify.vocab_entry import VocabEntry
+
+
+logger = get_logger("ankify.mcp.deck_result_cache")
+
+# Matches the 1-day expiration lifecycle rule of the decks bucket
+DEFAULT_TTL_SECONDS = 86400
+S3_KEY_PREFIX = "decks/"
+
+
+def safe_file_stem(deck_name: str) -> str:
+    stem = re.sub(r"\s+", "_", deck_name)
+    stem = re.sub(r"[^a-zA-Z0-9_-]", "", stem)
+    return stem or "Ankify"
+
+
+class DeckResultCache:
+    """
+    Content-addressed cache of packaged decks.
+
+    The package file name contains a hash of the parsed vocabulary, note type, deck name
+    and a fingerprint of the TTS settings, so a repeated tool call with the same
+    arguments finds the package written by the previous call (possibly by another
+    Lambda instance) and gets a freshly signed URL instead of re-synthesizing.
+    Packages older than `ttl_seconds` are ignored, since the bucket may delete them.
+    """
+
+    def __init__(
+        self,
+        decks_directory: Path,
+        s3_uploader: S3DeckUploader | None = None,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        fingerprint: str = "",
+    ) -> None:
+        self.decks_directory = decks_directory
+        self.s3_uploader = s3_uploader
+        self.ttl_seconds = ttl_seconds
+        self.fingerprint = fingerprint
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def file_name(
+        self, vocab_entries: list[VocabEntry], note_type: NoteType, deck_name: str
+    ) -> str:
+        """
+        Deterministic package file name. The hash covers the parsed entries,
+        so whitespace and line ending differences of the TSV do not matter.
+        """
+        payload = json.dumps(
+            {
+                "entries": [
+                    [e.front, e.back, e.front_language, e.back_language]
+                    for e in vocab_entries
+                ],
+                "note_type": note_type,
+                "deck_name": deck_name,
+                "fingerprint": self.fingerprint,
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+        return f"{safe_file_stem(deck_name)}-{digest}.apkg"
+
+    def get(self, file_name: str) -> str | None:
+        """Return the URI of a previously packaged deck, if it is still valid."""
+        if not self.enabled:
+            return None
+        try:
+            if self.s3_uploader is not None:
+                return self._get_s3(S3_KEY_PREFIX + file_name)
+            return self._get_local(self.decks_directory / file_name)
+        except Exception as e:
+            logger.warning("Deck cache lookup failed for %s: %s", file_name, e)
+            return None
+
+    def get_shards(self, file_name: str) -> list[str] | None:
+        """
+        URIs of a previously packaged deck: the single package, or all parts
+        of a deck split with `shard_path` names. Part 1 is published last,
+        so when it is found, the other parts are there too.
+        """
+        uri = self.get(file_name)
+        if uri is not None:
+            return [uri]
+        uris: list[str] = []
+        while True:
+            uri = self.get(shard_path(Path(file_name), len(uris) + 1).name)
+            if uri is None:
+                return uris or None
+            uris.append(uri)
+
+    def _get_s3(self, key: str) -> str | None:
+        age = self.s3_uploader.object_age(key)
+        if age is None or age >= self.ttl_seconds:
+            return None
+        # the URL must not outlive the object
+        remaining = int(self.ttl_seconds - age)
+        expires_in = min(self.s3_uploader.presigned_url_expiry, remaining)
+        logger.info("Deck cache hit: s3://%s/%s", self.s3_uploader.bucket, key)
+        return self.s3_uploader.presigned_url(key, expires_in=max(1, expires_in))
+
+    def _get_local(self, path: Path) -> str | None:
+        try:
+            age = time.time() - path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if age >= self.ttl_seconds:
+            return None
+        logger.info("Deck cache hit: %s", path)
+        return path.resolve().as_uri()
+
+    @classmethod
+    def from_env(
+        cls,
+        decks_directory: Path,
+        s3_uploader: S3DeckUploader | None,
+        fingerprint: str = "",
+    ) -> "DeckResultCache":
+        """TTL comes from `ANKIFY_DECK_CACHE_TTL` (seconds, 0 disables the cache)."""
+        return cls(
+            decks_directory=decks_directory,
+            s3_uploader=s3_uploader,
+            ttl_seconds=int(
+                os.environ.get("ANKIFY_DECK_CACHE_TTL", str(DEFAULT_TTL_SECONDS))
+            ),
+            fingerprint=fingerprint,
+        )
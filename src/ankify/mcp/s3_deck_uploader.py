@@ -0,0 +1,260 @@
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, BinaryIO
+
+from ankify.logging import get_logger
+
+
+logger = get_logger("ankify.mcp.s3_deck_uploader")
+
+# S3 requires all parts but the last to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only, non-seekable stream that uploads to S3 while it is being written.
+
+    Data is cut into parts of `part_size` bytes, each uploaded in the background
+    as soon as it is complete, with at most `max_concurrency` parts in flight.
+    Objects smaller than one part are sent with a single PutObject on close.
+    If the `with` block exits with an exception or the upload fails,
+    nothing is stored: the multipart upload is aborted.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        bucket: str,
+        key: str,
+        part_size: int,
+        max_concurrency: int,
+        extra_args: dict[str, str] | None = None,
+    ) -> None:
+        super().__init__()
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = part_size
+        self._max_concurrency = max_concurrency
+        self._extra_args = extra_args or {}
+
+        self._buffer = bytearray()
+        self._bytes_written = 0
+        self._upload_id: str | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: deque[Future[dict[str, Any]]] = deque()
+        self._parts: list[dict[str, Any]] = []
+        self._aborted = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise ValueError("write to closed S3MultipartWriter")
+        self._buffer += data
+        self._bytes_written += len(data)
+        while len(self._buffer) >= self._part_size:
+            part = bytes(self._buffer[: self._part_size])
+            del self._buffer[: self._part_size]
+            self._submit_part(part)
+        return len(data)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.abort()
+        self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if not self._aborted:
+                self._finish()
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self._buffer.clear()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            super().close()
+
+    def abort(self) -> None:
+        """Cancel the upload, discarding the parts uploaded so far."""
+        self._aborted = True
+        if self._upload_id is None:
+            return
+        for future in self._pending:
+            future.cancel()
+        try:
+            self._client.abort_multipart_upload(
+                Bucket=self._bucket, Key=self._key, UploadId=self._upload_id
+            )
+        except Exception as e:
+            logger.warning("Failed to abort multipart upload of %s: %s", self._key, e)
+        self._upload_id = None
+
+    def _submit_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            response = self._client.create_multipart_upload(
+                Bucket=self._bucket, Key=self._key, **self._extra_args
+            )
+            self._upload_id = response["UploadId"]
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_concurrency,
+                thread_name_prefix="ankify-s3-upload",
+            )
+
+        # backpressure: keep at most max_concurrency parts in memory
+        while len(self._pending) >= self._max_concurrency:
+            self._parts.append(self._pending.popleft().result())
+
+        part_number = len(self._parts) + len(self._pending) + 1
+        self._pending.append(
+            self._executor.submit(self._upload_part, part_number, data)
+        )
+
+    def _upload_part(self, part_number: int, data: bytes) -> dict[str, Any]:
+        response = self._client.upload_part(
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def _finish(self) -> None:
+        if self._upload_id is None:
+            self._client.put_object(
+                Bucket=self._bucket,
+                Key=self._key,
+                Body=bytes(self._buffer),
+                **self._extra_args,
+            )
+        else:
+            if self._buffer:
+                self._submit_part(bytes(self._buffer))
+            self._complete()
+        logger.debug(
+            "Uploaded %d bytes to s3://%s/%s in %d part(s)",
+            self._bytes_written,
+            self._bucket,
+            self._key,
+            max(1, len(self._parts)),
+        )
+
+    def _complete(self) -> None:
+        while self._pending:
+            self._parts.append(self._pending.popleft().result())
+        self._client.complete_multipart_upload(
+            Bucket=self._bucket,
+            Key=self._key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+
+
+class S3DeckUploader:
+    """
+    Uploads generated decks to S3 and returns presigned download URLs.
+    The boto3 client is created once and shared between requests (it is thread-safe).
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        region_name: str,
+        presigned_url_expiry: int = 86400,
+        part_size: int = 8 * 1024 * 1024,
+        max_concurrency: int = 4,
+        endpoint_url: str | None = None,
+        client: Any | None = None,
+    ) -> None:
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(
+                f"S3 multipart part size must be at least {MIN_PART_SIZE} bytes"
+            )
+        self.bucket = bucket
+        self.region_name = region_name
+        self.presigned_url_expiry = presigned_url_expiry
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        # Regional endpoint is important for presigned URLs to work
+        # https://repost.aws/questions/QUbQp5wlMXTMOEdu8SZWzC7w/s3-presigned-url-doesn-t-work-from-newly-created-buckets
+        self.endpoint_url = endpoint_url or f"https://s3.{region_name}.amazonaws.com"
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "S3DeckUploader | None":
+        """Create an uploader if `ANKIFY_S3_BUCKET` is set, otherwise return None."""
+        bucket = os.environ.get("ANKIFY_S3_BUCKET")
+        if not bucket:
+            return None
+        return cls(
+            bucket=bucket,
+            region_name=os.environ.get("AWS_REGION", "eu-central-1"),
+            presigned_url_expiry=int(
+                os.environ.get("ANKIFY_PRESIGNED_URL_EXPIRY", "86400")
+            ),
+            part_size=int(os.environ.get("ANKIFY_S3_UPLOAD_PART_SIZE_MB", "8"))
+            * 1024
+            * 1024,
+            max_concurrency=int(os.environ.get("ANKIFY_S3_UPLOAD_CONCURRENCY", "4")),
+            endpoint_url=os.environ.get("ANKIFY_S3_ENDPOINT_URL"),
+        )
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+
+                    self._client = boto3.client(
+                        "s3",
+                        region_name=self.region_name,
+                        endpoint_url=self.endpoint_url,
+                    )
+        return self._client
+
+    def open_writer(self, key: str) -> S3MultipartWriter:
+        """Open a stream that uploads everything written to it to `key`."""
+        return S3MultipartWriter(
+            client=self.client,
+            bucket=self.bucket,
+            key=key,
+            part_size=self.part_size,
+            max_concurrency=self.max_concurrency,
+            extra_args={"ContentType": "application/octet-stream"},
+        )
+
+    def download(self, key: str, file: BinaryIO) -> None:
+        """Download `key` into a binary stream, e.g. a deck to add notes to."""
+        self.client.download_fileobj(self.bucket, key, file)
+
+    def presigned_url(self, key: str, expires_in: int | None = None) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires_in or self.presigned_url_expiry,
+        )
+
+    def object_age(self, key: str) -> float | None:
+        """Seconds since `key` was written, or None if it does not exist."""
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return None
+            raise
+        return time.time() - response["LastModified"].timestamp()
@@ -1,3 +1,5 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 import sys
@@ -6,11 +8,17 @@ from rich.console import Console
 from rich.prompt import Confirm
 from tempfile import TemporaryDirectory
 
-from .anki.anki_deck_creator import AnkiDeckCreator
+from .anki.anki_connect import AnkiConnectClient, AnkiConnectDeckWriter
+from .anki.anki_deck_creator import AnkiDeckCreator, deck_files
+from .anki.anki_package_merger import ExistingAnkiPackage
+from .anki.known_notes import KnownNotesIndex
+from .tts.tts_audio_cache import AudioCacheSeeder, find_packages
 from .vocab_entry import VocabEntry
 from .tsv import read_from_file, write_to_file
-from .llm.llm_factory import create_llm_client
+from .llm.llm_factory import create_llm_batch_runner, create_llm_client
+from .llm.input_filter import InputFilter
 from .llm.prompt_builder import PromptBuilder
+from .llm.translation_memory import TranslationMemory, prompt_version
 from .logging import get_logger
 from .observability import MLflowTracker
 from .settings import Settings
@@ -28,6 +36,15 @@ class Pipeline:
         self.logger.debug("Loaded LLM instructions:\n%s", self.prompt)
 
         self.llm = create_llm_client(settings)
+        self.translation_memory = None
+        if settings.translation_memory.path:
+            self.translation_memory = TranslationMemory(
+                path=settings.translation_memory.path,
+                language_a=settings.language_a,
+                language_b=settings.language_b,
+                note_type=settings.note_type,
+                prompt_version=prompt_version(self.prompt),
+            )
         self.tts = TTSManager(
             tts_settings=settings.tts,
             provider_settings=settings.providers,
@@ -36,27 +53,96 @@ class Pipeline:
             output_file=settings.anki_output,
             deck_name=settings.anki_deck_name,
             note_type=settings.note_type,
+            writer=settings.anki_writer,
+            package_format=settings.anki_package_format,
         )
+        self.known_notes = None
+        if settings.known_notes:
+            self.known_notes = KnownNotesIndex.from_files(settings.known_notes)
+        self.input_filter = None
+        if settings.input_filter.enabled:
+            self.input_filter = self._create_input_filter()
 
     def run(self) -> None:
+        if self.settings.seed_audio_cache:
+            self._seed_audio_cache()
+            return
+
         with self.mlflow_tracker.run_context():
-            self._run_pipeline()
+            if self.settings.batch.input_dir:
+                self._run_batch()
+            else:
+                self._run_pipeline()
 
     def _run_pipeline(self) -> None:
         vocab = self._load_or_generate_vocabulary()
 
-        if not self.settings.anki_output:
+        if not (self.settings.anki_output or self.settings.anki_connect.enabled):
             self.logger.info(
                 "No anki_output specified; skipping TTS and Anki packaging"
             )
             return
 
-        with TemporaryDirectory(prefix="ankify_media_") as audio_dir:
-            self.tts.synthesize(vocab, Path(audio_dir))
-            self._build_anki_deck(vocab)
+        if self.known_notes is not None:
+            vocab = self.known_notes.drop_known(vocab)
+
+        if self.settings.anki_connect.enabled:
+            self._push_to_anki(vocab, self.settings.anki_deck_name)
+        elif self.settings.anki_merge_into:
+            self._merge_into_anki_deck(vocab, Path(self.settings.anki_merge_into))
+        else:
+            with self._audio_dir() as audio_dir:
+                self.tts.synthesize(vocab, Path(audio_dir))
+                self._build_anki_deck(vocab)
 
         self._ask_and_save_result_to_few_shot_examples()
 
+    def _run_batch(self) -> None:
+        """All inputs of the batch directory go to the LLM as one batch job."""
+        batch = self.settings.batch
+        input_dir = Path(batch.input_dir)
+        inputs = {
+            path.stem: path.read_text(encoding="utf-8")
+            for path in sorted(input_dir.glob("*.txt"))
+        }
+        if not inputs:
+            raise ValueError(f"No .txt input files found in {input_dir.resolve()}")
+
+        result = create_llm_batch_runner(self.settings).run(self.prompt, inputs)
+        for name, error in result.errors.items():
+            self.logger.error("No vocabulary generated for '%s': %s", name, error)
+
+        output_dir = Path(batch.output_dir)
+        for name, vocab in result.vocabularies.items():
+            write_to_file(vocab, output_dir / f"{name}.tsv")
+            if not (self.settings.anki_output or self.settings.anki_connect.enabled):
+                continue
+            if self.known_notes is not None:
+                vocab = self.known_notes.drop_known(vocab)
+            if self.settings.anki_connect.enabled:
+                self._push_to_anki(vocab, f"{self.settings.anki_deck_name}::{name}")
+                continue
+            with self._audio_dir() as audio_dir:
+                self.tts.synthesize(vocab, Path(audio_dir))
+                AnkiDeckCreator(
+                    output_file=output_dir / f"{name}.apkg",
+                    deck_name=f"{self.settings.anki_deck_name}::{name}",
+                    note_type=self.settings.note_type,
+                    writer=self.settings.anki_writer,
+                    package_format=self.settings.anki_package_format,
+                ).write_anki_deck_shards(vocab, **self._shard_limits())
+        self.logger.info(
+            "Wrote %d vocabularies to %s",
+            len(result.vocabularies),
+            output_dir.resolve().as_uri(),
+        )
+
+        if result.errors:
+            raise RuntimeError(
+                f"Vocabulary generation failed for {len(result.errors)} of "
+                f"{len(inputs)} inputs: {sorted(result.errors)}"
+            )
+
     def _confirm_step(
         self, prompt: str, *, default_yes: bool, ask_yes_no: bool = True
     ) -> bool:
@@ -87,11 +173,15 @@ class Pipeline:
                 return vocab
 
         # Otherwise, generate from text
+        vocab = self._generate_and_review_vocabulary()
+        if self.translation_memory is not None:
+            self.translation_memory.record(vocab)
+        return vocab
+
+    def _generate_and_review_vocabulary(self) -> list[VocabEntry]:
         input_text = self._read_input_text()
 
-        vocab = self.llm.generate_vocabulary(
-            instructions=self.prompt, input_text=input_text
-        )
+        vocab = self._generate_vocabulary(input_text)
 
         # Handle the TSV writing and reading after manual edits
         if not self.settings.table_output:
@@ -116,6 +206,47 @@ class Pipeline:
         vocab = read_from_file(Path(self.settings.table_output))
         return vocab
 
+    def _generate_vocabulary(self, input_text: str) -> list[VocabEntry]:
+        known: list[VocabEntry] = []
+        if (
+            self.translation_memory is not None
+            and self.settings.translation_memory.reuse_known_terms
+        ):
+            known, input_text = self.translation_memory.split_known_terms(input_text)
+            if not input_text.strip():
+                self.logger.info(
+                    "All input terms are in the translation memory; skipping the LLM"
+                )
+                return known
+
+        if self.input_filter is not None:
+            input_text = self.input_filter.filter(input_text)
+            if not input_text:
+                self.logger.info("No words left after the input filter")
+                return known
+
+        return known + self.llm.generate_vocabulary(
+            instructions=self.prompt, input_text=input_text
+        )
+
+    def _create_input_filter(self) -> InputFilter:
+        config = self.settings.input_filter
+        known_terms: set[str] = set()
+        if self.known_notes is not None:
+            known_terms |= self.known_notes.terms(self.settings.language_a)
+        if config.known_words:
+            text = Path(config.known_words).expanduser().read_text(encoding="utf-8")
+            known_terms.update(
+                line.strip() for line in text.splitlines() if line.strip()
+            )
+        return InputFilter(
+            language=self.settings.language_a,
+            num_common_words=config.common_words,
+            min_word_length=config.min_word_length,
+            context_chars=config.context_chars,
+            known_terms=known_terms,
+        )
+
     def _read_input_text(self) -> str:
         if self.settings.text_input:
             path = Path(self.settings.text_input)
@@ -129,21 +260,111 @@ class Pipeline:
 
     def _build_anki_deck(self, vocab: list[VocabEntry]) -> None:
         output_file = Path(self.settings.anki_output)
-        if output_file.is_file():
+        # a sharded deck of an earlier run has only `deck.partN.apkg` files
+        existing_files = deck_files(output_file)
+        if existing_files:
             if self._confirm_step(
-                "The Anki deck file already exists! Overwrite it?",
+                "The Anki deck file already exists "
+                f"({', '.join(path.name for path in existing_files)})! Overwrite it?",
                 default_yes=True,
             ):
-                output_file.unlink()
+                for path in existing_files:
+                    path.unlink()
             else:
                 self.logger.info(
                     "Skipping Anki deck generation, the existing deck file is kept"
                 )
                 return
 
-        self.anki_packager.write_anki_deck(vocab)
+        output_files = self.anki_packager.write_anki_deck_shards(
+            vocab, **self._shard_limits()
+        )
+        for path in output_files:
+            self.logger.info("Wrote Anki deck to %s", path.resolve())
+
+    @contextmanager
+    def _audio_dir(self) -> Iterator[str]:
+        """The audio cache directory if configured, otherwise a temporary one."""
+        cache_dir = self.settings.tts.audio_cache_dir
+        if cache_dir is None:
+            with TemporaryDirectory(prefix="ankify_media_") as audio_dir:
+                yield audio_dir
+            return
+        cache_dir = Path(cache_dir).expanduser()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        yield str(cache_dir)
+
+    def _seed_audio_cache(self) -> None:
+        if self.settings.tts.audio_cache_dir is None:
+            raise ValueError("seed_audio_cache needs tts.audio_cache_dir to be set")
+        packages = find_packages(self.settings.seed_audio_cache)
+        self.logger.info("Importing audio of %d packages", len(packages))
+        result = AudioCacheSeeder(
+            self.tts, Path(self.settings.tts.audio_cache_dir).expanduser()
+        ).seed(packages)
+        if result.failed_packages:
+            raise RuntimeError(
+                f"Failed to import audio from {len(result.failed_packages)} packages: "
+                + ", ".join(str(path) for path in result.failed_packages)
+            )
+
+    def _merge_into_anki_deck(
+        self, vocab: list[VocabEntry], existing_file: Path
+    ) -> None:
+        existing = ExistingAnkiPackage.open(existing_file)
+        new_vocab = existing.new_entries(vocab)
+        self.logger.info(
+            "%d of %d vocabulary entries are not in %s yet",
+            len(new_vocab),
+            len(vocab),
+            existing_file,
+        )
+        output_file = Path(self.settings.anki_output)
+        if not new_vocab and output_file.resolve() == existing_file.resolve():
+            return
+
+        with self._audio_dir() as audio_dir:
+            self.tts.synthesize(
+                new_vocab, Path(audio_dir), existing_media=existing.media
+            )
+            AnkiDeckCreator(
+                output_file=output_file,
+                deck_name=existing.deck_name,
+                note_type=existing.note_type,
+                writer="sqlite",
+                package_format=existing.package_format,
+            ).merge_anki_deck(existing, new_vocab)
         self.logger.info("Wrote Anki deck to %s", output_file.resolve())
 
+    def _push_to_anki(self, vocab: list[VocabEntry], deck_name: str) -> None:
+        config = self.settings.anki_connect
+        writer = AnkiConnectDeckWriter(
+            AnkiConnectClient(config.url, config.api_key, config.timeout_seconds),
+            deck_name=deck_name,
+            note_type=self.settings.note_type,
+            batch_size=config.batch_size,
+            max_workers=config.max_workers,
+        )
+        # only the notes Anki does not have yet need audio
+        new_vocab = writer.new_entries(vocab)
+        with self._audio_dir() as audio_dir:
+            self.tts.synthesize(
+                new_vocab, Path(audio_dir), existing_media=writer.existing_media
+            )
+            result = writer.push(new_vocab)
+        if result.failed:
+            raise RuntimeError(
+                f"Anki refused {result.failed} of {len(new_vocab)} notes "
+                f"for the deck '{deck_name}'"
+            )
+
+    def _shard_limits(self) -> dict[str, int | None]:
+        max_mb = self.settings.anki_shard_max_mb
+        return {
+            "max_notes": self.settings.anki_shard_max_notes,
+            "max_bytes": int(max_mb * 1024 * 1024) if max_mb is not None else None,
+        }
+
     def _ask_and_save_result_to_few_shot_examples(self) -> None:
         few_shot_dir = self.settings.llm.options.few_shot_examples
         if not (
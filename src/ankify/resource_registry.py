@@ -0,0 +1,88 @@
+"""
+Process-wide registry of the resources used to build prompts.
+
+Packaged resources (prompt templates, language aliases, language-specific
+instructions, common words) never change while the process runs and are read once.
+User-supplied files are re-read only when their modification time or size changes.
+"""
+
+import json
+import threading
+from functools import cache
+from importlib import resources
+from pathlib import Path
+from types import MappingProxyType
+from collections.abc import Mapping
+
+from .logging import get_logger
+
+_logger = get_logger("ankify.resource_registry")
+
+
+@cache
+def packaged_text(package: str, name: str) -> str:
+    """Text of a resource file packaged with ankify."""
+    _logger.debug("Loading packaged resource %s/%s", package, name)
+    return resources.files(package).joinpath(name).read_text(encoding="utf-8")
+
+
+@cache
+def language_aliases() -> Mapping[str, str]:
+    """Language aliases (e.g. "en", "eng") to canonical language names."""
+    aliases = json.loads(packaged_text("ankify.resources", "language_aliases.json"))
+    return MappingProxyType(aliases)
+
+
+def resolve_language_alias(language: str) -> str:
+    language = language.lower()
+    return language_aliases().get(language, language)
+
+
+@cache
+def _packaged_names(package: str) -> frozenset[str]:
+    """Names of the resource files of a package."""
+    return frozenset(entry.name for entry in resources.files(package).iterdir())
+
+
+def language_instructions(language: str) -> str:
+    """Language-specific prompt instructions, empty if there are none."""
+    # only packaged files are cached, not every language name callers pass
+    package = "ankify.resources.prompts.language_specific"
+    name = f"{language.lower()}.md"
+    if name not in _packaged_names(package):
+        return ""
+    return packaged_text(package, name)
+
+
+def common_words(language: str) -> tuple[str, ...]:
+    """The most frequent words of a language, most frequent first; empty if unknown."""
+    name = f"{resolve_language_alias(language)}.txt"
+    if name not in _packaged_names("ankify.resources.common_words"):
+        return ()
+    return _common_words_file(name)
+
+
+@cache
+def _common_words_file(name: str) -> tuple[str, ...]:
+    lines = packaged_text("ankify.resources.common_words", name).splitlines()
+    return tuple(line for line in lines if line and not line.startswith("#"))
+
+
+_file_cache: dict[Path, tuple[tuple[int, int], str]] = {}
+_file_cache_lock = threading.Lock()
+
+
+def read_text_file(path: Path) -> str:
+    """Text of a user-supplied file, cached until the file changes."""
+    path = Path(path).expanduser().resolve()
+    stat = path.stat()
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _file_cache_lock:
+        cached = _file_cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+    text = path.read_text(encoding="utf-8")
+    with _file_cache_lock:
+        _file_cache[path] = (version, text)
+    return text
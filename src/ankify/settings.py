@@ -26,6 +26,14 @@ class LLMOptions(StrictModel):
         default=None,
         description="Reasoning effort for reasoning models",
     )
+    max_concurrency: int = Field(
+        default=4,
+        ge=1,
+        description=(
+            "Maximum number of concurrent requests of a client when vocabularies "
+            "are generated concurrently (async API)."
+        ),
+    )
     prompt_template: Path = Field(
         default=Path("./settings/prompts/prompt_template.md.j2"),
         description="Path to the prompt or Jinja2 template file used to build the final prompt.",
@@ -56,6 +64,27 @@ class OpenAIProviderAccess(StrictModel):
     )
 
 
+class LLMResponseCacheConfig(StrictModel):
+    """On-disk cache of LLM answers for identical model, prompt and input."""
+
+    enabled: bool = Field(
+        default=False,
+        description="Reuse the answer of an identical earlier LLM request instead of calling the API.",
+    )
+    directory: Path = Field(
+        default=Path.home() / ".cache" / "ankify" / "llm_responses",
+        description="Directory of the cached answers.",
+    )
+    ttl_seconds: int = Field(
+        default=7 * 24 * 3600,
+        description="How long a cached answer is reused.",
+    )
+    max_size_mb: float = Field(
+        default=50.0,
+        description="Total size of the cache; the least recently used answers are evicted beyond it.",
+    )
+
+
 class LLMConfig(StrictModel):
     """LLM configuration: provider selection, runtime options, and credentials."""
 
@@ -67,6 +96,33 @@ class LLMConfig(StrictModel):
         default_factory=LLMOptions,
         description="Provider-agnostic LLM options such as model and prompt sources.",
     )
+    response_cache: LLMResponseCacheConfig = Field(
+        default_factory=LLMResponseCacheConfig,
+        description="Cache of LLM answers, e.g. for re-runs while iterating on custom instructions.",
+    )
+
+
+AudioFormat = Literal["mp3", "ogg_opus", "ogg_vorbis", "wav"]
+
+
+class TTSAudioProfile(StrictModel):
+    """Encoding of the synthesized audio requested from the TTS provider."""
+
+    format: AudioFormat = Field(
+        default="mp3",
+        description="Audio container/codec. Anki plays MP3, OGG and WAV media files.",
+    )
+    sample_rate: int | None = Field(
+        default=None,
+        description="Sample rate in Hz (e.g., 16000, 24000). `None` for the provider default.",
+    )
+    bitrate_kbps: int | None = Field(
+        default=None,
+        description=(
+            "Bitrate in kbit/s (e.g., 32, 48). `None` for the lowest bitrate "
+            "the provider offers for the chosen format and sample rate."
+        ),
+    )
 
 
 class TTSVoiceOptions(StrictModel):
@@ -77,11 +133,18 @@ class TTSVoiceOptions(StrictModel):
     )
     engine: Literal["standard", "neural"] | None = Field(
         default=None,
-        description="Synthesis engine type (if required by the provider).",
+        description=(
+            "Synthesis engine type (if required by the provider). For the local "
+            "provider, 'standard' runs espeak-ng and 'neural' runs piper."
+        ),
+    )
+    audio: TTSAudioProfile = Field(
+        default_factory=TTSAudioProfile,
+        description="Output audio format, sample rate, and bitrate.",
     )
 
 
-TTSProvider = Literal["aws", "azure", "edge"]
+TTSProvider = Literal["aws", "azure", "edge", "local"]
 
 
 class LanguageTTSConfig(StrictModel):
@@ -92,6 +155,13 @@ class LanguageTTSConfig(StrictModel):
         description="TTS provider backend.",
     )
     options: TTSVoiceOptions = Field(description="Voice options for this language.")
+    fallbacks: list["LanguageTTSConfig"] = Field(
+        default_factory=list,
+        description=(
+            "Voices tried in order when this one fails, and targets of hedged requests. "
+            "They must produce the same audio file format."
+        ),
+    )
 
 
 class AWSProviderAccess(StrictModel):
@@ -124,6 +194,110 @@ class AzureProviderAccess(StrictModel):
     )
 
 
+class TTSPostprocessingOptions(StrictModel):
+    """Optional lossless post-processing of synthesized MP3 audio."""
+
+    trim_silence: bool = Field(
+        default=False,
+        description="Drop leading and trailing silent MP3 frames.",
+    )
+    silence_padding_ms: int = Field(
+        default=50,
+        ge=0,
+        description="Silence to keep around the speech when trimming, in milliseconds.",
+    )
+    normalize_loudness: bool = Field(
+        default=False,
+        description="Bring all clips to the same loudness by adjusting the MP3 global gain.",
+    )
+    target_global_gain: int = Field(
+        default=180,
+        ge=0,
+        le=255,
+        description="Target MP3 global gain of the loudest part of a clip (1 step = 1.5 dB).",
+    )
+    max_gain_change_db: float = Field(
+        default=12.0,
+        ge=0,
+        description="Maximum loudness change applied to a clip, in dB.",
+    )
+    max_workers: int | None = Field(
+        default=None,
+        description="Processes used for post-processing. `None` for the number of CPUs.",
+    )
+
+    @property
+    def enabled(self) -> bool:
+        return self.trim_silence or self.normalize_loudness
+
+
+class TTSHedgingOptions(StrictModel):
+    """Hedged requests: duplicate a slow synthesis request and keep the first result."""
+
+    enabled: bool = Field(
+        default=False,
+        description="Send a duplicate request when a text takes longer than usual.",
+    )
+    latency_percentile: float = Field(
+        default=95.0,
+        gt=0,
+        lt=100,
+        description="Hedge after the observed latency percentile of the voice is exceeded.",
+    )
+    min_samples: int = Field(
+        default=20,
+        ge=1,
+        description="Latency samples needed before the percentile is used.",
+    )
+    initial_delay_seconds: float = Field(
+        default=3.0,
+        gt=0,
+        description="Hedging delay used until enough latency samples are collected.",
+    )
+    min_delay_seconds: float = Field(
+        default=0.5,
+        ge=0,
+        description="Lower bound of the hedging delay, to limit duplicate requests.",
+    )
+
+
+class TTSCircuitBreakerOptions(StrictModel):
+    """Per provider and region circuit breaker, shared by all TTS clients of the process."""
+
+    enabled: bool = Field(
+        default=True,
+        description="Fail fast while a provider's recent error rate is above the threshold.",
+    )
+    failure_rate_threshold: float = Field(
+        default=0.5,
+        gt=0,
+        le=1,
+        description="Share of failed calls in the window that opens the circuit.",
+    )
+    minimum_calls: int = Field(
+        default=5,
+        ge=1,
+        description="Calls needed in the window before the failure rate is evaluated.",
+    )
+    window_size: int = Field(
+        default=20,
+        ge=1,
+        description="Number of most recent calls the failure rate is computed over.",
+    )
+    open_seconds: float = Field(
+        default=30.0,
+        gt=0,
+        description="Time an open circuit rejects calls before a probe call is allowed.",
+    )
+    failover_to_default_provider: bool = Field(
+        default=True,
+        description=(
+            "For languages configured with another provider, use the default voice of "
+            "`default_provider` when their provider fails (e.g. its circuit is open)."
+        ),
+    )
+
+
 class Text2SpeechSettings(StrictModel):
     """Text-to-Speech configuration."""
 
@@ -137,6 +311,51 @@ class Text2SpeechSettings(StrictModel):
         description="Optional specific settings for TTS for languages. If not set, defaults will be used.",
     )
 
+    audio: TTSAudioProfile | None = Field(
+        default=None,
+        description=(
+            "Audio profile for languages configured from defaults "
+            "(languages listed in `languages` use their own `options.audio`)."
+        ),
+    )
+
+    postprocessing: TTSPostprocessingOptions = Field(
+        default_factory=TTSPostprocessingOptions,
+        description="Silence trimming and loudness normalization of synthesized audio.",
+    )
+
+    max_concurrency: int = Field(
+        default=1,
+        ge=1,
+        description="Texts of one language synthesized concurrently (languages run in parallel).",
+    )
+
+    audio_cache_dir: Path | None = Field(
+        default=None,
+        description=(
+            "Directory where synthesized clips are kept and reused by later builds "
+            "(e.g. ~/.cache/ankify/audio). If not set, clips are synthesized for every build."
+        ),
+    )
+
+    fallback_providers: list[TTSProvider] = Field(
+        default_factory=list,
+        description=(
+            "Providers tried in order, with their default voices, when the provider "
+            "of a language configured from defaults fails (e.g. ['azure'] after edge)."
+        ),
+    )
+
+    hedging: TTSHedgingOptions = Field(
+        default_factory=TTSHedgingOptions,
+        description="Hedged requests to cut the tail latency of synthesis.",
+    )
+
+    circuit_breaker: TTSCircuitBreakerOptions = Field(
+        default_factory=TTSCircuitBreakerOptions,
+        description="Fail fast (or over to the default provider) when a provider is degraded.",
+    )
+
 
 class ProviderAccessSettings(StrictModel):
     """Providers credentials."""
@@ -159,7 +378,134 @@ class MLflowConfig(StrictModel):
     )
 
 
+class TranslationMemoryConfig(StrictModel):
+    """Local store of accepted vocabulary entries, reused instead of re-translating terms."""
+
+    path: Path | None = Field(
+        default=None,
+        description="SQLite database of the translation memory. If None, it is disabled.",
+    )
+    reuse_known_terms: bool = Field(
+        default=True,
+        description=(
+            "Take input lines that are already known terms from the memory "
+            "and send only the rest to the LLM (skipping it if nothing is left). "
+            "If false, accepted entries are only recorded."
+        ),
+    )
+
+
+class InputFilterConfig(StrictModel):
+    """Local pre-filter that sends the LLM candidate words instead of the whole text."""
+
+    enabled: bool = Field(
+        default=False,
+        description=(
+            "Send the LLM only the words of the input text worth a card, each once "
+            "with its context. Expressions of several words are lost."
+        ),
+    )
+    common_words: int = Field(
+        default=100,
+        ge=0,
+        description=(
+            "Drop this many of the most frequent words of language_a "
+            "(for the languages with a packaged list of common words)."
+        ),
+    )
+    min_word_length: int = Field(
+        default=2,
+        ge=1,
+        description="Drop shorter words.",
+    )
+    context_chars: int = Field(
+        default=40,
+        ge=0,
+        description=(
+            "Length of the passage of its sentence sent around each word, "
+            "overlapping passages merged (0 for none)."
+        ),
+    )
+    known_words: Path | None = Field(
+        default=None,
+        description=(
+            "Text file with words you know, one per line, to drop as well "
+            "(the terms of `known_notes` are dropped too)."
+        ),
+    )
+
+
+class AnkiConnectConfig(StrictModel):
+    """Pushing the deck into a running Anki through the AnkiConnect add-on."""
+
+    enabled: bool = Field(
+        default=False,
+        description=(
+            "Add the notes and audio to the deck in Anki directly instead of "
+            "writing anki_output. Anki must be running with AnkiConnect installed."
+        ),
+    )
+    url: str = Field(
+        default="http://127.0.0.1:8765",
+        description="Address of AnkiConnect.",
+    )
+    api_key: str | None = Field(
+        default=None,
+        description="AnkiConnect API key, if one is set in its add-on config.",
+    )
+    batch_size: int = Field(
+        default=500,
+        gt=0,
+        description="Notes per request to AnkiConnect.",
+    )
+    max_workers: int = Field(
+        default=8,
+        gt=0,
+        description="Media files uploaded concurrently.",
+    )
+    timeout_seconds: float = Field(
+        default=60,
+        gt=0,
+        description="Timeout of a request to AnkiConnect.",
+    )
+
+
+class BatchConfig(StrictModel):
+    """Bulk mode: a vocabulary and a deck for every text file of a directory."""
+
+    input_dir: Path | None = Field(
+        default=None,
+        description=(
+            "Directory of input `.txt` files. If set, `text_input` and `table_output` "
+            "are ignored: each `{stem}.txt` produces `{stem}.tsv` and (unless "
+            "`anki_output` is null) `{stem}.apkg` in `output_dir`, without interactive steps."
+        ),
+    )
+    output_dir: Path = Field(
+        default=Path("./ankify_batch"),
+        description="Where the TSV tables and Anki decks of the batch are written.",
+    )
+    api: Literal["openai", "local"] = Field(
+        default="openai",
+        description=(
+            "'openai' submits all LLM requests as one Batch API job (half price, "
+            "done within 24 hours). 'local' runs the same job with regular requests, "
+            "for OpenAI-compatible providers without a Batch API."
+        ),
+    )
+    poll_interval_seconds: float = Field(
+        default=60.0,
+        description="How often the status of the batch job is checked.",
+    )
+    timeout_seconds: float = Field(
+        default=24 * 3600,
+        description="The batch job is cancelled if it is not done by then.",
+    )
+
+
 NoteType = Literal["forward_and_backward", "forward_only"]
+AnkiWriter = Literal["genanki", "sqlite"]
+AnkiPackageFormat = Literal["anki2", "anki21b"]
 
 
 class Settings(BaseSettings):
@@ -199,6 +545,69 @@ class Settings(BaseSettings):
         default="Ankify",
         description="Name of the generated Anki deck (it's not the file name, it's the deck name within Anki).",
     )
+    anki_writer: AnkiWriter = Field(
+        default="genanki",
+        description=(
+            "How the .apkg file is written: 'genanki', or 'sqlite' to build the "
+            "collection database directly, which is much faster for large decks."
+        ),
+    )
+    anki_package_format: AnkiPackageFormat = Field(
+        default="anki2",
+        description=(
+            "Format of the .apkg file: 'anki2' for all Anki versions, or 'anki21b' "
+            "(Anki 2.1.50+) with a zstd-compressed collection. 'anki21b' is always "
+            "written with the 'sqlite' writer and needs the 'anki21b' extra."
+        ),
+    )
+
+    anki_merge_into: Path | None = Field(
+        default=None,
+        description=(
+            "Existing .apkg (written by ankify) to add the vocabulary to. Notes it "
+            "already has are skipped and its audio is reused; the updated package is "
+            "written to anki_output, which may be the same file."
+        ),
+    )
+    known_notes: list[Path] | None = Field(
+        default=None,
+        description=(
+            "Anki collections (collection.anki2 in the Anki profile folder) or .apkg "
+            "files with the notes you already have. Vocabulary entries found there "
+            "are dropped before speech synthesis and packaging. Anki locks the "
+            "collection while it is open: close Anki first, or export the "
+            "collection as an .apkg."
+        ),
+    )
+    anki_shard_max_notes: int | None = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Split the deck into packages of at most this many notes, each with a "
+            "subdeck '<deck name>::Part <n>'. Unset for a single package."
+        ),
+    )
+    anki_shard_max_mb: float | None = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Split the deck into packages of about this many megabytes of audio and "
+            "text, each with a subdeck '<deck name>::Part <n>'. Unset for no limit."
+        ),
+    )
+
+    anki_connect: AnkiConnectConfig = Field(
+        default_factory=AnkiConnectConfig,
+        description="Push the deck into a running Anki instead of writing an .apkg.",
+    )
+
+    seed_audio_cache: list[Path] | None = Field(
+        default=None,
+        description=(
+            "Import the audio of these .apkg files (or directories of them) written by "
+            "ankify into `tts.audio_cache_dir`, then exit."
+        ),
+    )
 
     config: Path | None = Field(
         default=None,
@@ -231,6 +640,20 @@ class Settings(BaseSettings):
         description="LLM configuration.",
     )
 
+    batch: BatchConfig = Field(
+        default_factory=BatchConfig,
+        description="Bulk generation of many vocabularies and decks.",
+    )
+
+    input_filter: InputFilterConfig = Field(
+        default_factory=InputFilterConfig,
+        description="Local pre-filter of the input text before the LLM.",
+    )
+    translation_memory: TranslationMemoryConfig = Field(
+        default_factory=TranslationMemoryConfig,
+        description="Translation memory of previously accepted vocabulary entries.",
+    )
+
     tts: Text2SpeechSettings = Field(
         default_factory=Text2SpeechSettings,
         description="Text-to-Speech configuration.",
@@ -0,0 +1,104 @@
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.table import Table
+
+from ...logging import get_logger, setup_logging
+from ...settings import Settings, TTSAudioProfile
+from ..default_tts_configuration import DefaultTTSConfigurator
+from ..tts_manager import create_tts_single_language_client
+
+
+logger = get_logger("ankify.tts.bench.audio_profiles")
+setup_logging("INFO")
+
+
+# Run with `python -m ankify.tts._test._bench_audio_profiles` from the repo root.
+# Provider credentials are taken from the env / .env, as for the CLI.
+
+NOTES: list[tuple[str, str]] = [
+    ("the weather", "das Wetter"),
+    ("to pay attention / to notice", "aufpassen / bemerken"),
+    ("nevertheless; still", "trotzdem; dennoch"),
+    ("a reliable friend", "ein zuverlässiger Freund"),
+    ("to take something into account", "etwas berücksichtigen"),
+    ("the appointment", "der Termin"),
+    ("obviously", "offensichtlich"),
+    ("I am looking forward to it", "Ich freue mich darauf"),
+]
+
+PROFILES: dict[str, list[TTSAudioProfile]] = {
+    "edge": [
+        TTSAudioProfile(format="mp3"),
+    ],
+    "azure": [
+        TTSAudioProfile(format="mp3", sample_rate=16000, bitrate_kbps=32),
+        TTSAudioProfile(format="mp3", sample_rate=24000, bitrate_kbps=48),
+        TTSAudioProfile(format="ogg_opus", sample_rate=16000),
+        TTSAudioProfile(format="ogg_opus", sample_rate=24000),
+    ],
+    "aws": [
+        TTSAudioProfile(format="mp3"),
+        TTSAudioProfile(format="mp3", sample_rate=16000),
+        TTSAudioProfile(format="ogg_vorbis", sample_rate=16000),
+    ],
+}
+
+
+def _benchmark_profile(
+    settings: Settings, provider: str, profile: TTSAudioProfile
+) -> tuple[int, float, float]:
+    """Returns (total bytes, total seconds, max seconds per text)."""
+    configurator = DefaultTTSConfigurator(default_provider=provider, audio=profile)
+    total_bytes = 0
+    latencies: list[float] = []
+    for side, language in ((0, "english"), (1, "german")):
+        client, _ = create_tts_single_language_client(
+            configurator.get_config(language), settings.providers
+        )
+        for note in NOTES:
+            entities: dict[str, bytes | None] = {note[side]: None}
+            start = time.perf_counter()
+            client.synthesize(entities, language)
+            latencies.append(time.perf_counter() - start)
+            total_bytes += len(entities[note[side]])
+    return total_bytes, sum(latencies), max(latencies)
+
+
+def main() -> None:
+    settings = Settings(config=Path("./settings/dev_test.yaml").resolve())
+
+    table = Table(title="TTS audio profiles", show_lines=True)
+    table.add_column("Provider", style="cyan")
+    table.add_column("Profile", style="cyan")
+    table.add_column("Bytes per note", justify="right", style="green")
+    table.add_column("Mean latency, s", justify="right", style="yellow")
+    table.add_column("Max latency, s", justify="right", style="yellow")
+
+    for provider, profiles in PROFILES.items():
+        for profile in profiles:
+            label = (
+                f"{profile.format} {profile.sample_rate or 'default'}Hz "
+                f"{profile.bitrate_kbps or 'default'}kbps"
+            )
+            try:
+                total_bytes, total_seconds, max_seconds = _benchmark_profile(
+                    settings, provider, profile
+                )
+            except Exception:
+                logger.exception("Benchmark failed: %s %s", provider, label)
+                continue
+            table.add_row(
+                provider,
+                label,
+                f"{total_bytes / len(NOTES):,.0f}",
+                f"{total_seconds / (2 * len(NOTES)):.3f}",
+                f"{max_seconds:.3f}",
+            )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+from typing import Any
+
+from ..settings import AudioFormat, TTSAudioProfile
+
+AUDIO_FILE_EXTENSIONS: dict[AudioFormat, str] = {
+    "mp3": "mp3",
+    "ogg_opus": "ogg",
+    "ogg_vorbis": "ogg",
+    "wav": "wav",
+}
+
+# (format, sample rate in Hz, bitrate in kbit/s or None if not selectable, provider value)
+SupportedOutputFormats = list[tuple[AudioFormat, int, int | None, Any]]
+
+
+def resolve_output_format(
+    profile: TTSAudioProfile,
+    supported: SupportedOutputFormats,
+    provider: str,
+) -> Any:
+    """
+    Pick the provider-specific output format for the given audio profile.
+    Unset profile fields match anything; the first matching entry wins,
+    so `supported` is expected to be ordered from the smallest output to the largest.
+    """
+    for audio_format, sample_rate, bitrate_kbps, value in supported:
+        if audio_format != profile.format:
+            continue
+        if profile.sample_rate is not None and profile.sample_rate != sample_rate:
+            continue
+        if profile.bitrate_kbps is not None and profile.bitrate_kbps != bitrate_kbps:
+            continue
+        return value
+
+    available = [
+        f"{audio_format}/{sample_rate}Hz"
+        + (f"/{bitrate_kbps}kbps" if bitrate_kbps is not None else "")
+        for audio_format, sample_rate, bitrate_kbps, _ in supported
+    ]
+    raise ValueError(
+        f"Audio profile {profile.model_dump()} is not supported by provider '{provider}'. "
+        f"Available profiles: {available}"
+    )
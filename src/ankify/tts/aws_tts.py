@@ -10,8 +10,14 @@ from tenacity import (
 from contextlib import closing
 
 from ..logging import get_logger
-from ..settings import TTSVoiceOptions, AWSProviderAccess
+from ..settings import TTSAudioProfile, TTSVoiceOptions, AWSProviderAccess
+from .audio_profile import (
+    AUDIO_FILE_EXTENSIONS,
+    SupportedOutputFormats,
+    resolve_output_format,
+)
 from .tts_base import TTSSingleLanguageClient
+from .tts_circuit_breaker import circuit_guarded
 from .tts_cost_tracker import TTSCostTracker
 from .tts_text_preprocessor import (
     has_vocabulary_separators,
@@ -25,6 +31,14 @@ class AWSPollySingleLanguageClient(TTSSingleLanguageClient):
         (";", "<break time='200ms'/>"),
     ]
 
+    # Polly has no bitrate option; the sample rate is sent only if explicitly set,
+    # otherwise the engine default applies (24 kHz for neural, 22.05 kHz for standard)
+    supported_output_formats: SupportedOutputFormats = [
+        (audio_format, sample_rate, None, audio_format)
+        for audio_format in ("mp3", "ogg_vorbis")
+        for sample_rate in (8000, 16000, 22050, 24000)
+    ]
+
     @staticmethod
     def possibly_preprocess_text_into_ssml(text: str) -> dict:
         """
@@ -69,6 +83,21 @@ class AWSPollySingleLanguageClient(TTSSingleLanguageClient):
         self._client: BaseClient = session.client("polly")
 
         self._language_settings = language_settings
+        self._output_params = self.output_params(language_settings.audio)
+        self.audio_file_extension = AUDIO_FILE_EXTENSIONS[
+            language_settings.audio.format
+        ]
+
+    @classmethod
+    def output_params(cls, profile: TTSAudioProfile) -> dict[str, str]:
+        params = {
+            "OutputFormat": resolve_output_format(
+                profile, cls.supported_output_formats, "aws"
+            )
+        }
+        if profile.sample_rate is not None:
+            params["SampleRate"] = str(profile.sample_rate)
+        return params
 
     def synthesize(
         self,
@@ -76,7 +105,7 @@ class AWSPollySingleLanguageClient(TTSSingleLanguageClient):
         language: str,
         cost_tracker: TTSCostTracker | None = None,
     ) -> None:
-        self.logger.info(
+        self.logger.debug(
             "Synthesizing speech for %d entities, voice id '%s', engine '%s'",
             len(entities),
             self._language_settings.voice_id,
@@ -93,13 +122,14 @@ class AWSPollySingleLanguageClient(TTSSingleLanguageClient):
         wait=wait_exponential(),
         retry=retry_if_exception_type((BotoCoreError, ClientError)),
     )
+    @circuit_guarded
     def _synthesize_single(
         self, text: str, language: str, cost_tracker: TTSCostTracker | None
     ) -> bytes:
         params = self.possibly_preprocess_text_into_ssml(text)
         response = self._client.synthesize_speech(
             **params,
-            OutputFormat="mp3",
+            **self._output_params,
             VoiceId=self._language_settings.voice_id,
             Engine=self._language_settings.engine,
         )
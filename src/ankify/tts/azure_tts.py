@@ -8,7 +8,13 @@ from tenacity import (
 
 from ..logging import get_logger
 from ..settings import TTSVoiceOptions, AzureProviderAccess
+from .audio_profile import (
+    AUDIO_FILE_EXTENSIONS,
+    SupportedOutputFormats,
+    resolve_output_format,
+)
 from .tts_base import TTSSingleLanguageClient
+from .tts_circuit_breaker import circuit_guarded
 from .tts_cost_tracker import TTSCostTracker
 from .tts_text_preprocessor import (
     has_vocabulary_separators,
@@ -16,6 +22,8 @@ from .tts_text_preprocessor import (
     replace_separators_with_ssml_breaks,
 )
 
+_OutputFormat = speechsdk.SpeechSynthesisOutputFormat
+
 
 class AzureTTSSingleLanguageClient(TTSSingleLanguageClient):
     """Azure Cognitive Services Speech TTS client for a single language."""
@@ -25,6 +33,20 @@ class AzureTTSSingleLanguageClient(TTSSingleLanguageClient):
         (";", "<break time='300ms'/>"),
     ]
 
+    supported_output_formats: SupportedOutputFormats = [
+        ("mp3", 16000, 32, _OutputFormat.Audio16Khz32KBitRateMonoMp3),
+        ("mp3", 16000, 64, _OutputFormat.Audio16Khz64KBitRateMonoMp3),
+        ("mp3", 16000, 128, _OutputFormat.Audio16Khz128KBitRateMonoMp3),
+        ("mp3", 24000, 48, _OutputFormat.Audio24Khz48KBitRateMonoMp3),
+        ("mp3", 24000, 96, _OutputFormat.Audio24Khz96KBitRateMonoMp3),
+        ("mp3", 24000, 160, _OutputFormat.Audio24Khz160KBitRateMonoMp3),
+        ("mp3", 48000, 96, _OutputFormat.Audio48Khz96KBitRateMonoMp3),
+        ("mp3", 48000, 192, _OutputFormat.Audio48Khz192KBitRateMonoMp3),
+        ("ogg_opus", 16000, None, _OutputFormat.Ogg16Khz16BitMonoOpus),
+        ("ogg_opus", 24000, None, _OutputFormat.Ogg24Khz16BitMonoOpus),
+        ("ogg_opus", 48000, None, _OutputFormat.Ogg48Khz16BitMonoOpus),
+    ]
+
     @staticmethod
     def possibly_preprocess_text_into_ssml(
         text: str, voice_id: str
@@ -65,10 +87,14 @@ class AzureTTSSingleLanguageClient(TTSSingleLanguageClient):
             subscription=access_settings.subscription_key.get_secret_value(),
             region=access_settings.region,
         )
-        # Set the output format to MP3
-        speech_config.set_speech_synthesis_output_format(
-            speechsdk.SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3
+        output_format = resolve_output_format(
+            language_settings.audio, self.supported_output_formats, "azure"
         )
+        self.logger.debug("Using Azure output format %s", output_format)
+        speech_config.set_speech_synthesis_output_format(output_format)
+        self.audio_file_extension = AUDIO_FILE_EXTENSIONS[
+            language_settings.audio.format
+        ]
 
         self._speech_config = speech_config
         self._language_settings = language_settings
@@ -79,7 +105,7 @@ class AzureTTSSingleLanguageClient(TTSSingleLanguageClient):
         language: str,
         cost_tracker: TTSCostTracker | None = None,
     ) -> None:
-        self.logger.info(
+        self.logger.debug(
             "Synthesizing speech for %d entities, voice id '%s'",
             len(entities),
             self._language_settings.voice_id,
@@ -94,6 +120,7 @@ class AzureTTSSingleLanguageClient(TTSSingleLanguageClient):
         wait=wait_exponential(),
         retry=retry_if_exception_type((RuntimeError,)),
     )
+    @circuit_guarded
     def _synthesize_single(
         self, text: str, language: str, cost_tracker: TTSCostTracker | None
     ) -> bytes:
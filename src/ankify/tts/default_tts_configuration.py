@@ -1,15 +1,24 @@
 import json
 from importlib import resources
 
-from ..settings import LanguageTTSConfig, TTSVoiceOptions, TTSProvider
+from ..settings import (
+    LanguageTTSConfig,
+    TTSAudioProfile,
+    TTSVoiceOptions,
+    TTSProvider,
+)
 from ..logging import get_logger
+from ..resource_registry import language_aliases
 
 logger = get_logger(__name__)
 
 
 class DefaultTTSConfigurator:
-    def __init__(self, default_provider: TTSProvider) -> None:
+    def __init__(
+        self, default_provider: TTSProvider, audio: TTSAudioProfile | None = None
+    ) -> None:
         self.default_provider = default_provider
+        self.audio = audio
         self.defaults = None
 
     def _load_defaults(self, provider: str) -> dict[str, str | dict[str, str]]:
@@ -24,12 +33,7 @@ class DefaultTTSConfigurator:
             "Loaded %s default voice codes for provider '%s'.", len(defaults), provider
         )
 
-        aliases_content = (
-            resources.files("ankify.resources")
-            .joinpath("language_aliases.json")
-            .read_text(encoding="utf-8")
-        )
-        aliases: dict[str, str] = json.loads(aliases_content)
+        aliases = language_aliases()
         added_aliases = {}
         for alias, target in aliases.items():
             if alias not in defaults and target in defaults:
@@ -60,4 +64,6 @@ class DefaultTTSConfigurator:
 
         value = self.defaults[language]
         options = TTSVoiceOptions(**value)
+        if self.audio is not None:
+            options.audio = self.audio
         return LanguageTTSConfig(provider=self.default_provider, options=options)
@@ -12,7 +12,9 @@ from tenacity import (
 
 from ..logging import get_logger
 from ..settings import TTSVoiceOptions
+from .audio_profile import SupportedOutputFormats, resolve_output_format
 from .tts_base import TTSSingleLanguageClient
+from .tts_circuit_breaker import circuit_guarded
 from .tts_text_preprocessor import replace_separators_with_plain_text
 
 if TYPE_CHECKING:
@@ -20,6 +22,11 @@ if TYPE_CHECKING:
 
 
 class EdgeTTSSingleLanguageClient(TTSSingleLanguageClient):
+    # edge-tts streams a single fixed format
+    supported_output_formats: SupportedOutputFormats = [
+        ("mp3", 24000, 48, "audio-24khz-48kbitrate-mono-mp3"),
+    ]
+
     @staticmethod
     def possibly_preprocess_text(text: str) -> str:
         """
@@ -32,6 +39,9 @@ class EdgeTTSSingleLanguageClient(TTSSingleLanguageClient):
         self.logger.debug(
             "Initializing Edge TTS client for voice id '%s'", language_settings.voice_id
         )
+        resolve_output_format(
+            language_settings.audio, self.supported_output_formats, "edge"
+        )
         self._language_settings = language_settings
 
     def synthesize(
@@ -40,7 +50,7 @@ class EdgeTTSSingleLanguageClient(TTSSingleLanguageClient):
         language: str,
         cost_tracker: "TTSCostTracker | None" = None,
     ) -> None:
-        self.logger.info(
+        self.logger.debug(
             "Synthesizing speech for %d entities, voice id '%s'",
             len(entities),
             self._language_settings.voice_id,
@@ -77,6 +87,7 @@ class EdgeTTSSingleLanguageClient(TTSSingleLanguageClient):
         wait=wait_exponential(),
         retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError)),
     )
+    @circuit_guarded
     def _synthesize_single(self, text: str) -> bytes:
         prepared_text = self.possibly_preprocess_text(text)
         return self._run_coroutine(lambda: self._synthesize_single_async(prepared_text))
@@ -0,0 +1,195 @@
+"""
+Offline TTS with a local CPU engine: espeak-ng (`engine: standard`, the default)
+or piper (`engine: neural`, `voice_id` is the path of a piper voice model).
+
+Engines run as subprocesses. All local clients of the process share a pool of
+as many engine slots as there are CPU cores, so synthesis uses every core
+without oversubscribing them when several languages are synthesized at once.
+Engines emit WAV; other formats are encoded with ffmpeg.
+"""
+
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ..logging import get_logger
+from ..settings import TTSVoiceOptions
+from .audio_profile import (
+    AUDIO_FILE_EXTENSIONS,
+    SupportedOutputFormats,
+    resolve_output_format,
+)
+from .tts_base import TTSSingleLanguageClient
+from .tts_circuit_breaker import circuit_guarded
+from .tts_text_preprocessor import replace_separators_with_plain_text
+
+if TYPE_CHECKING:
+    from .tts_cost_tracker import TTSCostTracker
+
+
+ENGINE_EXECUTABLES = {
+    "standard": "espeak-ng",
+    "neural": "piper",
+}
+# Seconds a single engine or encoder run may take
+SUBPROCESS_TIMEOUT_SECONDS = 60
+
+ENGINE_POOL_SIZE = os.cpu_count() or 1
+_engine_slots = threading.BoundedSemaphore(ENGINE_POOL_SIZE)
+
+
+def _fix_wav_header(audio: bytes) -> bytes:
+    """
+    espeak-ng writing to a pipe cannot seek back to fill in the chunk sizes,
+    so they are set here, assuming the data chunk is the last one (as engines write it).
+    """
+    if audio[:4] != b"RIFF" or audio[8:12] != b"WAVE":
+        return audio
+    data_offset = audio.find(b"data", 12)
+    if data_offset < 0:
+        return audio
+    fixed = bytearray(audio)
+    struct.pack_into("<I", fixed, 4, len(audio) - 8)
+    struct.pack_into("<I", fixed, data_offset + 4, len(audio) - data_offset - 8)
+    return bytes(fixed)
+
+
+def _require_executable(name: str, hint: str) -> str:
+    path = shutil.which(name)
+    if path is None:
+        raise RuntimeError(f"Local TTS requires '{name}' on PATH. {hint}")
+    return path
+
+
+class LocalTTSSingleLanguageClient(TTSSingleLanguageClient):
+    # encoder arguments of ffmpeg, None for the WAV the engines emit
+    supported_output_formats: SupportedOutputFormats = [
+        ("mp3", 22050, 32, ["-c:a", "libmp3lame", "-b:a", "32k", "-f", "mp3"]),
+        ("mp3", 22050, 48, ["-c:a", "libmp3lame", "-b:a", "48k", "-f", "mp3"]),
+        ("mp3", 22050, 64, ["-c:a", "libmp3lame", "-b:a", "64k", "-f", "mp3"]),
+        ("ogg_vorbis", 22050, None, ["-c:a", "libvorbis", "-q:a", "3", "-f", "ogg"]),
+        ("wav", 22050, None, None),
+    ]
+    # engine runs are CPU-bound, keep all cores busy
+    max_concurrency = ENGINE_POOL_SIZE
+
+    @staticmethod
+    def possibly_preprocess_text(text: str) -> str:
+        """
+        Engines read plain text, so we replace slashes with punctuation.
+        """
+        return replace_separators_with_plain_text(text)
+
+    def __init__(self, language_settings: TTSVoiceOptions) -> None:
+        self.logger = get_logger("ankify.tts.local")
+        self.logger.debug(
+            "Initializing local TTS client for voice id '%s'",
+            language_settings.voice_id,
+        )
+        self._language_settings = language_settings
+        self._engine = language_settings.engine or "standard"
+        self._encoder_args: list[str] | None = resolve_output_format(
+            language_settings.audio, self.supported_output_formats, "local"
+        )
+        self.audio_file_extension = AUDIO_FILE_EXTENSIONS[
+            language_settings.audio.format
+        ]
+
+        self._engine_path = _require_executable(
+            ENGINE_EXECUTABLES[self._engine],
+            "Install espeak-ng (e.g. `apt install espeak-ng`) or piper "
+            "(`pip install piper-tts`) for the 'standard' or 'neural' engine.",
+        )
+        self._ffmpeg_path = None
+        if self._encoder_args is not None:
+            self._ffmpeg_path = _require_executable(
+                "ffmpeg",
+                "It encodes the engine output; install it or set the audio format "
+                "to 'wav'.",
+            )
+
+    def synthesize(
+        self,
+        entities: dict[str, bytes | None],
+        language: str,
+        cost_tracker: "TTSCostTracker | None" = None,
+    ) -> None:
+        self.logger.debug(
+            "Synthesizing speech for %d entities, voice id '%s'",
+            len(entities),
+            self._language_settings.voice_id,
+        )
+
+        for text in entities:
+            entities[text] = self._synthesize_single(text)
+            if cost_tracker:
+                cost_tracker.track_usage(text, self._engine, language)
+
+    @circuit_guarded
+    def _synthesize_single(self, text: str) -> bytes:
+        prepared_text = self.possibly_preprocess_text(text)
+        with _engine_slots:
+            audio = _fix_wav_header(self._run_engine(prepared_text))
+            if self._encoder_args is not None:
+                audio = self._encode(audio)
+        if not audio:
+            raise RuntimeError("Local TTS engine produced no audio")
+        return audio
+
+    def _run_engine(self, text: str) -> bytes:
+        voice_id = self._language_settings.voice_id
+        self.logger.debug(
+            "Running %s: voice=%s text=%s", self._engine_path, voice_id, text
+        )
+        if self._engine == "standard":
+            return self._run(
+                [self._engine_path, "-v", voice_id, "--stdout"], text.encode()
+            )
+
+        # piper writes a complete WAV file only to a seekable output
+        with tempfile.TemporaryDirectory(prefix="ankify-piper-") as tmp:
+            output = Path(tmp) / "speech.wav"
+            self._run(
+                [self._engine_path, "--model", voice_id, "--output_file", str(output)],
+                text.encode(),
+            )
+            return output.read_bytes()
+
+    def _encode(self, wav: bytes) -> bytes:
+        assert self._ffmpeg_path is not None and self._encoder_args is not None
+        return self._run(
+            [
+                self._ffmpeg_path,
+                *("-hide_banner", "-loglevel", "error"),
+                *("-f", "wav", "-i", "pipe:0", "-ac", "1", "-ar", "22050"),
+                *self._encoder_args,
+                "pipe:1",
+            ],
+            wav,
+        )
+
+    def _run(self, command: list[str], stdin: bytes) -> bytes:
+        try:
+            completed = subprocess.run(
+                command,
+                input=stdin,
+                capture_output=True,
+                timeout=SUBPROCESS_TIMEOUT_SECONDS,
+                check=True,
+            )
+        except subprocess.CalledProcessError as e:
+            stderr = e.stderr.decode(errors="replace").strip()
+            raise RuntimeError(
+                f"'{Path(command[0]).name}' failed with exit code {e.returncode}: "
+                f"{stderr}"
+            ) from e
+        except subprocess.TimeoutExpired as e:
+            raise RuntimeError(
+                f"'{Path(command[0]).name}' timed out after {e.timeout}s"
+            ) from e
+        return completed.stdout
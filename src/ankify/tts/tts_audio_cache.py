@@ -0,0 +1,185 @@
+"""
+Seeding the TTS audio cache (`tts.audio_cache_dir`) with the audio of existing decks.
+
+The cache holds clips under the names `TTSManager` gives them (a hash of the voice
+settings and text, see `media_file_name`), so an imported clip is reused by every
+later build with the same text in the same language. The notes of the ankify note
+types tell the text and language of each `[sound:...]` file.
+
+Decks written before audio files were named by content carry no record of the
+voice: their clips are filed under the voice currently configured for their
+language, so only import decks built with the same voices. Clips with a content
+name other than the current one were made with other settings and are skipped.
+"""
+
+import re
+import sqlite3
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from ..anki.anki_package_merger import ankify_models, read_package
+from ..anki.sqlite_anki_package import load_collection, zstd_decompress
+from ..logging import get_logger
+from .tts_manager import TTSManager, write_file_atomic
+
+_logger = get_logger("ankify.tts.audio_cache")
+
+_SOUND = re.compile(r"\[sound:([^\]]+)\]")
+
+# (text field, language field, sound field) of the ankify note types
+_SOUND_FIELDS = [(0, 2, 4), (1, 3, 5)]
+
+
+@dataclass
+class AudioCacheSeedResult:
+    imported: int = 0
+    already_cached: int = 0
+    # clips made with other voice settings or in another audio format
+    skipped: int = 0
+    failed_packages: list[Path] = field(default_factory=list)
+
+
+@dataclass
+class _PackageClips:
+    path: Path
+    # media file name in the deck -> (language, text)
+    clips: dict[str, tuple[str, str]]
+    # media file name -> name of its file in the zip archive
+    media: dict[str, str]
+    compressed: bool
+
+
+def find_packages(paths: list[Path]) -> list[Path]:
+    """The .apkg files among `paths`, and in the directories among them."""
+    packages = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            packages.extend(sorted(path.rglob("*.apkg")))
+        else:
+            packages.append(path)
+    return packages
+
+
+class AudioCacheSeeder:
+    def __init__(
+        self, tts_manager: TTSManager, cache_dir: Path, max_workers: int = 8
+    ) -> None:
+        self.tts_manager = tts_manager
+        self.cache_dir = Path(cache_dir)
+        self.max_workers = max_workers
+
+    def seed(self, packages: list[Path]) -> AudioCacheSeedResult:
+        """
+        Import the audio of the packages. Reading the packages and copying the clips
+        runs in a thread pool; naming the clips needs the TTS clients and runs here.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        result = AudioCacheSeedResult()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            indexed = list(executor.map(self._read_clips, packages))
+
+            copies: list[tuple[_PackageClips, dict[str, str]]] = []
+            planned: set[str] = set()
+            for path, package in zip(packages, indexed):
+                if package is None:
+                    result.failed_packages.append(path)
+                    continue
+                targets = self._cache_names(package, planned, result)
+                if targets:
+                    copies.append((package, targets))
+
+            copied = executor.map(lambda c: self._copy_clips(*c), copies)
+            for (package, _), imported in zip(copies, copied):
+                if imported is None:
+                    result.failed_packages.append(package.path)
+                else:
+                    result.imported += imported
+
+        _logger.info(
+            "Audio cache %s: imported %d clips from %d packages "
+            "(%d already cached, %d skipped, %d packages failed)",
+            self.cache_dir,
+            result.imported,
+            len(packages),
+            result.already_cached,
+            result.skipped,
+            len(result.failed_packages),
+        )
+        return result
+
+    def _cache_names(
+        self,
+        package: _PackageClips,
+        planned: set[str],
+        result: AudioCacheSeedResult,
+    ) -> dict[str, str]:
+        """Media file name in the deck -> name in the cache, of the clips to copy."""
+        targets = {}
+        for name, (language, text) in package.clips.items():
+            target = self.tts_manager.audio_file_name(language, text)
+            if Path(name).suffix != Path(target).suffix or (
+                name.startswith("ankify-") and name != target
+            ):
+                result.skipped += 1
+            elif target in planned or (self.cache_dir / target).is_file():
+                result.already_cached += 1
+            else:
+                planned.add(target)
+                targets[name] = target
+        return targets
+
+    @staticmethod
+    def _read_clips(path: Path) -> _PackageClips | None:
+        try:
+            package_format, collection, media, _ = read_package(path)
+            conn = sqlite3.connect(":memory:")
+            try:
+                load_collection(conn, collection)
+                model_ids = list(ankify_models(conn))
+                rows = conn.execute(
+                    "SELECT flds FROM notes WHERE mid IN "
+                    f"({','.join('?' * len(model_ids))})",
+                    model_ids,
+                ).fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            _logger.warning("Failed to read %s: %s", path, e)
+            return None
+
+        clips: dict[str, tuple[str, str]] = {}
+        for (flds,) in rows:
+            fields = flds.split("\x1f")
+            for text_field, language_field, sound_field in _SOUND_FIELDS:
+                match = _SOUND.fullmatch(fields[sound_field].strip())
+                if match and match.group(1) in media:
+                    clips[match.group(1)] = (
+                        fields[language_field],
+                        fields[text_field],
+                    )
+        return _PackageClips(path, clips, media, package_format == "anki21b")
+
+    def _copy_clips(
+        self, package: _PackageClips, targets: dict[str, str]
+    ) -> int | None:
+        """Number of clips copied, None if the package failed."""
+        imported = 0
+        try:
+            with zipfile.ZipFile(package.path) as z:
+                for name, target in targets.items():
+                    data = z.read(package.media[name])
+                    if package.compressed:
+                        data = zstd_decompress(data)
+                    write_file_atomic(self.cache_dir / target, data)
+                    imported += 1
+        except Exception as e:
+            _logger.warning(
+                "Failed to import audio from %s after %d clips: %s",
+                package.path,
+                imported,
+                e,
+            )
+            return None
+        return imported
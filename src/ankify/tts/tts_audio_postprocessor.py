@@ -0,0 +1,278 @@
+"""
+Lossless MP3 post-processing of synthesized speech, without decoding the audio.
+
+Works on MPEG audio Layer III frames (what all our providers emit for MP3):
+- silence trimming drops leading/trailing frames whose granules carry (almost) no
+  Huffman-coded data, which is how encoders represent digital silence;
+- loudness normalization shifts the `global_gain` field of every granule
+  (the approach of mp3gain), one step being 1.5 dB, so the loudest part
+  of each clip ends up at the same quantizer gain.
+"""
+
+import statistics
+from dataclasses import dataclass
+
+from ..logging import get_logger
+from ..settings import TTSPostprocessingOptions
+
+
+logger = get_logger("ankify.tts.postprocessor")
+
+# fmt: off
+_BITRATES_KBPS = {
+    "mpeg1": [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    "mpeg2": [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],   # MPEG-2.5
+}
+# fmt: on
+
+# A granule coded with fewer bits than this is considered silent
+_SILENT_GRANULE_BITS = 32
+# Bits per granule/channel block in the side info and the offset of global_gain in it
+_MPEG1_GRANULE_BITS = 59
+_MPEG2_GRANULE_BITS = 63
+_GLOBAL_GAIN_OFFSET = 21
+# One global_gain step changes the amplitude by 2^(1/4), i.e. 1.5 dB
+GAIN_STEP_DB = 1.5
+
+
+@dataclass
+class MP3Granule:
+    # absolute bit position of the granule/channel block in the file
+    bit_offset: int
+    part2_3_length: int
+    global_gain: int
+
+    @property
+    def is_silent(self) -> bool:
+        return self.part2_3_length < _SILENT_GRANULE_BITS
+
+
+@dataclass
+class MP3Frame:
+    offset: int
+    length: int
+    # frame header, CRC and side info, in bytes
+    header_length: int
+    sample_rate: int
+    samples: int
+    granules: list[MP3Granule]
+
+    @property
+    def is_silent(self) -> bool:
+        return all(g.is_silent for g in self.granules)
+
+    @property
+    def duration_ms(self) -> float:
+        return 1000 * self.samples / self.sample_rate
+
+
+def _read_bits(data: bytes, bit_offset: int, count: int) -> int:
+    start = bit_offset // 8
+    end = (bit_offset + count + 7) // 8
+    value = int.from_bytes(data[start:end], "big")
+    return (value >> (8 * (end - start) - (bit_offset % 8) - count)) & (
+        (1 << count) - 1
+    )
+
+
+def _write_bits(data: bytearray, bit_offset: int, count: int, value: int) -> None:
+    start = bit_offset // 8
+    end = (bit_offset + count + 7) // 8
+    shift = 8 * (end - start) - (bit_offset % 8) - count
+    mask = ((1 << count) - 1) << shift
+    current = int.from_bytes(data[start:end], "big")
+    current = (current & ~mask) | ((value << shift) & mask)
+    data[start:end] = current.to_bytes(end - start, "big")
+
+
+def _skip_id3v2(data: bytes) -> int:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    # syncsafe integer: 4 bytes with 7 significant bits each
+    size = 0
+    for b in data[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _parse_frame(data: bytes, offset: int) -> MP3Frame | None:
+    if offset + 4 > len(data):
+        return None
+    b1, b2, b3 = data[offset + 1], data[offset + 2], data[offset + 3]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    if version == 1 or layer != 1:  # reserved version or not Layer III
+        return None
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    if bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    is_mpeg1 = version == 3
+    bitrate = _BITRATES_KBPS["mpeg1" if is_mpeg1 else "mpeg2"][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    has_crc = not (b1 & 0x01)
+    channels = 1 if (b3 >> 6) == 3 else 2
+
+    if is_mpeg1:
+        length = 144 * bitrate // sample_rate + padding
+        samples = 1152
+        granules_count = 2
+        block_bits = _MPEG1_GRANULE_BITS
+        # main_data_begin, private_bits, scfsi
+        first_block = 9 + (5 if channels == 1 else 3) + 4 * channels
+    else:
+        length = 72 * bitrate // sample_rate + padding
+        samples = 576
+        granules_count = 1
+        block_bits = _MPEG2_GRANULE_BITS
+        # main_data_begin, private_bits
+        first_block = 8 + (1 if channels == 1 else 2)
+
+    if offset + length > len(data):
+        return None
+
+    side_info_offset = 4 + (2 if has_crc else 0)
+    side_info_bits = 8 * (offset + side_info_offset)
+    granules: list[MP3Granule] = []
+    for index in range(granules_count * channels):
+        bit_offset = side_info_bits + first_block + index * block_bits
+        granules.append(
+            MP3Granule(
+                bit_offset=bit_offset,
+                part2_3_length=_read_bits(data, bit_offset, 12),
+                global_gain=_read_bits(data, bit_offset + _GLOBAL_GAIN_OFFSET, 8),
+            )
+        )
+
+    side_info_length = (first_block + granules_count * channels * block_bits + 7) // 8
+    return MP3Frame(
+        offset=offset,
+        length=length,
+        header_length=side_info_offset + side_info_length,
+        sample_rate=sample_rate,
+        samples=samples,
+        granules=granules,
+    )
+
+
+def _is_info_frame(data: bytes, frame: MP3Frame) -> bool:
+    """Xing/Info/VBRI header frames carry metadata only (frame counts, seek tables)."""
+    start = frame.offset + frame.header_length
+    vbri_start = frame.offset + 36
+    return data[start : start + 4] in (b"Xing", b"Info") or (
+        data[vbri_start : vbri_start + 4] == b"VBRI"
+    )
+
+
+def parse_mp3_frames(data: bytes) -> list[MP3Frame]:
+    """
+    Parse consecutive Layer III frames, skipping a leading ID3v2 tag.
+    Parsing stops at the first byte that does not start a valid frame (e.g. an ID3v1 tag).
+    """
+    frames: list[MP3Frame] = []
+    offset = _skip_id3v2(data)
+    while (frame := _parse_frame(data, offset)) is not None:
+        frames.append(frame)
+        offset += frame.length
+    return frames
+
+
+def trim_silence(
+    data: bytes, frames: list[MP3Frame], padding_ms: int
+) -> tuple[bytes, list[MP3Frame]]:
+    """
+    Drop silent frames at both ends, keeping `padding_ms` of silence around the speech.
+    The padding also keeps the bit reservoir frames the first voiced frame may refer to.
+    Metadata (Xing/Info) frames are dropped, since their frame counts would be stale.
+    """
+    if frames and _is_info_frame(data, frames[0]):
+        frames = frames[1:]
+    voiced = [i for i, frame in enumerate(frames) if not frame.is_silent]
+    if not voiced:
+        return data, frames
+
+    padding_frames = round(padding_ms / frames[0].duration_ms)
+    first = max(0, voiced[0] - padding_frames)
+    last = min(len(frames) - 1, voiced[-1] + padding_frames)
+    kept = frames[first : last + 1]
+
+    trimmed = bytearray()
+    new_frames: list[MP3Frame] = []
+    for frame in kept:
+        shift = 8 * (len(trimmed) - frame.offset)
+        new_frames.append(
+            MP3Frame(
+                offset=len(trimmed),
+                length=frame.length,
+                header_length=frame.header_length,
+                sample_rate=frame.sample_rate,
+                samples=frame.samples,
+                granules=[
+                    MP3Granule(
+                        bit_offset=g.bit_offset + shift,
+                        part2_3_length=g.part2_3_length,
+                        global_gain=g.global_gain,
+                    )
+                    for g in frame.granules
+                ],
+            )
+        )
+        trimmed += data[frame.offset : frame.offset + frame.length]
+    return bytes(trimmed), new_frames
+
+
+def normalize_loudness(
+    data: bytes, frames: list[MP3Frame], target_gain: int, max_change_db: float
+) -> bytes:
+    """
+    Shift global_gain of all non-silent granules so that the loudness estimate
+    of the clip (90th percentile of their global_gain) matches `target_gain`.
+    """
+    gains = [g.global_gain for f in frames for g in f.granules if not g.is_silent]
+    if not gains:
+        return data
+
+    level = statistics.quantiles(gains, n=10)[-1] if len(gains) > 1 else gains[0]
+    max_steps = int(max_change_db / GAIN_STEP_DB)
+    steps = max(-max_steps, min(max_steps, round(target_gain - level)))
+    if steps == 0:
+        return data
+
+    result = bytearray(data)
+    for frame in frames:
+        for granule in frame.granules:
+            if granule.is_silent:
+                continue
+            gain = max(0, min(255, granule.global_gain + steps))
+            _write_bits(result, granule.bit_offset + _GLOBAL_GAIN_OFFSET, 8, gain)
+    return bytes(result)
+
+
+def postprocess_audio(audio: bytes, options: TTSPostprocessingOptions) -> bytes:
+    """
+    Apply the enabled post-processing steps to a synthesized MP3 clip.
+    Non-MP3 or unparseable audio is returned unchanged.
+    Module-level and side-effect free, so it can run in a process pool.
+    """
+    frames = parse_mp3_frames(audio)
+    if not frames:
+        logger.debug("Audio is not a Layer III MP3 stream, skipping post-processing")
+        return audio
+
+    if options.trim_silence:
+        audio, frames = trim_silence(audio, frames, options.silence_padding_ms)
+    if options.normalize_loudness:
+        audio = normalize_loudness(
+            audio, frames, options.target_global_gain, options.max_gain_change_db
+        )
+    return audio
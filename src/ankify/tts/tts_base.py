@@ -1,11 +1,64 @@
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from .tts_circuit_breaker import CircuitBreaker
     from .tts_cost_tracker import TTSCostTracker
 
 
+@dataclass(frozen=True)
+class SynthesisRequest:
+    text: str
+    language: str
+
+
+@dataclass
+class SynthesisResult:
+    """Outcome of one request: the audio or the error, and how long it took."""
+
+    request: SynthesisRequest
+    audio: bytes | None = None
+    error: Exception | None = None
+    elapsed_seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class TTSClient(ABC):
+    """
+    Batch-native TTS client interface.
+
+    A client receives all requests of a voice at once and yields results as they
+    complete (in any order), so it is free to batch, stream or parallelize them.
+    A failed request is reported in its result and does not stop the others.
+    Clients implementing the older `TTSSingleLanguageClient` interface are
+    adapted with `LegacyTTSClientAdapter`.
+    """
+
+    # Extension of the files the synthesized audio is saved to
+    audio_file_extension: str = "mp3"
+
+    @abstractmethod
+    def synthesize_stream(
+        self,
+        requests: Iterable[SynthesisRequest],
+        cost_tracker: "TTSCostTracker | None" = None,
+    ) -> AsyncIterator[SynthesisResult]:
+        raise NotImplementedError
+
+
 class TTSSingleLanguageClient(ABC):
+    # Extension of the files the synthesized audio is saved to
+    audio_file_extension: str = "mp3"
+    # Shared breaker of the provider and region, set by TTSManager
+    circuit_breaker: "CircuitBreaker | None" = None
+    # Requests the client handles well in parallel, when more than the configured limit
+    max_concurrency: int | None = None
+
     @abstractmethod
     def synthesize(
         self,
@@ -0,0 +1,169 @@
+import functools
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any, Literal
+
+from ..logging import get_logger
+from ..settings import TTSCircuitBreakerOptions
+
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a provider whose circuit is open.
+    Not a RuntimeError, so provider retry policies do not retry it.
+    """
+
+
+class CircuitBreaker:
+    """
+    Fails fast when a provider is degraded.
+
+    Outcomes of the last `window_size` calls are kept. Once at least `minimum_calls`
+    were made and the failure rate reaches the threshold, the circuit opens and calls
+    fail immediately with CircuitOpenError. After `open_seconds` a single probe call
+    is let through (half-open): its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, name: str, options: TTSCircuitBreakerOptions) -> None:
+        self.logger = get_logger("ankify.tts.circuit_breaker")
+        self.name = name
+        self.options = options
+        self._lock = threading.Lock()
+        self._state: CircuitState = "closed"
+        self._outcomes: deque[bool] = deque(maxlen=options.window_size)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejected = 0
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> CircuitState:
+        if (
+            self._state == "open"
+            and time.monotonic() - self._opened_at >= self.options.open_seconds
+        ):
+            self._state = "half_open"
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not be made."""
+        with self._lock:
+            state = self._current_state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self.logger.info("Circuit '%s' is half-open, probing", self.name)
+                return
+            self._rejected += 1
+        raise CircuitOpenError(
+            f"TTS provider '{self.name}' is unavailable (circuit open)"
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == "half_open":
+                self.logger.info("Circuit '%s' closed", self.name)
+                self._state = "closed"
+                self._outcomes.clear()
+                self._probe_in_flight = False
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == "half_open":
+                self._open()
+                return
+            self._outcomes.append(False)
+            if self._state == "closed" and self._failure_rate_exceeded():
+                self._open()
+
+    def _failure_rate_exceeded(self) -> bool:
+        if len(self._outcomes) < self.options.minimum_calls:
+            return False
+        failures = self._outcomes.count(False)
+        return failures / len(self._outcomes) >= self.options.failure_rate_threshold
+
+    def _open(self) -> None:
+        self.logger.warning(
+            "Circuit '%s' opened for %.0fs", self.name, self.options.open_seconds
+        )
+        self._state = "open"
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Wrap a single provider call: check the state and record the outcome."""
+        self.before_call()
+        try:
+            yield
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            outcomes = list(self._outcomes)
+            return {
+                "state": self._current_state(),
+                "recent_calls": len(outcomes),
+                "recent_failures": outcomes.count(False),
+                "rejected_calls": self._rejected,
+            }
+
+
+class CircuitBreakerRegistry:
+    """Process-wide circuit breakers, one per provider and region."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str, options: TTSCircuitBreakerOptions) -> CircuitBreaker:
+        """The breaker of `name`; options only apply when it is created."""
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, options)
+            return self._breakers[name]
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.snapshot() for name, breaker in sorted(breakers.items())}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+
+circuit_breakers = CircuitBreakerRegistry()
+
+
+def circuit_guarded(method: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Guard a provider call method with the client's `circuit_breaker` (if it has one).
+    Place it below the retry decorator, so that every attempt is guarded
+    and an open circuit stops the retries.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        breaker: CircuitBreaker | None = self.circuit_breaker
+        if breaker is None:
+            return method(self, *args, **kwargs)
+        with breaker.guard():
+            return method(self, *args, **kwargs)
+
+    return wrapper
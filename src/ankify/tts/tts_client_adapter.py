@@ -0,0 +1,84 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+from .tts_base import (
+    SynthesisRequest,
+    SynthesisResult,
+    TTSClient,
+    TTSSingleLanguageClient,
+)
+
+if TYPE_CHECKING:
+    from .tts_cost_tracker import TTSCostTracker
+
+
+def run_coroutine_sync(coro_factory: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run a coroutine to completion from synchronous code.
+    If this thread already runs an event loop (e.g. an async MCP server),
+    the coroutine runs in a dedicated event loop thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro_factory())
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(lambda: asyncio.run(coro_factory())).result()
+
+
+class LegacyTTSClientAdapter(TTSClient):
+    """
+    Compatibility shim exposing a `TTSSingleLanguageClient` as a `TTSClient`.
+
+    Each request is sent as a one-item batch in a worker thread, with at most
+    `max_concurrency` requests in flight, and results are yielded as they complete.
+    """
+
+    def __init__(self, client: TTSSingleLanguageClient, max_concurrency: int = 1):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.audio_file_extension = client.audio_file_extension
+
+    async def synthesize_stream(
+        self,
+        requests: Iterable[SynthesisRequest],
+        cost_tracker: "TTSCostTracker | None" = None,
+    ) -> AsyncIterator[SynthesisResult]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(request: SynthesisRequest) -> SynthesisResult:
+            async with semaphore:
+                return await asyncio.to_thread(
+                    self._synthesize_one, request, cost_tracker
+                )
+
+        tasks = [asyncio.create_task(run(request)) for request in requests]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _synthesize_one(
+        self, request: SynthesisRequest, cost_tracker: "TTSCostTracker | None"
+    ) -> SynthesisResult:
+        started = time.monotonic()
+        batch: dict[str, bytes | None] = {request.text: None}
+        try:
+            self.client.synthesize(
+                batch, language=request.language, cost_tracker=cost_tracker
+            )
+        except Exception as e:
+            return SynthesisResult(
+                request, error=e, elapsed_seconds=time.monotonic() - started
+            )
+        return SynthesisResult(
+            request,
+            audio=batch[request.text],
+            elapsed_seconds=time.monotonic() - started,
+        )
@@ -1,3 +1,4 @@
+import threading
 from abc import ABC, abstractmethod
 from decimal import Decimal
 from dataclasses import dataclass, field
@@ -39,6 +40,8 @@ class TTSCostTracker(ABC):
         self._usage: DefaultDict[LanguageUsageKey, EngineUsage] = defaultdict(
             EngineUsage
         )
+        # usage may be tracked from several threads (hedged requests)
+        self._lock = threading.Lock()
 
     @abstractmethod
     def _get_rate(self, engine: str | None) -> Decimal:
@@ -75,8 +78,9 @@ class TTSCostTracker(ABC):
         engine_key = engine.lower() if engine else "default"
         language_key = language.lower() if language else "unknown"
         key = LanguageUsageKey(language=language_key, engine=engine_key)
-        self._usage[key].chars += chars
-        self._usage[key].cost += cost
+        with self._lock:
+            self._usage[key].chars += chars
+            self._usage[key].cost += cost
 
     def log_summary(self) -> None:
         """
@@ -163,6 +167,19 @@ class EdgeTTSCostTracker(TTSCostTracker):
         return Decimal("0.00")
 
 
+class LocalTTSCostTracker(TTSCostTracker):
+    """
+    Cost tracker for the local engines.
+    Synthesis runs on this machine for free, but we still track character counts.
+    """
+
+    def __init__(self):
+        super().__init__("Local TTS")
+
+    def _get_rate(self, engine: str | None) -> Decimal:
+        return Decimal("0.00")
+
+
 class MultiProviderCostTracker:
     """
     Aggregates cost tracking across multiple TTS providers.
@@ -171,21 +188,25 @@ class MultiProviderCostTracker:
     def __init__(self):
         self._logger = get_logger("ankify.tts.cost")
         self._trackers: dict[str, TTSCostTracker] = {}
+        self._lock = threading.Lock()
 
     def get_tracker(self, provider: str) -> TTSCostTracker:
         """
         Get or create a cost tracker for the given provider.
         """
-        if provider not in self._trackers:
-            if provider == "aws":
-                self._trackers[provider] = AWSPollyCostTracker()
-            elif provider == "azure":
-                self._trackers[provider] = AzureTTSCostTracker()
-            elif provider == "edge":
-                self._trackers[provider] = EdgeTTSCostTracker()
-            else:
-                raise ValueError(f"Unknown TTS provider: {provider}")
-        return self._trackers[provider]
+        with self._lock:
+            if provider not in self._trackers:
+                if provider == "aws":
+                    self._trackers[provider] = AWSPollyCostTracker()
+                elif provider == "azure":
+                    self._trackers[provider] = AzureTTSCostTracker()
+                elif provider == "edge":
+                    self._trackers[provider] = EdgeTTSCostTracker()
+                elif provider == "local":
+                    self._trackers[provider] = LocalTTSCostTracker()
+                else:
+                    raise ValueError(f"Unknown TTS provider: {provider}")
+            return self._trackers[provider]
 
     def log_summary(self) -> None:
         """
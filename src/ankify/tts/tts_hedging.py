@@ -0,0 +1,270 @@
+"""
+Fallback chains and hedged requests for TTS synthesis.
+
+Each text is synthesized by the first voice of the chain. If that takes longer than
+the usual latency of the voice (a percentile of its recent latencies), a duplicate
+request is sent to the next voice of the chain (or the same voice if there is no
+other) and whichever finishes first wins. If a request fails, the next voice of the
+chain is tried. Every request is tracked by the cost tracker of its own provider.
+Audio of a voice other than the first is returned as `FallbackAudio`, which names
+that voice, so it is not mistaken for audio of the first voice.
+The tail-latency metrics of a synthesis run are collected over all its calls with
+`collect_hedging_stats`, to be logged once per run.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from ..logging import get_logger
+from ..settings import TTSHedgingOptions
+from .tts_base import TTSSingleLanguageClient
+
+if TYPE_CHECKING:
+    from .tts_cost_tracker import TTSCostTracker
+
+
+class LatencyTracker:
+    """Rolling window of recent synthesis latencies per voice, shared process-wide."""
+
+    def __init__(self, window: int = 200) -> None:
+        self._window = window
+        self._lock = threading.Lock()
+        self._latencies: dict[str, deque[float]] = {}
+
+    def record(self, voice_key: str, seconds: float) -> None:
+        with self._lock:
+            if voice_key not in self._latencies:
+                self._latencies[voice_key] = deque(maxlen=self._window)
+            self._latencies[voice_key].append(seconds)
+
+    def percentile(
+        self, voice_key: str, percentile: float, min_samples: int
+    ) -> float | None:
+        """The latency percentile, or None if fewer than `min_samples` were recorded."""
+        with self._lock:
+            samples = list(self._latencies.get(voice_key, ()))
+        if len(samples) < max(2, min_samples):
+            return None
+        return _percentile(samples, percentile)
+
+
+def _percentile(samples: list[float], percentile: float) -> float:
+    if len(samples) == 1:
+        return samples[0]
+    cut_points = statistics.quantiles(samples, n=100, method="inclusive")
+    return cut_points[min(98, max(0, round(percentile) - 1))]
+
+
+latency_tracker = LatencyTracker()
+
+
+class FallbackAudio(bytes):
+    """Audio synthesized by a voice other than the first of its chain."""
+
+    voice_key: str
+
+    def __new__(cls, audio: bytes, voice_key: str) -> "FallbackAudio":
+        self = super().__new__(cls, audio)
+        # the voice that produced the audio, see `TTSChainLink.voice_key`
+        self.voice_key = voice_key
+        return self
+
+    def __reduce__(self):
+        return FallbackAudio, (bytes(self), self.voice_key)
+
+
+@dataclass
+class TTSChainLink:
+    client: TTSSingleLanguageClient
+    provider: str
+    voice_key: str
+
+
+@dataclass
+class HedgingStats:
+    """Tail-latency metrics of one synthesis call, or of all calls of a run."""
+
+    latencies: list[float] = field(default_factory=list)
+    hedges: int = 0
+    hedges_won: int = 0
+    fallbacks: int = 0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def add(self, other: "HedgingStats") -> None:
+        with self._lock:
+            self.latencies.extend(other.latencies)
+            self.hedges += other.hedges
+            self.hedges_won += other.hedges_won
+            self.fallbacks += other.fallbacks
+
+    def summary(self) -> str:
+        if not self.latencies:
+            return "no texts"
+        return (
+            f"{len(self.latencies)} texts, latency p50 {_percentile(self.latencies, 50):.2f}s, "
+            f"p95 {_percentile(self.latencies, 95):.2f}s, max {max(self.latencies):.2f}s; "
+            f"hedged {self.hedges} (won {self.hedges_won}), fell back {self.fallbacks}"
+        )
+
+
+# metrics of the synthesis run in progress, see `collect_hedging_stats`
+_run_stats: ContextVar[HedgingStats | None] = ContextVar(
+    "ankify_hedging_run_stats", default=None
+)
+
+
+@contextmanager
+def collect_hedging_stats() -> Iterator[HedgingStats]:
+    """
+    Collect the metrics of the HedgedTTSClient calls made in this context, which
+    then leave the logging to the caller. The context is inherited by asyncio
+    tasks and `asyncio.to_thread` workers, so one run may make many calls.
+    """
+    stats = HedgingStats()
+    token = _run_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _run_stats.reset(token)
+
+
+class HedgedTTSClient(TTSSingleLanguageClient):
+    """
+    Synthesizes with a chain of voices, with fallbacks on errors and hedged requests.
+
+    The `cost_tracker` argument of `synthesize` is not used: requests may go to
+    different providers, so each is tracked by `cost_tracker_for(provider)`.
+    """
+
+    def __init__(
+        self,
+        links: list[TTSChainLink],
+        hedging: TTSHedgingOptions,
+        cost_tracker_for: Callable[[str], "TTSCostTracker | None"],
+        latencies: LatencyTracker = latency_tracker,
+    ) -> None:
+        self.logger = get_logger("ankify.tts.hedging")
+        extensions = {link.client.audio_file_extension for link in links}
+        if len(extensions) > 1:
+            raise ValueError(
+                "All voices of a TTS fallback chain must produce the same audio "
+                f"file format, got: {sorted(extensions)}"
+            )
+        self.links = links
+        self.hedging = hedging
+        self.audio_file_extension = links[0].client.audio_file_extension
+        self._cost_tracker_for = cost_tracker_for
+        self._latencies = latencies
+
+    def synthesize(
+        self,
+        entities: dict[str, bytes | None],
+        language: str,
+        cost_tracker: "TTSCostTracker | None" = None,
+    ) -> None:
+        stats = HedgingStats()
+        # a hedged request that lost keeps running; it must not block the caller
+        executor = ThreadPoolExecutor(
+            max_workers=max(4, 2 * len(self.links)),
+            thread_name_prefix="ankify-tts-hedge",
+        )
+        try:
+            for text in entities:
+                started = time.monotonic()
+                entities[text] = self._synthesize_text(executor, text, language, stats)
+                stats.latencies.append(time.monotonic() - started)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        run_stats = _run_stats.get()
+        if run_stats is not None:
+            run_stats.add(stats)
+        else:
+            self.logger.info("Language '%s': %s", language, stats.summary())
+
+    def _hedge_delay(self) -> float | None:
+        if not self.hedging.enabled:
+            return None
+        delay = self._latencies.percentile(
+            self.links[0].voice_key,
+            self.hedging.latency_percentile,
+            self.hedging.min_samples,
+        )
+        if delay is None:
+            delay = self.hedging.initial_delay_seconds
+        return max(self.hedging.min_delay_seconds, delay)
+
+    def _synthesize_text(
+        self,
+        executor: ThreadPoolExecutor,
+        text: str,
+        language: str,
+        stats: HedgingStats,
+    ) -> bytes:
+        pending: dict[Future[bytes], int] = {}
+
+        def launch(index: int) -> Future[bytes]:
+            future = executor.submit(self._attempt, self.links[index], text, language)
+            pending[future] = index
+            return future
+
+        launch(0)
+        next_index = 1
+        hedge: Future[bytes] | None = None
+        errors: list[Exception] = []
+        while True:
+            timeout = self._hedge_delay() if hedge is None else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedge_index = next_index if next_index < len(self.links) else 0
+                next_index = max(next_index, hedge_index + 1)
+                self.logger.debug(
+                    "Text is slower than %.2fs, hedging to %s", timeout, hedge_index
+                )
+                stats.hedges += 1
+                hedge = launch(hedge_index)
+                continue
+
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    audio = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    self.logger.warning(
+                        "TTS request to '%s' failed: %s", self.links[index].provider, e
+                    )
+                    continue
+                if future is hedge:
+                    stats.hedges_won += 1
+                if index != 0:
+                    return FallbackAudio(audio, self.links[index].voice_key)
+                return audio
+
+            if not pending:
+                if next_index >= len(self.links):
+                    raise errors[-1]
+                self.logger.info(
+                    "Falling back to TTS provider '%s'", self.links[next_index].provider
+                )
+                stats.fallbacks += 1
+                launch(next_index)
+                next_index += 1
+
+    def _attempt(self, link: TTSChainLink, text: str, language: str) -> bytes:
+        started = time.monotonic()
+        batch: dict[str, bytes | None] = {text: None}
+        link.client.synthesize(
+            batch, language=language, cost_tracker=self._cost_tracker_for(link.provider)
+        )
+        self._latencies.record(link.voice_key, time.monotonic() - started)
+        return batch[text]
@@ -1,5 +1,18 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Collection, Iterator
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from contextlib import contextmanager
 from pathlib import Path
-import uuid
+import hashlib
 
 from .default_tts_configuration import DefaultTTSConfigurator
 from ..vocab_entry import VocabEntry
@@ -9,8 +22,23 @@ from ..settings import (
     ProviderAccessSettings,
 )
 from ..logging import get_logger
-from .tts_base import TTSSingleLanguageClient
-from .tts_cost_tracker import MultiProviderCostTracker
+from .audio_profile import AUDIO_FILE_EXTENSIONS
+from .tts_audio_postprocessor import postprocess_audio
+from .tts_base import (
+    SynthesisRequest,
+    SynthesisResult,
+    TTSClient,
+    TTSSingleLanguageClient,
+)
+from .tts_circuit_breaker import circuit_breakers
+from .tts_client_adapter import LegacyTTSClientAdapter, run_coroutine_sync
+from .tts_cost_tracker import MultiProviderCostTracker, TTSCostTracker
+from .tts_hedging import HedgedTTSClient, TTSChainLink, collect_hedging_stats
+from .tts_single_flight import (
+    SingleFlightTTSClient,
+    SynthesisSingleFlight,
+    synthesis_single_flight,
+)
 
 
 def create_tts_single_language_client(
@@ -68,49 +96,172 @@ def create_tts_single_language_client(
             ),
             "edge",
         )
+    if config.provider == "local":
+        from .local_tts import LocalTTSSingleLanguageClient
+
+        return (
+            LocalTTSSingleLanguageClient(
+                language_settings=config.options,
+            ),
+            "local",
+        )
     else:
         raise ValueError(f"Unsupported TTS provider: {config.provider}")
 
 
+def _voice_key(language: str, provider: str, config: LanguageTTSConfig) -> str:
+    """Everything besides the text that determines the synthesized audio."""
+    return f"{provider}:{language}:{config.options.model_dump_json()}"
+
+
+def media_file_name(
+    voice_key: str, postprocessing: str, text: str, extension: str
+) -> str:
+    """
+    Audio file name derived from everything that determines the audio, so the same
+    clip gets the same name in every deck and Anki stores it only once.
+    """
+    digest = hashlib.sha256(
+        "\x1f".join([voice_key, postprocessing, text]).encode("utf-8")
+    ).hexdigest()
+    return f"ankify-{digest[:32]}.{extension}"
+
+
+def write_file_atomic(path: Path, data: bytes) -> None:
+    """
+    Write through a unique temporary file, so that no partial file is left behind to
+    be reused later, and builds sharing the directory do not collide.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, path)
+    finally:
+        Path(tmp_name).unlink(missing_ok=True)
+
+
+class _DeferredTTSClient(TTSSingleLanguageClient):
+    """
+    A failover voice whose client is created on its first request, so a provider
+    the user did not choose is not set up unless needed and cannot break startup
+    (e.g. with missing credentials). If it cannot be created, the error is logged
+    once and its requests fail, leaving the chain without the failover.
+    """
+
+    def __init__(
+        self,
+        create: Callable[[], TTSSingleLanguageClient],
+        provider: str,
+        audio_file_extension: str,
+    ) -> None:
+        self.logger = get_logger("ankify.tts.manager")
+        self.provider = provider
+        self.audio_file_extension = audio_file_extension
+        self._create = create
+        self._client: TTSSingleLanguageClient | None = None
+        self._error: Exception | None = None
+        self._lock = threading.Lock()
+
+    def synthesize(
+        self,
+        entities: dict[str, bytes | None],
+        language: str,
+        cost_tracker: TTSCostTracker | None = None,
+    ) -> None:
+        self._get_client().synthesize(entities, language, cost_tracker=cost_tracker)
+
+    def _get_client(self) -> TTSSingleLanguageClient:
+        with self._lock:
+            if self._client is None and self._error is None:
+                try:
+                    client = self._create()
+                    if client.audio_file_extension != self.audio_file_extension:
+                        raise ValueError(
+                            f"it produces {client.audio_file_extension} audio, "
+                            f"not {self.audio_file_extension}"
+                        )
+                    self._client = client
+                except Exception as e:
+                    self._error = e
+                    self.logger.warning(
+                        "Cannot fail over to TTS provider '%s': %s", self.provider, e
+                    )
+        if self._error is not None:
+            raise RuntimeError(
+                f"TTS provider '{self.provider}' is unavailable for failover: "
+                f"{self._error}"
+            ) from self._error
+        return self._client
+
+
 class TTSManager:
     def __init__(
         self,
         tts_settings: Text2SpeechSettings,
         provider_settings: ProviderAccessSettings,
+        single_flight: SynthesisSingleFlight | None = synthesis_single_flight,
     ) -> None:
         self.logger = get_logger("ankify.tts.manager")
         self.logger.debug("Initializing TTSManager...")
         self.provider_settings = provider_settings
+        self.postprocessing = tts_settings.postprocessing
+        self.hedging = tts_settings.hedging
+        self.fallback_providers = tts_settings.fallback_providers
+        self.circuit_breaker = tts_settings.circuit_breaker
+        self.max_concurrency = tts_settings.max_concurrency
+        self.session_cost_tracker = MultiProviderCostTracker()
+        # coalesces identical texts synthesized concurrently by other managers
+        self.single_flight = single_flight
 
         # to instantiate a default language client if a language is not explicitly configured in settings
         self.defaults_configurator = DefaultTTSConfigurator(
-            default_provider=tts_settings.default_provider
+            default_provider=tts_settings.default_provider,
+            audio=tts_settings.audio,
         )
 
         self.tts_clients: dict[str, TTSSingleLanguageClient] = {}
         self.client_providers: dict[
             str, str
         ] = {}  # Track which provider each client uses
+        # the whole fallback chain, to coalesce identical requests
+        self.client_voice_keys: dict[str, str] = {}
+        # the primary voice, to name its audio files
+        self.primary_voice_keys: dict[str, str] = {}
+        # what synthesis actually runs on: the clients above behind the batch interface
+        self._clients_v2: dict[str, TTSClient] = {}
         if tts_settings.languages is not None:
             for language, lang_cfg in tts_settings.languages.items():
-                client, provider = create_tts_single_language_client(
-                    lang_cfg, provider_settings
+                self._register_client(
+                    language,
+                    lang_cfg,
+                    list(lang_cfg.fallbacks),
+                    failover=self._default_failover(language, lang_cfg),
                 )
-                self.tts_clients[language] = client
-                self.client_providers[language] = provider
 
         self.logger.debug("Initialized TTSManager")
 
-    def synthesize(self, entries: list[VocabEntry], audio_dir: Path) -> None:
+    def synthesize(
+        self,
+        entries: list[VocabEntry],
+        audio_dir: Path,
+        existing_media: Collection[str] = (),
+    ) -> None:
+        """
+        Synthesize the audio of the entries into `audio_dir` and set their audio paths.
+        Clips already in `audio_dir`, or named in `existing_media` (e.g. the media of
+        a package the entries are added to), are not synthesized again; the latter
+        keep paths in `audio_dir` that do not exist.
+        """
         self.logger.info(
             "Starting TTS synthesis for %d vocabulary entries", len(entries)
         )
 
         # Track costs for this synthesis session (supports multiple providers)
-        session_cost_tracker = MultiProviderCostTracker()
+        self.session_cost_tracker = session_cost_tracker = MultiProviderCostTracker()
 
         # within each language, de-duplicate by text
-        by_language: dict[str, dict[str, bytes | Path | None]] = {}
+        by_language: dict[str, dict[str, Path]] = {}
         for entry in entries:
             front_lang = self._ensure_client_for_language(entry.front_language)
             back_lang = self._ensure_client_for_language(entry.back_language)
@@ -120,27 +271,47 @@ class TTSManager:
             if back_lang not in by_language:
                 by_language[back_lang] = {}
 
-            by_language[front_lang][entry.front] = None
-            by_language[back_lang][entry.back] = None
-
-        for lang, lang_entries in by_language.items():
-            self.logger.debug(
-                "Language '%s' has %d unique texts to synthesize",
-                lang,
-                len(lang_entries),
+            by_language[front_lang][entry.front] = self._audio_path(
+                front_lang, entry.front, audio_dir
+            )
+            by_language[back_lang][entry.back] = self._audio_path(
+                back_lang, entry.back, audio_dir
             )
-            if len(lang_entries) != 0:
-                # Get the cost tracker for this language's provider
-                provider = self.client_providers[lang]
-                cost_tracker = session_cost_tracker.get_tracker(provider)
-                self.tts_clients[lang].synthesize(
-                    lang_entries, language=lang, cost_tracker=cost_tracker
+
+        # clips already in audio_dir, e.g. from a previous build, are reused
+        to_synthesize = {
+            lang: [
+                text
+                for text, path in lang_entries.items()
+                if path.name not in existing_media and not path.is_file()
+            ]
+            for lang, lang_entries in by_language.items()
+        }
+        reused = sum(len(e) for e in by_language.values()) - sum(
+            len(t) for t in to_synthesize.values()
+        )
+        if reused:
+            self.logger.info("Reusing %d existing audio files", reused)
+
+        with self._postprocessing_executor() as executor:
+            audio = run_coroutine_sync(
+                lambda: self._synthesize_languages(
+                    to_synthesize, executor, session_cost_tracker
                 )
-                # write audio to disk, keep paths instead of bytes
-                for text in lang_entries.keys():
-                    audio_file_path = audio_dir / f"ankify-{uuid.uuid4()}.mp3"
-                    audio_file_path.write_bytes(lang_entries[text])
-                    lang_entries[text] = audio_file_path
+            )
+            # write audio to disk, keep paths instead of bytes
+            for lang, texts in to_synthesize.items():
+                for text in texts:
+                    clip, voice_key = audio[lang][text]
+                    if isinstance(clip, Future):
+                        clip = clip.result()
+                    if voice_key is not None:
+                        # made by a fallback voice: named after it, so that it is
+                        # not reused as the primary voice's clip by later builds
+                        by_language[lang][text] = self._audio_path(
+                            lang, text, audio_dir, voice_key
+                        )
+                    write_file_atomic(by_language[lang][text], clip)
 
         for entry in entries:
             # We use _ensure_client_for_language again just to get the normalized key,
@@ -155,6 +326,124 @@ class TTSManager:
 
         self.logger.info("Completed TTS synthesis")
 
+    def audio_file_name(self, language: str, text: str) -> str:
+        """Name of the clip of `text` in `language` with the current settings."""
+        lang = self._ensure_client_for_language(language)
+        return self._audio_path(lang, text, Path()).name
+
+    def _audio_path(
+        self, lang: str, text: str, audio_dir: Path, voice_key: str | None = None
+    ) -> Path:
+        """Path of the clip of the primary voice, or of the voice of `voice_key`."""
+        postprocessing = ""
+        if self.postprocessing.enabled:
+            postprocessing = self.postprocessing.model_dump_json(
+                exclude={"max_workers"}
+            )
+        return audio_dir / media_file_name(
+            voice_key or self.primary_voice_keys[lang],
+            postprocessing,
+            text,
+            self._clients_v2[lang].audio_file_extension,
+        )
+
+    async def _synthesize_languages(
+        self,
+        texts_by_language: dict[str, list[str]],
+        executor: Executor | None,
+        session_cost_tracker: MultiProviderCostTracker,
+    ) -> dict[str, dict[str, "tuple[bytes | Future[bytes], str | None]"]]:
+        """All languages are synthesized concurrently."""
+        languages = [lang for lang, texts in texts_by_language.items() if texts]
+        results = await asyncio.gather(
+            *(
+                self._synthesize_language(
+                    lang,
+                    texts_by_language[lang],
+                    executor,
+                    session_cost_tracker.get_tracker(self.client_providers[lang]),
+                )
+                for lang in languages
+            )
+        )
+        return dict(zip(languages, results))
+
+    async def _synthesize_language(
+        self,
+        lang: str,
+        texts: list[str],
+        executor: Executor | None,
+        cost_tracker: TTSCostTracker,
+    ) -> dict[str, "tuple[bytes | Future[bytes], str | None]"]:
+        """
+        Synthesize the texts of a language. Each clip is handed to the post-processing
+        executor as soon as it arrives, overlapping with the rest of the synthesis.
+        Returns the clip of each text and the key of the fallback voice that made it,
+        None if the primary voice did.
+        """
+        self.logger.debug(
+            "Language '%s' has %d unique texts to synthesize", lang, len(texts)
+        )
+        started = time.monotonic()
+        audio: dict[str, tuple[bytes | Future[bytes], str | None]] = {}
+        failed: list[SynthesisResult] = []
+        slowest = 0.0
+        requests = [SynthesisRequest(text=text, language=lang) for text in texts]
+        # the texts are synthesized one per call, their metrics are logged once below
+        with collect_hedging_stats() as hedging_stats:
+            async for result in self._clients_v2[lang].synthesize_stream(
+                requests, cost_tracker=cost_tracker
+            ):
+                slowest = max(slowest, result.elapsed_seconds)
+                if not result.ok:
+                    failed.append(result)
+                    continue
+                voice_key = getattr(result.audio, "voice_key", None)
+                if executor is not None:
+                    audio[result.request.text] = (
+                        executor.submit(
+                            postprocess_audio, bytes(result.audio), self.postprocessing
+                        ),
+                        voice_key,
+                    )
+                else:
+                    audio[result.request.text] = (bytes(result.audio), voice_key)
+        if hedging_stats.latencies:
+            self.logger.info("Language '%s': %s", lang, hedging_stats.summary())
+
+        if failed:
+            error = failed[0].error
+            raise RuntimeError(
+                f"TTS synthesis failed for {len(failed)} of {len(texts)} texts "
+                f"in language '{lang}': {error}"
+            ) from error
+        self.logger.info(
+            "Language '%s': synthesized %d texts in %.1fs (slowest %.2fs)",
+            lang,
+            len(texts),
+            time.monotonic() - started,
+            slowest,
+        )
+        return audio
+
+    @contextmanager
+    def _postprocessing_executor(self) -> Iterator[Executor | None]:
+        if not self.postprocessing.enabled:
+            yield None
+            return
+
+        try:
+            executor = ProcessPoolExecutor(max_workers=self.postprocessing.max_workers)
+        except (OSError, NotImplementedError) as e:
+            # e.g. AWS Lambda has no /dev/shm for multiprocessing primitives
+            self.logger.warning(
+                "Process pool unavailable (%s); post-processing audio in-process", e
+            )
+            executor = ThreadPoolExecutor(max_workers=1)
+
+        with executor:
+            yield executor
+
     def _ensure_client_for_language(self, language: str) -> str:
         language = language.lower()
         if language in self.tts_clients:
@@ -163,10 +452,135 @@ class TTSManager:
         self.logger.info("Language '%s' not configured; loading defaults", language)
         config = self.defaults_configurator.get_config(language)
 
-        # Update the clients map
+        fallbacks: list[LanguageTTSConfig] = []
+        for provider in self.fallback_providers:
+            if provider == config.provider:
+                continue
+            configurator = DefaultTTSConfigurator(
+                default_provider=provider, audio=self.defaults_configurator.audio
+            )
+            try:
+                fallbacks.append(configurator.get_config(language))
+            except ValueError:
+                self.logger.warning(
+                    "No default '%s' voice for language '%s'; it has no fallback there",
+                    provider,
+                    language,
+                )
+
+        self._register_client(language, config, fallbacks)
+        return language
+
+    def _default_failover(
+        self, language: str, config: LanguageTTSConfig
+    ) -> LanguageTTSConfig | None:
+        """
+        The default voice of the default provider, to end the fallback chain of an
+        explicitly configured language so an outage of its own provider is failed
+        over. None if disabled, already in the chain, or of another audio format.
+        """
+        default_provider = self.defaults_configurator.default_provider
+        if not (
+            self.circuit_breaker.enabled
+            and self.circuit_breaker.failover_to_default_provider
+        ) or default_provider in {
+            config.provider,
+            *(f.provider for f in config.fallbacks),
+        }:
+            return None
+        try:
+            failover = self.defaults_configurator.get_config(language)
+        except ValueError:
+            self.logger.debug(
+                "No default '%s' voice to fail over to for language '%s'",
+                default_provider,
+                language,
+            )
+            return None
+        extension = AUDIO_FILE_EXTENSIONS[config.options.audio.format]
+        if AUDIO_FILE_EXTENSIONS[failover.options.audio.format] != extension:
+            self.logger.debug(
+                "The default '%s' voice of language '%s' does not produce %s audio; "
+                "no failover to it",
+                default_provider,
+                language,
+                extension,
+            )
+            return None
+        return failover
+
+    def _register_client(
+        self,
+        language: str,
+        config: LanguageTTSConfig,
+        fallbacks: list[LanguageTTSConfig],
+        failover: LanguageTTSConfig | None = None,
+    ) -> None:
+        """
+        Create the client of a language. With fallbacks or hedging enabled, it is a
+        HedgedTTSClient over the chain of the primary and fallback voices, ending with
+        the `failover` voice, whose client is only created when it is first needed.
+        """
         client, provider = create_tts_single_language_client(
             config, self.provider_settings
         )
+        self._attach_circuit_breaker(client, provider)
+        max_concurrency = max(self.max_concurrency, client.max_concurrency or 0)
+        voice_key = _voice_key(language, provider, config)
+        self.primary_voice_keys[language] = voice_key
+        if fallbacks or failover is not None or self.hedging.enabled:
+            links = [TTSChainLink(client, provider, voice_key)]
+            for fallback in fallbacks:
+                links.append(
+                    TTSChainLink(
+                        self._create_client(fallback),
+                        fallback.provider,
+                        _voice_key(language, fallback.provider, fallback),
+                    )
+                )
+            if failover is not None:
+                links.append(
+                    TTSChainLink(
+                        _DeferredTTSClient(
+                            lambda: self._create_client(failover),
+                            failover.provider,
+                            AUDIO_FILE_EXTENSIONS[failover.options.audio.format],
+                        ),
+                        failover.provider,
+                        _voice_key(language, failover.provider, failover),
+                    )
+                )
+            client = HedgedTTSClient(
+                links, self.hedging, cost_tracker_for=self._cost_tracker_for
+            )
+            voice_key = "|".join(link.voice_key for link in links)
+
         self.tts_clients[language] = client
         self.client_providers[language] = provider
-        return language
+        self.client_voice_keys[language] = voice_key
+
+        if self.single_flight is not None:
+            client = SingleFlightTTSClient(client, voice_key, self.single_flight)
+        self._clients_v2[language] = LegacyTTSClientAdapter(
+            client, max_concurrency=max_concurrency
+        )
+
+    def _create_client(self, config: LanguageTTSConfig) -> TTSSingleLanguageClient:
+        client, provider = create_tts_single_language_client(
+            config, self.provider_settings
+        )
+        self._attach_circuit_breaker(client, provider)
+        return client
+
+    def _attach_circuit_breaker(
+        self, client: TTSSingleLanguageClient, provider: str
+    ) -> None:
+        if not self.circuit_breaker.enabled:
+            return
+        access = getattr(self.provider_settings, provider, None)
+        region = getattr(access, "region", None)
+        name = f"{provider}:{region}" if region else provider
+        client.circuit_breaker = circuit_breakers.get(name, self.circuit_breaker)
+
+    def _cost_tracker_for(self, provider: str) -> TTSCostTracker:
+        return self.session_cost_tracker.get_tracker(provider)
@@ -0,0 +1,120 @@
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING
+
+from ..logging import get_logger
+from .tts_base import TTSSingleLanguageClient
+
+if TYPE_CHECKING:
+    from .tts_cost_tracker import TTSCostTracker
+
+
+class SynthesisSingleFlight:
+    """
+    Coalesces identical in-flight synthesis requests across threads.
+
+    Each (voice, text) pair being synthesized is registered with a future. A concurrent
+    request for the same pair waits for that future instead of calling the provider
+    again. The registry only holds in-flight work: once a batch completes its entries
+    are removed, so nothing is cached beyond the lifetime of the requests.
+
+    A request first synthesizes the texts it owns and only then waits for the others,
+    so two requests waiting for each other's texts cannot deadlock.
+    """
+
+    def __init__(self) -> None:
+        self.logger = get_logger("ankify.tts.single_flight")
+        self._lock = threading.Lock()
+        self._in_flight: dict[tuple[str, str], Future[bytes]] = {}
+
+    def synthesize(
+        self,
+        client: TTSSingleLanguageClient,
+        voice_key: str,
+        entities: dict[str, bytes | None],
+        language: str,
+        cost_tracker: "TTSCostTracker | None" = None,
+    ) -> None:
+        """
+        Same contract as `TTSSingleLanguageClient.synthesize`.
+        `voice_key` identifies everything that determines the audio besides the text.
+        """
+        owned: dict[str, Future[bytes]] = {}
+        waiting: dict[str, Future[bytes]] = {}
+        with self._lock:
+            for text in entities:
+                future = self._in_flight.get((voice_key, text))
+                if future is None:
+                    future = Future()
+                    self._in_flight[(voice_key, text)] = future
+                    owned[text] = future
+                else:
+                    waiting[text] = future
+
+        if waiting:
+            self.logger.info(
+                "Language '%s': %d of %d texts are already being synthesized, waiting for them",
+                language,
+                len(waiting),
+                len(entities),
+            )
+
+        try:
+            if owned:
+                batch: dict[str, bytes | None] = dict.fromkeys(owned)
+                client.synthesize(batch, language=language, cost_tracker=cost_tracker)
+                for text, future in owned.items():
+                    entities[text] = batch[text]
+                    future.set_result(batch[text])
+        except BaseException as e:
+            for future in owned.values():
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                for text in owned:
+                    self._in_flight.pop((voice_key, text), None)
+
+        failed: dict[str, bytes | None] = {}
+        for text, future in waiting.items():
+            try:
+                entities[text] = future.result()
+            except Exception as e:
+                self.logger.warning(
+                    "Coalesced synthesis of a text failed (%s), synthesizing it again",
+                    e,
+                )
+                failed[text] = None
+        if failed:
+            client.synthesize(failed, language=language, cost_tracker=cost_tracker)
+            entities.update(failed)
+
+
+class SingleFlightTTSClient(TTSSingleLanguageClient):
+    """A client whose synthesis goes through a SynthesisSingleFlight."""
+
+    def __init__(
+        self,
+        client: TTSSingleLanguageClient,
+        voice_key: str,
+        single_flight: SynthesisSingleFlight,
+    ) -> None:
+        self.client = client
+        self.voice_key = voice_key
+        self.single_flight = single_flight
+        self.audio_file_extension = client.audio_file_extension
+
+    def synthesize(
+        self,
+        entities: dict[str, bytes | None],
+        language: str,
+        cost_tracker: "TTSCostTracker | None" = None,
+    ) -> None:
+        self.single_flight.synthesize(
+            self.client, self.voice_key, entities, language, cost_tracker
+        )
+
+
+# Shared by all TTSManager instances of the process
+synthesis_single_flight = SynthesisSingleFlight()
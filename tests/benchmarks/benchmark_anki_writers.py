@@ -0,0 +1,99 @@
+"""
+Packaging time, peak memory and package size of the Anki writers and formats.
+
+Not collected by pytest; run it with:
+
+    PYTHONPATH=src python tests/benchmarks/benchmark_anki_writers.py [1000 10000 50000]
+
+The anki21b format needs the 'anki21b' extra and is skipped without it.
+"""
+
+import argparse
+import gc
+import importlib.util
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from ankify.anki.anki_deck_creator import AnkiDeckCreator
+from ankify.vocab_entry import VocabEntry
+
+
+# (label, writer, package format)
+WRITERS = [
+    ("genanki", "genanki", "anki2"),
+    ("sqlite", "sqlite", "anki2"),
+    ("anki21b", "sqlite", "anki21b"),
+]
+
+
+def make_vocab(num_notes: int, media_dir: Path, media_bytes: int) -> list[VocabEntry]:
+    vocab = []
+    for i in range(num_notes):
+        front_audio = media_dir / f"front_{i}.mp3"
+        back_audio = media_dir / f"back_{i}.mp3"
+        # random bytes are as incompressible as encoded audio
+        front_audio.write_bytes(os.urandom(media_bytes))
+        back_audio.write_bytes(os.urandom(media_bytes))
+        vocab.append(
+            VocabEntry(
+                front=f"das Wort {i}",
+                back=f"the word {i}",
+                front_language="German",
+                back_language="English",
+                front_audio=front_audio,
+                back_audio=back_audio,
+            )
+        )
+    return vocab
+
+
+def measure(
+    writer: str, package_format: str, vocab: list[VocabEntry], output_file: Path
+) -> tuple[float, float, float]:
+    """Seconds, peak MiB and package MiB of writing the deck."""
+    creator = AnkiDeckCreator(
+        output_file, "Benchmark", "forward_and_backward", writer, package_format
+    )
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    creator.write_anki_deck(vocab)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = output_file.stat().st_size
+    output_file.unlink()
+    return elapsed, peak / 2**20, size / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("sizes", nargs="*", type=int, default=[1000, 10000, 50000])
+    parser.add_argument(
+        "--media-bytes", type=int, default=4096, help="size of every audio file"
+    )
+    args = parser.parse_args()
+    writers = WRITERS
+    if importlib.util.find_spec("zstandard") is None:
+        writers = [w for w in WRITERS if w[2] != "anki21b"]
+
+    print(f"{'notes':>8} {'writer':>8} {'seconds':>9} {'peak MiB':>9} {'file MiB':>9}")
+    for num_notes in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_dir = Path(tmp)
+            vocab = make_vocab(num_notes, tmp_dir, args.media_bytes)
+            for label, writer, package_format in writers:
+                seconds, peak_mib, file_mib = measure(
+                    writer, package_format, vocab, tmp_dir / "deck.apkg"
+                )
+                print(
+                    f"{num_notes:>8} {label:>8} {seconds:>9.2f} {peak_mib:>9.1f} "
+                    f"{file_mib:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Unit tests for pushing decks through AnkiConnect, against a local stand-in."""
+
+import base64
+import fnmatch
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from ankify.anki.anki_connect import (
+    AnkiConnectClient,
+    AnkiConnectDeckWriter,
+    AnkiConnectError,
+)
+from ankify.vocab_entry import VocabEntry
+
+
+class AnkiConnectStandIn:
+    """In-memory collection answering the AnkiConnect actions ankify uses."""
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self.api_version = 6
+        self.models = {}
+        self.decks = {"Default"}
+        self.notes = {}
+        self.media = {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def handle(self, request):
+        # like AnkiConnect, the key is checked once per request, not per action
+        if self.api_key and request.get("key") != self.api_key:
+            return {"result": None, "error": "valid api key must be provided"}
+        return self._handle_action(request)
+
+    def _handle_action(self, request):
+        with self._lock:
+            self.requests.append(request["action"])
+        try:
+            result = getattr(self, request["action"])(**request.get("params", {}))
+        except Exception as e:
+            return {"result": None, "error": str(e)}
+        return {"result": result, "error": None}
+
+    def multi(self, actions):
+        return [self._handle_action(action) for action in actions]
+
+    def version(self):
+        return self.api_version
+
+    def modelNames(self):
+        return list(self.models)
+
+    def createModel(self, modelName, inOrderFields, css, isCloze, cardTemplates):
+        self.models[modelName] = inOrderFields
+        return {"name": modelName}
+
+    def createDeck(self, deck):
+        self.decks.add(deck)
+        return 1
+
+    def getMediaFilesNames(self, pattern):
+        return [name for name in self.media if fnmatch.fnmatch(name, pattern)]
+
+    def storeMediaFile(self, filename, data):
+        with self._lock:
+            self.media[filename] = base64.b64decode(data)
+        return filename
+
+    def findNotes(self, query):
+        model = query.strip('"').removeprefix("note:")
+        return [i for i, note in self.notes.items() if note["modelName"] == model]
+
+    def notesInfo(self, notes):
+        return [
+            {
+                "noteId": i,
+                "modelName": self.notes[i]["modelName"],
+                "fields": {
+                    name: {"value": value, "order": order}
+                    for order, (name, value) in enumerate(
+                        self.notes[i]["fields"].items()
+                    )
+                },
+            }
+            for i in notes
+        ]
+
+    def addNotes(self, notes):
+        ids = []
+        for note in notes:
+            if note["deckName"] not in self.decks or not note["fields"]["Front"]:
+                ids.append(None)
+                continue
+            ids.append(len(self.notes) + 1)
+            self.notes[ids[-1]] = note
+        return ids
+
+
+@pytest.fixture
+def anki():
+    stand_in = AnkiConnectStandIn()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            body = json.dumps(stand_in.handle(request)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stand_in.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield stand_in
+    server.shutdown()
+    server.server_close()
+
+
+def _vocab(tmp_path: Path, count: int) -> list[VocabEntry]:
+    vocab = []
+    for i in range(count):
+        entry = VocabEntry(f"das Wort {i}", f"the word {i}", "German", "English")
+        entry.front_audio = tmp_path / f"ankify-front{i}.mp3"
+        entry.back_audio = tmp_path / f"ankify-back{i}.mp3"
+        entry.front_audio.write_bytes(f"front {i}".encode())
+        entry.back_audio.write_bytes(f"back {i}".encode())
+        vocab.append(entry)
+    return vocab
+
+
+def _writer(anki, **kwargs) -> AnkiConnectDeckWriter:
+    return AnkiConnectDeckWriter(
+        AnkiConnectClient(anki.url), "Ankify::Test", "forward_and_backward", **kwargs
+    )
+
+
+class TestAnkiConnectDeckWriter:
+    """Tests for AnkiConnectDeckWriter."""
+
+    def test_push_creates_note_type_deck_notes_and_media(self, anki, tmp_path):
+        result = _writer(anki).push(_vocab(tmp_path, 3))
+
+        assert result.added == 3
+        assert result.media_uploaded == 6
+        assert anki.models["Ankify_forward_and_backward"][:2] == ["Front", "Back"]
+        assert "Ankify::Test" in anki.decks
+        assert anki.media["ankify-front1.mp3"] == b"front 1"
+        fields = anki.notes[1]["fields"]
+        assert fields["Front"] == "das Wort 0"
+        assert fields["Back sound"] == "[sound:ankify-back0.mp3]"
+
+    def test_notes_are_added_in_batches(self, anki, tmp_path):
+        _writer(anki, batch_size=2).push(_vocab(tmp_path, 5))
+
+        assert anki.requests.count("addNotes") == 3
+        assert len(anki.notes) == 5
+
+    def test_existing_notes_and_media_are_skipped(self, anki, tmp_path):
+        vocab = _vocab(tmp_path, 3)
+        _writer(anki).push(vocab[:2])
+        vocab[0].front = "  DAS  Wort 0"
+
+        result = _writer(anki).push(vocab + vocab[2:])
+
+        assert (result.added, result.skipped, result.media_uploaded) == (1, 3, 2)
+        assert len(anki.notes) == 3
+
+    def test_existing_media_before_synthesis(self, anki, tmp_path):
+        _writer(anki).push(_vocab(tmp_path, 1))
+
+        writer = _writer(anki)
+        assert set(writer.existing_media) == {
+            "ankify-front0.mp3",
+            "ankify-back0.mp3",
+        }
+        assert writer.new_entries(_vocab(tmp_path, 2))[0].front == "das Wort 1"
+
+    def test_refused_notes_are_counted(self, anki, tmp_path):
+        vocab = _vocab(tmp_path, 2)
+        vocab[1].front = ""
+
+        result = _writer(anki).push(vocab)
+
+        assert (result.added, result.failed) == (1, 1)
+
+    def test_api_key_is_sent(self, anki, tmp_path):
+        anki.api_key = "secret"
+        with pytest.raises(AnkiConnectError, match="api key"):
+            _writer(anki).push(_vocab(tmp_path, 1))
+
+        client = AnkiConnectClient(anki.url, api_key="secret")
+        writer = AnkiConnectDeckWriter(client, "Ankify::Test", "forward_only")
+        assert writer.push(_vocab(tmp_path, 1)).added == 1
+
+    def test_old_api_version_is_rejected(self, anki):
+        anki.api_version = 5
+        with pytest.raises(AnkiConnectError, match="too old"):
+            _writer(anki).new_entries([])
+
+
+class TestAnkiConnectClient:
+    """Tests for AnkiConnectClient."""
+
+    def test_unreachable_anki(self):
+        client = AnkiConnectClient("http://127.0.0.1:9", timeout=1)
+        with pytest.raises(AnkiConnectError, match="Cannot reach AnkiConnect"):
+            client.invoke("version")
+
+    def test_multi_raises_the_first_error(self, anki):
+        with pytest.raises(AnkiConnectError, match="'unknownAction' failed"):
+            AnkiConnectClient(anki.url).multi([("version", {}), ("unknownAction", {})])
@@ -1,8 +1,17 @@
 """Integration tests for AnkiDeckCreator."""
 
+import json
+import sqlite3
+import zipfile
+
 import pytest
 
-from ankify.anki.anki_deck_creator import AnkiDeckCreator
+from ankify.anki.anki_deck_creator import (
+    AnkiDeckCreator,
+    deck_files,
+    shard_path,
+    shard_vocabulary,
+)
 from ankify.vocab_entry import VocabEntry
 
 
@@ -218,3 +227,142 @@ class TestGenankinSortTypeFix:
         AnkiDeckCreator(output_file, "Test", "forward_only")
 
         mock_fix.assert_called_once()
+
+
+class TestExistingMedia:
+    """Tests for leaving media the target already has out of the package."""
+
+    @pytest.mark.parametrize("writer", ["genanki", "sqlite"])
+    def test_existing_media_is_not_packaged(self, tmp_path, writer):
+        audio = {}
+        for name in ["hello.mp3", "hallo.mp3", "world.mp3", "welt.mp3"]:
+            audio[name] = tmp_path / name
+            audio[name].write_bytes(name.encode())
+        vocab = [
+            VocabEntry(
+                "Hello", "Hallo", "English", "German",
+                audio["hello.mp3"], audio["hallo.mp3"],
+            ),
+            VocabEntry(
+                "World", "Welt", "English", "German",
+                audio["world.mp3"], audio["welt.mp3"],
+            ),
+        ]
+        output_file = tmp_path / "deck.apkg"
+        creator = AnkiDeckCreator(output_file, "Test", "forward_only", writer=writer)
+
+        creator.write_anki_deck(vocab, existing_media={"hallo.mp3", "welt.mp3"})
+
+        with zipfile.ZipFile(output_file) as z:
+            media = json.loads(z.read("media"))
+        assert sorted(media.values()) == ["hello.mp3", "world.mp3"]
+
+
+class TestSharding:
+    """Tests for splitting large decks into several packages."""
+
+    @pytest.fixture
+    def vocab(self, tmp_path):
+        entries = []
+        for i in range(5):
+            front_audio = tmp_path / f"front{i}.mp3"
+            back_audio = tmp_path / f"back{i}.mp3"
+            front_audio.write_bytes(b"x" * 100)
+            back_audio.write_bytes(b"x" * 100)
+            entries.append(
+                VocabEntry(
+                    f"w{i}", f"v{i}", "English", "German", front_audio, back_audio
+                )
+            )
+        return entries
+
+    def test_shard_path(self, tmp_path):
+        assert shard_path(tmp_path / "deck.apkg", 2) == tmp_path / "deck.part2.apkg"
+
+    def test_no_limits(self, vocab):
+        assert shard_vocabulary(vocab) == [vocab]
+
+    def test_max_notes(self, vocab):
+        shards = shard_vocabulary(vocab, max_notes=2)
+        assert shards == [vocab[:2], vocab[2:4], vocab[4:]]
+
+    def test_max_bytes(self, vocab):
+        # 204 bytes per note: two audio files and 4 bytes of text
+        shards = shard_vocabulary(vocab, max_bytes=450)
+        assert [len(shard) for shard in shards] == [2, 2, 1]
+
+    def test_shared_audio_counts_once(self, vocab):
+        shared = [
+            VocabEntry(
+                f"w{i}", "v", "English", "German",
+                vocab[0].front_audio, vocab[0].back_audio,
+            )
+            for i in range(5)
+        ]
+        assert len(shard_vocabulary(shared, max_bytes=250)) == 1
+
+    def test_oversized_note_gets_own_shard(self, vocab):
+        assert len(shard_vocabulary(vocab, max_bytes=10)) == 5
+
+    def test_write_shards(self, tmp_path, vocab):
+        output_file = tmp_path / "out" / "deck.apkg"
+        creator = AnkiDeckCreator(output_file, "Test", "forward_only", writer="sqlite")
+
+        paths = creator.write_anki_deck_shards(vocab, max_notes=2, max_workers=2)
+
+        assert paths == [shard_path(output_file, i) for i in (1, 2, 3)]
+        assert not output_file.exists()
+        for index, (path, expected) in enumerate(zip(paths, [2, 2, 1]), start=1):
+            with zipfile.ZipFile(path) as z:
+                media = json.loads(z.read("media"))
+                collection = tmp_path / f"collection{index}.anki2"
+                collection.write_bytes(z.read("collection.anki2"))
+            assert len(media) == 2 * expected
+            with sqlite3.connect(collection) as conn:
+                (notes,) = conn.execute("select count(*) from notes").fetchone()
+                (decks,) = conn.execute("select decks from col").fetchone()
+            assert notes == expected
+            names = {deck["name"] for deck in json.loads(decks).values()}
+            assert f"Test::Part {index}" in names
+
+    def test_single_shard_writes_output_file(self, tmp_path, vocab):
+        output_file = tmp_path / "deck.apkg"
+        creator = AnkiDeckCreator(output_file, "Test", "forward_only")
+
+        assert creator.write_anki_deck_shards(vocab, max_notes=10) == [output_file]
+        assert output_file.is_file()
+
+    def test_deck_files(self, tmp_path):
+        output_file = tmp_path / "deck.apkg"
+        for name in ["deck.part10.apkg", "deck.part2.apkg", "deck.part.apkg"]:
+            (tmp_path / name).write_bytes(b"")
+        (tmp_path / "deck.part1.tsv").write_bytes(b"")
+        (tmp_path / "other.part1.apkg").write_bytes(b"")
+
+        assert deck_files(output_file) == [
+            tmp_path / "deck.part2.apkg",
+            tmp_path / "deck.part10.apkg",
+        ]
+        output_file.write_bytes(b"")
+        assert deck_files(output_file)[0] == output_file
+
+    def test_stale_deck_files_are_removed(self, tmp_path, vocab):
+        output_file = tmp_path / "deck.apkg"
+        creator = AnkiDeckCreator(output_file, "Test", "forward_only", writer="sqlite")
+        output_file.write_bytes(b"single deck of an earlier run")
+        shard_path(output_file, 4).write_bytes(b"part of an earlier run")
+
+        paths = creator.write_anki_deck_shards(vocab, max_notes=2, max_workers=2)
+        assert deck_files(output_file) == paths
+
+        assert creator.write_anki_deck_shards(vocab) == [output_file]
+        assert deck_files(output_file) == [output_file]
+
+    def test_given_shards_are_written(self, tmp_path, vocab):
+        output_file = tmp_path / "deck.apkg"
+        creator = AnkiDeckCreator(output_file, "Test", "forward_only", writer="sqlite")
+
+        paths = creator.write_anki_deck_shards(
+            vocab, max_workers=2, shards=[vocab[:1], vocab[1:]]
+        )
+        assert paths == [shard_path(output_file, 1), shard_path(output_file, 2)]
@@ -0,0 +1,155 @@
+"""Tests for adding notes to an existing Anki package."""
+
+import json
+import sqlite3
+import zipfile
+
+import pytest
+
+from ankify.anki.anki_deck_creator import AnkiDeckCreator
+from ankify.anki.anki_package_merger import ExistingAnkiPackage
+from ankify.anki.sqlite_anki_package import decode_media_entries, encode_media_entries
+from ankify.vocab_entry import VocabEntry
+
+
+def _entry(tmp_path, front, back):
+    front_audio = tmp_path / f"{front}.mp3"
+    back_audio = tmp_path / f"{back}.mp3"
+    front_audio.write_bytes(f"audio of {front}".encode())
+    back_audio.write_bytes(f"audio of {back}".encode())
+    return VocabEntry(front, back, "English", "German", front_audio, back_audio)
+
+
+def _notes(package_file, tmp_path):
+    collection = tmp_path / "collection.anki2"
+    with zipfile.ZipFile(package_file) as z:
+        collection.write_bytes(z.read("collection.anki2"))
+    with sqlite3.connect(collection) as conn:
+        notes = [
+            flds.split("\x1f")[0]
+            for (flds,) in conn.execute("select flds from notes order by id")
+        ]
+        cards = conn.execute("select distinct did from cards").fetchall()
+    collection.unlink()
+    return notes, cards
+
+
+class TestExistingAnkiPackage:
+    """Tests for indexing an existing package."""
+
+    @pytest.mark.parametrize("writer", ["genanki", "sqlite"])
+    def test_open(self, tmp_path, writer):
+        package_file = tmp_path / "deck.apkg"
+        creator = AnkiDeckCreator(
+            package_file, "My Deck", "forward_and_backward", writer=writer
+        )
+        creator.write_anki_deck([_entry(tmp_path, "Hello", "Hallo")])
+
+        existing = ExistingAnkiPackage.open(package_file)
+
+        assert existing.package_format == "anki2"
+        assert existing.note_type == "forward_and_backward"
+        assert existing.deck_name == "My Deck"
+        assert existing.note_keys == {("Hello", "Hallo", "English", "German")}
+        assert set(existing.media) == {"Hello.mp3", "Hallo.mp3"}
+
+    def test_new_entries(self, tmp_path):
+        package_file = tmp_path / "deck.apkg"
+        AnkiDeckCreator(package_file, "D", "forward_only").write_anki_deck(
+            [_entry(tmp_path, "Hello", "Hallo")]
+        )
+        existing = ExistingAnkiPackage.open(package_file)
+        world = _entry(tmp_path, "World", "Welt")
+        vocab = [_entry(tmp_path, "Hello", "Hallo"), world, world]
+        assert existing.new_entries(vocab) == [world]
+
+    def test_not_an_ankify_package(self, tmp_path):
+        package_file = tmp_path / "deck.apkg"
+        with zipfile.ZipFile(package_file, "w") as z:
+            z.writestr("something", b"")
+        with pytest.raises(ValueError):
+            ExistingAnkiPackage.open(package_file)
+
+    def test_media_entries_roundtrip(self):
+        entries = [("a.mp3", 3, b"\x01" * 20), ("ü.mp3", 300, b"\x02" * 20)]
+        assert decode_media_entries(encode_media_entries(entries)) == entries
+
+
+class TestMergeAnkiDeck:
+    """Tests for AnkiDeckCreator.merge_anki_deck."""
+
+    @pytest.mark.parametrize("writer", ["genanki", "sqlite"])
+    def test_merge(self, tmp_path, writer):
+        package_file = tmp_path / "deck.apkg"
+        AnkiDeckCreator(
+            package_file, "D", "forward_only", writer=writer
+        ).write_anki_deck([_entry(tmp_path, "Hello", "Hallo")])
+        existing = ExistingAnkiPackage.open(package_file)
+        # the new note shares an audio file with the package
+        world = _entry(tmp_path, "World", "Hallo")
+        (tmp_path / "Hallo.mp3").unlink()
+
+        output_file = tmp_path / "merged.apkg"
+        AnkiDeckCreator(output_file, "D", "forward_only").merge_anki_deck(
+            existing, [world]
+        )
+
+        notes, decks = _notes(output_file, tmp_path)
+        assert notes == ["Hello", "World"]
+        assert decks == [(existing.deck_id,)]
+        with zipfile.ZipFile(output_file) as z:
+            media = json.loads(z.read("media"))
+            files = {name: z.read(idx) for idx, name in media.items()}
+        assert files == {
+            "Hello.mp3": b"audio of Hello",
+            "Hallo.mp3": b"audio of Hallo",
+            "World.mp3": b"audio of World",
+        }
+        assert ExistingAnkiPackage.open(output_file).note_keys == {
+            ("Hello", "Hallo", "English", "German"),
+            ("World", "Hallo", "English", "German"),
+        }
+
+    def test_merge_into_the_same_file(self, tmp_path):
+        package_file = tmp_path / "deck.apkg"
+        creator = AnkiDeckCreator(package_file, "D", "forward_only")
+        creator.write_anki_deck([_entry(tmp_path, "Hello", "Hallo")])
+
+        creator.merge_anki_deck(
+            ExistingAnkiPackage.open(package_file), [_entry(tmp_path, "World", "Welt")]
+        )
+
+        assert _notes(package_file, tmp_path)[0] == ["Hello", "World"]
+        assert not list(tmp_path.glob(".*.tmp"))
+
+    def test_note_type_mismatch(self, tmp_path):
+        package_file = tmp_path / "deck.apkg"
+        AnkiDeckCreator(package_file, "D", "forward_only").write_anki_deck(
+            [_entry(tmp_path, "Hello", "Hallo")]
+        )
+        creator = AnkiDeckCreator(package_file, "D", "forward_and_backward")
+        with pytest.raises(ValueError):
+            creator.merge_anki_deck(ExistingAnkiPackage.open(package_file), [])
+
+    def test_merge_anki21b(self, tmp_path):
+        zstandard = pytest.importorskip("zstandard")
+        package_file = tmp_path / "deck.apkg"
+        AnkiDeckCreator(
+            package_file, "D", "forward_only", package_format="anki21b"
+        ).write_anki_deck([_entry(tmp_path, "Hello", "Hallo")])
+        existing = ExistingAnkiPackage.open(package_file)
+        assert existing.package_format == "anki21b"
+
+        output_file = tmp_path / "merged.apkg"
+        AnkiDeckCreator(
+            output_file, "D", "forward_only", package_format="anki21b"
+        ).merge_anki_deck(existing, [_entry(tmp_path, "World", "Welt")])
+
+        merged = ExistingAnkiPackage.open(output_file)
+        assert len(merged.note_keys) == 2
+        names = [name for name, _, _ in merged.media_entries]
+        assert names[:2] == [name for name, _, _ in existing.media_entries]
+        with zipfile.ZipFile(output_file) as z:
+            decompressor = zstandard.ZstdDecompressor().decompressobj()
+            world = decompressor.decompress(z.read(merged.media["World.mp3"]))
+        assert world == b"audio of World"
@@ -0,0 +1,127 @@
+"""Tests for skipping notes that are already in the user's Anki collection."""
+
+import sqlite3
+import zipfile
+
+import pytest
+
+from ankify.anki.anki_deck_creator import AnkiDeckCreator
+from ankify.anki.known_notes import KnownNotesIndex, normalize_text
+from ankify.vocab_entry import VocabEntry
+
+
+def _entry(front, back, front_language="English", back_language="German"):
+    return VocabEntry(front, back, front_language, back_language)
+
+
+def _package(tmp_path, vocab):
+    for entry in vocab:
+        entry.front_audio = tmp_path / "front.mp3"
+        entry.back_audio = tmp_path / "back.mp3"
+    (tmp_path / "front.mp3").write_bytes(b"front")
+    (tmp_path / "back.mp3").write_bytes(b"back")
+    package = tmp_path / "deck.apkg"
+    AnkiDeckCreator(package, "Deck", "forward_and_backward").write_anki_deck(vocab)
+    return package
+
+
+def _unicase(a, b):
+    return (a.casefold() > b.casefold()) - (a.casefold() < b.casefold())
+
+
+class TestKnownNotesIndex:
+    """Tests for KnownNotesIndex."""
+
+    def test_normalize_text(self):
+        assert normalize_text("  <b>Der</b>   Hund&nbsp;") == "der hund"
+
+    def test_drop_known_from_package(self, tmp_path):
+        index = KnownNotesIndex.from_files(
+            [_package(tmp_path, [_entry("<b>Hello</b>", "Hallo")])]
+        )
+        assert len(index) == 1
+
+        vocab = [
+            _entry("hello ", "HALLO", "en", "de"),
+            _entry("Hello", "Servus"),
+            _entry("World", "Welt"),
+        ]
+        assert index.drop_known(vocab) == vocab[1:]
+
+    def test_legacy_collection_file(self, tmp_path):
+        package = _package(tmp_path, [_entry("Hello", "Hallo")])
+        collection = tmp_path / "collection.anki2"
+        with zipfile.ZipFile(package) as z:
+            collection.write_bytes(z.read("collection.anki2"))
+
+        index = KnownNotesIndex.from_files([collection])
+
+        assert _entry("Hello", "Hallo") in index
+
+    def test_anki_collection_schema(self, tmp_path):
+        # Anki's own collections keep note types in a table with its own collation
+        collection = tmp_path / "collection.anki2"
+        with sqlite3.connect(collection) as conn:
+            conn.create_collation("unicase", _unicase)
+            conn.executescript(
+                """
+                CREATE TABLE col (id integer primary key, models text not null);
+                CREATE TABLE notetypes (
+                    id integer primary key, name text not null collate unicase
+                );
+                CREATE UNIQUE INDEX idx_notetypes_name ON notetypes (name);
+                CREATE TABLE notes (id integer primary key, mid integer, flds text);
+                INSERT INTO col VALUES (1, '');
+                INSERT INTO notetypes VALUES (10, 'Ankify_forward_only'), (20, 'Basic');
+                """
+            )
+            conn.executemany(
+                "INSERT INTO notes VALUES (?, ?, ?)",
+                [
+                    (1, 10, "Hund\x1fdog\x1fGerman\x1fEnglish\x1f\x1f"),
+                    (2, 20, "Katze\x1fcat\x1fGerman\x1fEnglish"),
+                ],
+            )
+        conn.close()
+
+        index = KnownNotesIndex.from_files([collection])
+
+        assert _entry("Hund", "dog", "German", "English") in index
+        assert _entry("Katze", "cat", "German", "English") not in index
+
+    def test_collection_locked_by_anki(self, tmp_path):
+        package = _package(tmp_path, [_entry("Hello", "Hallo")])
+        collection = tmp_path / "collection.anki2"
+        with zipfile.ZipFile(package) as z:
+            collection.write_bytes(z.read("collection.anki2"))
+        # like Anki desktop with the profile open
+        anki = sqlite3.connect(collection, isolation_level=None)
+        anki.execute("PRAGMA locking_mode=EXCLUSIVE")
+        anki.execute("BEGIN EXCLUSIVE")
+        try:
+            with pytest.raises(RuntimeError, match="Close Anki"):
+                KnownNotesIndex.from_files([collection])
+        finally:
+            anki.close()
+
+    def test_connection_is_closed_when_a_package_cannot_be_loaded(
+        self, tmp_path, mocker
+    ):
+        package = _package(tmp_path, [_entry("Hello", "Hallo")])
+        mocker.patch(
+            "ankify.anki.known_notes.load_collection",
+            side_effect=sqlite3.DatabaseError("file is not a database"),
+        )
+        connections = []
+        connect = sqlite3.connect
+
+        def tracked_connect(*args, **kwargs):
+            connections.append(connect(*args, **kwargs))
+            return connections[-1]
+
+        mocker.patch("ankify.anki.known_notes.sqlite3.connect", tracked_connect)
+
+        with pytest.raises(sqlite3.DatabaseError):
+            KnownNotesIndex.from_files([package])
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            connections[0].execute("SELECT 1")
@@ -0,0 +1,240 @@
+"""Unit tests for the direct SQLite Anki package writer."""
+
+import hashlib
+import io
+import json
+import sqlite3
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from ankify.anki.anki_deck_creator import AnkiDeckCreator
+from ankify.anki.sqlite_anki_package import (
+    SQLiteAnkiPackage,
+    encode_media_entries,
+    field_checksum,
+    strip_html_media,
+    write_zstd_stored,
+)
+from ankify.vocab_entry import VocabEntry
+
+
+class UnseekableStream(io.RawIOBase):
+    """Write-only stream, like an upload."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer.extend(data)
+        return len(data)
+
+
+def _open_collection(tmp_path, apkg):
+    with zipfile.ZipFile(apkg) as z:
+        db_path = tmp_path / f"{apkg.stem}.anki2"
+        db_path.write_bytes(z.read("collection.anki2"))
+        media = json.loads(z.read("media"))
+    return sqlite3.connect(db_path), media
+
+
+@pytest.fixture
+def vocab(tmp_path):
+    entries = []
+    for i, front in enumerate(["<b>Hund</b>", "Katze &amp; Maus", "Vogel"]):
+        front_audio = tmp_path / f"front_{i}.mp3"
+        back_audio = tmp_path / f"back_{i}.mp3"
+        front_audio.write_bytes(b"front audio")
+        back_audio.write_bytes(b"back audio")
+        entries.append(
+            VocabEntry(front, f"back {i}", "German", "English", front_audio, back_audio)
+        )
+    return entries
+
+
+class TestFieldChecksum:
+    """Tests for the Anki sort field and checksum."""
+
+    def test_strip_html_media(self):
+        assert strip_html_media("<b>Hund</b> &amp; <img src='cat.jpg'>") == (
+            "Hund &  cat.jpg"
+        )
+        assert strip_html_media("a<!-- comment -->b") == "ab"
+
+    def test_field_checksum(self):
+        expected = int(hashlib.sha1("Hund".encode()).hexdigest()[:8], 16)
+        assert field_checksum("<i>Hund</i>") == expected
+
+
+class TestSQLiteAnkiPackage:
+    """Tests for SQLiteAnkiPackage."""
+
+    @pytest.mark.parametrize(
+        ("note_type", "cards_per_note"),
+        [("forward_only", 1), ("forward_and_backward", 2)],
+    )
+    def test_collection(self, tmp_path, vocab, note_type, cards_per_note):
+        output_file = tmp_path / "deck.apkg"
+        creator = AnkiDeckCreator(output_file, "Deck::Sub", note_type, writer="sqlite")
+        creator.write_anki_deck(vocab)
+
+        conn, media = _open_collection(tmp_path, output_file)
+        notes = conn.execute(
+            "SELECT id, mid, flds, sfld, csum, tags FROM notes ORDER BY id"
+        ).fetchall()
+        assert [n[1] for n in notes] == [creator.anki_note_model.model_id] * 3
+        assert notes[0][2].split("\x1f") == [
+            "<b>Hund</b>",
+            "back 0",
+            "German",
+            "English",
+            "[sound:front_0.mp3]",
+            "[sound:back_0.mp3]",
+        ]
+        assert [n[3] for n in notes] == ["Hund", "Katze & Maus", "Vogel"]
+        assert [n[4] for n in notes] == [field_checksum(e.front) for e in vocab]
+        assert {n[5] for n in notes} == {"  "}
+
+        cards = conn.execute("SELECT nid, did, ord FROM cards").fetchall()
+        assert len(cards) == 3 * cards_per_note
+        assert {c[0] for c in cards} == {n[0] for n in notes}
+
+        conf, models, decks = conn.execute(
+            "SELECT conf, models, decks FROM col"
+        ).fetchone()
+        assert json.loads(conf)["sortType"] == "noteCrt"
+        assert json.loads(models)[str(creator.anki_note_model.model_id)]["name"] == (
+            f"Ankify_{note_type}"
+        )
+        deck_names = {d["name"] for d in json.loads(decks).values()}
+        assert deck_names == {"Default", "Deck::Sub"}
+        assert {c[1] for c in cards} == {
+            d["id"] for d in json.loads(decks).values() if d["name"] == "Deck::Sub"
+        }
+        assert sorted(media.values()) == sorted(
+            [f"front_{i}.mp3" for i in range(3)] + [f"back_{i}.mp3" for i in range(3)]
+        )
+
+    def test_matches_genanki_layout(self, tmp_path, vocab):
+        genanki_file = tmp_path / "genanki.apkg"
+        sqlite_file = tmp_path / "sqlite.apkg"
+        AnkiDeckCreator(genanki_file, "Deck", "forward_and_backward").write_anki_deck(
+            vocab
+        )
+        AnkiDeckCreator(
+            sqlite_file, "Deck", "forward_and_backward", writer="sqlite"
+        ).write_anki_deck(vocab)
+
+        with zipfile.ZipFile(genanki_file) as a, zipfile.ZipFile(sqlite_file) as b:
+            assert sorted(a.namelist()) == sorted(b.namelist())
+
+        schema = "SELECT type, name, sql FROM sqlite_master ORDER BY name"
+        genanki_db, _ = _open_collection(tmp_path, genanki_file)
+        genanki_tables = {
+            name: " ".join(sql.split())
+            for _, name, sql in genanki_db.execute(schema)
+            if name.startswith("ix_")
+        }
+        genanki_counts = [
+            genanki_db.execute(f"SELECT count(*) FROM {t}").fetchone()[0]
+            for t in ["notes", "cards"]
+        ]
+        sqlite_db, _ = _open_collection(tmp_path, sqlite_file)
+        sqlite_tables = {
+            name: " ".join(sql.split())
+            for _, name, sql in sqlite_db.execute(schema)
+            if name.startswith("ix_")
+        }
+        assert sqlite_tables == genanki_tables
+        assert [
+            sqlite_db.execute(f"SELECT count(*) FROM {t}").fetchone()[0]
+            for t in ["notes", "cards"]
+        ] == genanki_counts
+
+    def test_write_to_unseekable_stream(self, tmp_path, vocab):
+        creator = AnkiDeckCreator(
+            tmp_path / "unused.apkg", "Deck", "forward_only", writer="sqlite"
+        )
+        stream = UnseekableStream()
+        creator.write_anki_deck(vocab, output_stream=stream)
+
+        assert not (tmp_path / "unused.apkg").exists()
+        with zipfile.ZipFile(io.BytesIO(bytes(stream.buffer))) as z:
+            assert "collection.anki2" in z.namelist()
+
+    def test_empty_required_field_skips_card(self, tmp_path, vocab):
+        creator = AnkiDeckCreator(
+            tmp_path / "deck.apkg", "Deck", "forward_and_backward", writer="sqlite"
+        )
+        fields = creator._note_fields(vocab[0])
+        # the backward card needs the back text or the back sound
+        fields[1] = fields[5] = ""
+        package = SQLiteAnkiPackage(
+            creator.anki_note_model, 42, "Deck", [("guid", fields)]
+        )
+        db_path = tmp_path / "collection.anki2"
+        db_path.write_bytes(package.build_collection(timestamp=1_700_000_000))
+        cards = sqlite3.connect(db_path).execute("SELECT id, ord FROM cards").fetchall()
+        assert cards == [(1_700_000_000_001, 0)]
+
+
+class TestAnki21bFormat:
+    """Tests for the anki21b package format."""
+
+    @pytest.fixture
+    def zstandard(self):
+        return pytest.importorskip("zstandard")
+
+    def test_zstd_stored_frames(self, zstandard):
+        for data in [b"", b"x", bytes(range(256)) * 1500]:
+            out = io.BytesIO()
+            size, sha1 = write_zstd_stored(io.BytesIO(data), out)
+            assert size == len(data)
+            assert sha1 == hashlib.sha1(data).digest()
+            assert (
+                zstandard.ZstdDecompressor().decompressobj().decompress(out.getvalue())
+                == data
+            )
+            # raw blocks: 3 bytes per 128 KiB block on top of the content
+            assert len(out.getvalue()) <= len(data) + 6 + 3 * (len(data) // 2**17 + 1)
+
+    def test_package(self, tmp_path, vocab, zstandard):
+        output_file = tmp_path / "deck.apkg"
+        creator = AnkiDeckCreator(
+            output_file, "Deck", "forward_and_backward", package_format="anki21b"
+        )
+        assert creator.writer == "sqlite"
+        creator.write_anki_deck(vocab)
+
+        decompress = zstandard.ZstdDecompressor().decompressobj
+        with zipfile.ZipFile(output_file) as z:
+            assert z.read("meta") == b"\x08\x03"
+            assert {info.compress_type for info in z.infolist()} == {zipfile.ZIP_STORED}
+            db_path = tmp_path / "collection.anki21b"
+            db_path.write_bytes(decompress().decompress(z.read("collection.anki21b")))
+            legacy_path = tmp_path / "collection.anki2"
+            legacy_path.write_bytes(z.read("collection.anki2"))
+            media_entries = decompress().decompress(z.read("media"))
+            first_media = decompress().decompress(z.read("0"))
+
+        notes = sqlite3.connect(db_path).execute("SELECT count(*) FROM notes")
+        assert notes.fetchone() == (3,)
+        legacy_notes = sqlite3.connect(legacy_path).execute(
+            "SELECT count(*) FROM notes"
+        )
+        assert legacy_notes.fetchone() == (0,)
+
+        first_name = creator._media_files(vocab, ())[0]
+        assert first_media == Path(first_name).read_bytes()
+        assert len(media_entries) > 0
+
+    def test_media_entries_protobuf(self):
+        sha1 = bytes(20)
+        entry = b"\x0a\x05a.mp3" + b"\x10\x96\x01" + b"\x1a\x14" + sha1
+        assert encode_media_entries([("a.mp3", 150, sha1)]) == (
+            b"\x0a" + bytes([len(entry)]) + entry
+        )
@@ -0,0 +1,148 @@
+"""Unit tests for the local pre-filter of the LLM input."""
+
+import pytest
+
+from ankify.anki.known_notes import KnownNotesIndex, normalized_key
+from ankify.llm.input_filter import InputFilter, normalize_word
+from ankify.resource_registry import common_words
+
+
+class TestCommonWords:
+    """Tests for the packaged lists of common words."""
+
+    @pytest.mark.parametrize(
+        "language", ["English", "German", "Russian", "French", "Spanish"]
+    )
+    def test_lists_are_packaged(self, language):
+        words = common_words(language)
+        assert len(words) >= 100
+        assert all(word and not word.startswith("#") for word in words)
+
+    def test_aliases_are_resolved(self):
+        assert common_words("de") == common_words("German")
+
+    def test_unknown_language_has_no_list(self):
+        assert common_words("Klingon") == ()
+
+
+class TestInputFilter:
+    """Tests for InputFilter."""
+
+    def test_drops_common_short_and_numeric_words(self):
+        f = InputFilter("English", min_word_length=3)
+        words = [c.word for c in f.candidates("The 3 cats of the ox sleep in 2024.")]
+        assert words == ["cats", "sleep"]
+
+    def test_words_are_kept_once_in_order(self):
+        f = InputFilter("English")
+        words = [c.word for c in f.candidates("Cats sleep. Dogs bark at cats.")]
+        assert words == ["Cats", "sleep", "Dogs", "bark"]
+
+    def test_num_common_words_limits_the_list(self):
+        text = "the dog"
+        assert [c.word for c in InputFilter("English").candidates(text)] == ["dog"]
+        assert [
+            c.word for c in InputFilter("English", num_common_words=0).candidates(text)
+        ] == ["the", "dog"]
+
+    def test_known_terms_are_dropped(self):
+        f = InputFilter("German", known_terms=["Katze", "der Hund", "Hund und Katze"])
+        words = [c.word for c in f.candidates("Die Katze und der Hund spielen.")]
+        # "der Hund" marks "Hund" as known, "Hund und Katze" is an expression
+        assert words == ["spielen"]
+
+    def test_context_is_the_sentence(self):
+        f = InputFilter("English")
+        candidates = f.candidates("The cat sleeps.\nDogs bark!")
+        assert candidates[0].context == "The cat sleeps."
+        assert candidates[-1].context == "Dogs bark!"
+
+    def test_long_sentences_are_cut_around_the_word(self):
+        f = InputFilter("English", context_chars=30)
+        sentence = " ".join(["lorem"] * 20 + ["zebra"] + ["ipsum"] * 20) + "."
+        (zebra,) = [c for c in f.candidates(sentence) if c.word == "zebra"]
+        assert zebra.context.startswith("…lorem")
+        assert zebra.context.endswith("ipsum…")
+        assert "zebra" in zebra.context
+        assert len(zebra.context) <= 40
+
+    def test_nearby_words_share_a_passage(self):
+        f = InputFilter("English", context_chars=30, known_terms=["lorem"])
+        sentence = " ".join(["zebra", "giraffe"] + ["lorem"] * 15 + ["walrus"])
+        candidates = f.candidates(sentence)
+        assert [c.word for c in candidates] == ["zebra", "giraffe", "walrus"]
+        assert candidates[0].context == candidates[1].context
+        assert candidates[0].context.endswith("lorem…")
+        assert candidates[2].context.startswith("…lorem")
+
+    def test_filter_without_context(self):
+        f = InputFilter("English", context_chars=0)
+        lines = f.filter("Cats sleep and cats purr loudly every day. " * 3).splitlines()
+        assert lines[1:] == ["Cats, sleep, purr, loudly, every"]
+
+    def test_filter_sends_each_passage_once(self):
+        f = InputFilter("English", known_terms=["cat", "dog", "sleep"])
+        text = (
+            "The old cat and the lazy dog sleep all day long in the warm kitchen. "
+            + "The cat and the dog sleep. " * 4
+        )
+        lines = f.filter(text).splitlines()
+        assert lines[1:] == [
+            "The old cat and the lazy dog sleep all day long in the warm kitchen.",
+            "→ old, lazy, long, warm, kitchen",
+        ]
+
+    def test_filter_shrinks_a_realistic_paragraph(self):
+        text = (
+            "Die Bundesregierung hat am Mittwoch ein neues Gesetz zur Förderung "
+            "erneuerbarer Energien beschlossen. Nach Angaben des "
+            "Wirtschaftsministeriums sollen bis zum Jahr 2030 mindestens achtzig "
+            "Prozent des Stroms aus Wind- und Solaranlagen stammen. Kritiker "
+            "bemängeln jedoch, dass der Ausbau der Stromnetze nicht mit dem Tempo "
+            "der neuen Anlagen Schritt halte. Die Opposition kündigte an, im "
+            "Bundestag gegen den Entwurf zu stimmen."
+        )
+        # the vocabulary of an advanced learner
+        known = (
+            "Bundesregierung Mittwoch neues Gesetz Förderung Energien beschlossen "
+            "Angaben sollen Jahr mindestens achtzig Prozent Stroms Wind stammen "
+            "Kritiker jedoch Ausbau Tempo neuen Anlagen Schritt halte Opposition "
+            "kündigte Bundestag gegen Entwurf stimmen"
+        ).split()
+
+        filtered = InputFilter("German", known_terms=known).filter(text)
+
+        assert len(filtered) < len(text)
+        for word in ["erneuerbarer", "Solaranlagen", "bemängeln", "Stromnetze"]:
+            assert word in filtered
+        assert "Opposition" not in filtered
+
+    def test_filter_never_grows_the_text(self):
+        # dense prose: nearly every sentence has new words
+        text = (
+            "Die Bundesregierung hat am Mittwoch ein neues Gesetz zur Förderung "
+            "erneuerbarer Energien beschlossen. Kritiker bemängeln jedoch, dass der "
+            "Ausbau der Stromnetze nicht mit dem Tempo der neuen Anlagen Schritt halte."
+        )
+        assert InputFilter("German").filter(text) == text
+
+    def test_filter_returns_empty_text_without_candidates(self):
+        assert InputFilter("English").filter("The, and of it.") == ""
+
+    def test_normalize_word(self):
+        assert normalize_word("Müller") == normalize_word("Müller")
+        assert normalize_word("Don’t") == "don't"
+
+
+class TestKnownNotesTerms:
+    """Tests for KnownNotesIndex.terms."""
+
+    def test_terms_of_a_language(self):
+        index = KnownNotesIndex(
+            [
+                normalized_key("der <b>Hund</b>", "the dog", "German", "English"),
+                normalized_key("cat", "die Katze", "English", "de"),
+            ]
+        )
+        assert index.terms("German") == {"der hund", "die katze"}
+        assert index.terms("English") == {"the dog", "cat"}
@@ -0,0 +1,146 @@
+"""Unit tests for concurrent vocabulary generation with the async LLM API."""
+
+import asyncio
+import json
+
+import httpx
+import openai
+import pytest
+from openai.types.completion_usage import CompletionUsage
+from pydantic import SecretStr
+
+from ankify.llm.llm_base import LLMClient
+from ankify.llm.llm_cost_tracker import LLMPricing, LLMPricingLoader
+from ankify.llm.openai_llm import OpenAIClient, _shared_async_client
+from ankify.settings import LLMConfig, LLMOptions, OpenAIProviderAccess
+from ankify.vocab_entry import VocabEntry
+
+
+@pytest.fixture(autouse=True)
+def pricing(mocker):
+    mocker.patch.object(LLMPricingLoader, "get_pricing", return_value=LLMPricing())
+
+
+def _usage():
+    return CompletionUsage(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+
+
+class SlowLLMClient(LLMClient):
+    """Async calls take `delay` seconds; tracks how many run at once."""
+
+    def __init__(self, max_concurrency, delay=0.05):
+        super().__init__("gpt-5", max_concurrency=max_concurrency)
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+
+    def _call_llm(self, instructions, input_text):
+        raise AssertionError("the async path must not block")
+
+    async def _call_llm_async(self, instructions, input_text):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return f"{input_text}\tx\tGerman\tEnglish", _usage()
+
+
+class BlockingLLMClient(LLMClient):
+    """Only implements the blocking call."""
+
+    def _call_llm(self, instructions, input_text):
+        return f"{input_text}\tx\tGerman\tEnglish", _usage()
+
+
+class TestGenerateVocabularyAsync:
+    """Tests for LLMClient.generate_vocabulary_async."""
+
+    @pytest.mark.parametrize("max_concurrency", [1, 3])
+    def test_concurrency_is_bounded(self, max_concurrency):
+        client = SlowLLMClient(max_concurrency)
+
+        async def run():
+            return await asyncio.gather(
+                *(client.generate_vocabulary_async("p", f"w{i}") for i in range(6))
+            )
+
+        results = asyncio.run(run())
+        assert [vocab[0].front for vocab in results] == [f"w{i}" for i in range(6)]
+        assert client.max_active == max_concurrency
+
+    def test_client_is_usable_from_several_event_loops(self):
+        client = SlowLLMClient(2, delay=0)
+        for _ in range(2):
+            vocab = asyncio.run(client.generate_vocabulary_async("p", "Hund"))
+            assert vocab == [VocabEntry("Hund", "x", "German", "English")]
+
+    def test_blocking_clients_run_in_a_thread(self):
+        client = BlockingLLMClient("gpt-5")
+        vocab = asyncio.run(client.generate_vocabulary_async("p", "Hund"))
+        assert vocab == [VocabEntry("Hund", "x", "German", "English")]
+
+
+def _openai_client(model="gpt-5"):
+    return OpenAIClient(
+        LLMConfig(options=LLMOptions(model=model, max_concurrency=2)),
+        OpenAIProviderAccess(api_key=SecretStr("key"), base_url="http://llm.test/v1"),
+    )
+
+
+class TestOpenAIClientAsync:
+    """Tests for the async path of OpenAIClient."""
+
+    def test_chat_completion(self, monkeypatch):
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            requests.append(body)
+            return httpx.Response(
+                200,
+                json={
+                    "id": "1",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {
+                                "role": "assistant",
+                                "content": "Hund\tdog\tGerman\tEnglish",
+                            },
+                        }
+                    ],
+                    "usage": _usage().model_dump(),
+                },
+            )
+
+        async_openai = openai.AsyncOpenAI
+        monkeypatch.setattr(
+            openai,
+            "AsyncOpenAI",
+            lambda **kwargs: async_openai(
+                **kwargs,
+                http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            ),
+        )
+        client = _openai_client()
+        vocab = asyncio.run(client.generate_vocabulary_async("prompt", "Hund"))
+        assert vocab == [VocabEntry("Hund", "dog", "German", "English")]
+        assert requests[0]["messages"][1] == {"role": "user", "content": "Hund"}
+
+    def test_async_client_is_shared_per_endpoint_and_loop(self):
+        async def clients():
+            return (
+                _shared_async_client("key", "http://llm.test/v1"),
+                _shared_async_client("key", "http://llm.test/v1"),
+                _shared_async_client("key", "http://other.test/v1"),
+            )
+
+        first, same, other = asyncio.run(clients())
+        assert first is same
+        assert first is not other
+        next_loop, _, _ = asyncio.run(clients())
+        assert next_loop is not first
@@ -1,13 +1,16 @@
 """Unit tests for LLM cost tracking."""
 
 import json
+import os
 import pytest
 from decimal import Decimal
+from urllib.error import URLError
 
 from ankify.llm.llm_cost_tracker import (
     LLMPricing,
     LLMTokenUsage,
     LLMCost,
+    LLMPricingIndex,
     LLMPricingLoader,
     LLMUsage,
     _determine_cost_decimals,
@@ -339,8 +342,10 @@ class TestLLMPricingLoader:
 
         assert pricing.cached_input == Decimal("0.000015")
 
-    def test_fetch_from_url_when_no_cache(self, tmp_path, mocker):
-        """Fetch from URL when cache doesn't exist."""
+    def test_no_cache_uses_snapshot_and_refreshes_in_background(
+        self, tmp_path, mocker
+    ):
+        """Without a cache, the bundled snapshot is used while fetching from URL."""
         mock_data = {
             "gpt-5": {
                 "input_cost_per_token": "0.00003",
@@ -352,7 +357,148 @@ class TestLLMPricingLoader:
         loader = LLMPricingLoader(cache_dir=tmp_path)
         pricing = loader.get_pricing("gpt-5")
 
-        assert pricing.uncached_input == Decimal("0.00003")
+        assert pricing.uncached_input == Decimal("0.00000125")
+        loader._refresh_thread.join()
+        assert loader.get_pricing("gpt-5").uncached_input == Decimal("0.00003")
+        cached = json.loads((tmp_path / "llm_pricing.json").read_text())
+        assert cached == {
+            "format": "ankify-llm-pricing/1",
+            "models": {"gpt-5": ["0.00003", None, "0.00006"]},
+        }
+
+    def test_offline_without_cache_uses_snapshot(self, tmp_path, mocker):
+        """Failed downloads keep the bundled snapshot."""
+        mocker.patch.object(
+            LLMPricingLoader, "_fetch_from_url", side_effect=URLError("offline")
+        )
+        loader = LLMPricingLoader(cache_dir=tmp_path)
+        assert loader.get_pricing("gpt-5-mini").output == Decimal("0.000002")
+        loader._refresh_thread.join()
+        assert loader.get_pricing("gpt-5-mini").output == Decimal("0.000002")
+        assert not (tmp_path / "llm_pricing.json").exists()
+
+    def test_outdated_cache_is_used_until_refreshed(self, tmp_path, mocker):
+        """An outdated cache is used, and refreshed in the background."""
+        cache_file = tmp_path / "llm_pricing.json"
+        cache_file.write_text(
+            json.dumps(
+                {
+                    "format": "ankify-llm-pricing/1",
+                    "models": {"gpt-5": ["0.00001", "0.000001", "0.00002"]},
+                }
+            )
+        )
+        os.utime(cache_file, (0, 0))
+        fetch = mocker.patch.object(
+            LLMPricingLoader, "_fetch_from_url", side_effect=URLError("offline")
+        )
+
+        loader = LLMPricingLoader(cache_dir=tmp_path)
+        pricing = loader.get_pricing("gpt-5")
+        loader._refresh_thread.join()
+
+        assert pricing.cached_input == Decimal("0.000001")
+        fetch.assert_called_once()
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            '["not", "an", "object"]',
+            '{"format": "ankify-llm-pricing/1"}',
+            '{"format": "ankify-llm-pricing/1", "models": 42}',
+        ],
+    )
+    def test_malformed_cache_is_no_cache(self, tmp_path, mocker, content):
+        """A cache that cannot be indexed falls back to the snapshot and is refreshed."""
+        (tmp_path / "llm_pricing.json").write_text(content)
+        fetch = mocker.patch.object(
+            LLMPricingLoader, "_fetch_from_url", side_effect=URLError("offline")
+        )
+
+        loader = LLMPricingLoader(cache_dir=tmp_path)
+        assert loader.get_pricing("gpt-5-mini").output == Decimal("0.000002")
+        loader._refresh_thread.join()
+        fetch.assert_called_once()
+
+    def test_valid_cache_is_not_refreshed(self, tmp_path, mocker):
+        cache_file = tmp_path / "llm_pricing.json"
+        cache_file.write_text(
+            json.dumps(
+                {
+                    "format": "ankify-llm-pricing/1",
+                    "models": {"gpt-5": ["0.00001", None, "0.00002"]},
+                }
+            )
+        )
+        fetch = mocker.patch.object(LLMPricingLoader, "_fetch_from_url")
+        loader = LLMPricingLoader(cache_dir=tmp_path)
+        assert loader.get_pricing("gpt-5").output == Decimal("0.00002")
+        assert loader._refresh_thread is None
+        fetch.assert_not_called()
+
+    def test_full_litellm_cache_is_indexed(self, tmp_path):
+        """Full litellm data cached by older versions is replaced by the index."""
+        cache_file = tmp_path / "llm_pricing.json"
+        cache_file.write_text(
+            json.dumps(
+                {
+                    "sample_spec": {"max_tokens": "set to max_output_tokens"},
+                    "gpt-5": {
+                        "input_cost_per_token": 0.00003,
+                        "output_cost_per_token": 0.00006,
+                        "max_tokens": 128000,
+                    },
+                }
+            )
+        )
+
+        loader = LLMPricingLoader(cache_dir=tmp_path)
+        assert loader.get_pricing("gpt-5").uncached_input == Decimal("0.00003")
+        assert json.loads(cache_file.read_text())["models"] == {
+            "gpt-5": ["3e-05", None, "6e-05"]
+        }
+
+
+class TestLLMPricingIndex:
+    """Tests for LLMPricingIndex lookups."""
+
+    @pytest.fixture
+    def index(self):
+        return LLMPricingIndex(
+            {
+                "gpt-5": ["0.1", None, "0.2"],
+                "azure/gpt-5-mini": ["0.3", None, "0.4"],
+                "openai/gpt-5-mini": ["0.5", None, "0.6"],
+                "gpt-4o-2024-08-06": ["0.7", None, "0.8"],
+            }
+        )
+
+    def test_exact_match(self, index):
+        assert index.resolve("gpt-5") == "gpt-5"
+        assert index.resolve("openai/gpt-5-mini") == "openai/gpt-5-mini"
+
+    def test_match_without_provider(self, index):
+        """The first model with the name wins, as in the litellm data."""
+        assert index.resolve("gpt-5-mini") == "azure/gpt-5-mini"
+        assert index.resolve("openrouter/gpt-5") == "gpt-5"
+
+    def test_prefix_match(self, index):
+        assert index.resolve("gpt-4o") == "gpt-4o-2024-08-06"
+
+    def test_unknown_model(self, index):
+        assert index.resolve("claude") is None
+        assert index.get("claude") is None
+
+    def test_get(self, index):
+        assert index.get("gpt-5") == LLMPricing(
+            Decimal("0.1"), Decimal("0.1"), Decimal("0.2"), Decimal("0.2")
+        )
+
+    def test_bundled_snapshot_is_valid(self):
+        index = LLMPricingLoader._load_snapshot()
+        assert index.models
+        for model in index.models:
+            assert index.get(model).is_valid, model
 
 
 class TestCostFormatting:
@@ -453,3 +599,18 @@ class TestLLMUsage:
 
         assert "gpt-5" in table_str
         assert "TOTAL" in table_str
+
+    def test_cache_hits_are_counted_separately(self, mocker):
+        """Cache hits add no tokens or cost, only a hit count."""
+        pricing = LLMPricing(
+            Decimal("0.000001"), Decimal("0.000001"), Decimal("0.000002"), Decimal("0.000002")
+        )
+        mocker.patch.object(LLMPricingLoader, "get_pricing", return_value=pricing)
+        tokens = LLMTokenUsage(100, 900, 200, 800, 2000)
+        call = LLMUsage("gpt-5", pricing, tokens, LLMCost.calculate(tokens, pricing))
+
+        result = call + LLMUsage.from_cache_hit("gpt-5")
+        assert (result.num_calls, result.cache_hits) == (1, 1)
+        assert result.token_usage.total == 2000
+        assert result.cost == call.cost
+        assert "cache hits: 1" in result.table_to_string()
@@ -0,0 +1,145 @@
+"""Unit tests for the on-disk LLM response cache."""
+
+import os
+import time
+
+import pytest
+from openai.types.completion_usage import CompletionUsage
+
+from ankify.llm.llm_base import LLMClient
+from ankify.llm.llm_cost_tracker import (
+    LLMPricing,
+    LLMPricingLoader,
+    LLMTokenUsage,
+    LLMUsage,
+)
+from ankify.llm.llm_response_cache import LLMResponseCache
+
+
+ANSWER = "der Hund\tthe dog\tGerman\tEnglish"
+TOKENS = LLMTokenUsage(0, 100, 0, 20, 120)
+
+
+def _cache(tmp_path, ttl_seconds=60, max_size_bytes=1_000_000):
+    return LLMResponseCache(tmp_path / "cache", ttl_seconds, max_size_bytes)
+
+
+class TestLLMResponseCache:
+    """Tests for LLMResponseCache."""
+
+    def test_put_and_get(self, tmp_path):
+        cache = _cache(tmp_path)
+        assert cache.get("k") is None
+        cache.put("k", ANSWER, TOKENS)
+        cached = cache.get("k")
+        assert cached.answer == ANSWER
+        assert cached.token_usage == TOKENS
+
+    def test_key_depends_on_every_part(self):
+        base = ("gpt-5", None, "prompt", "input")
+        keys = {
+            LLMResponseCache.key(*base),
+            LLMResponseCache.key("gpt-5-mini", None, "prompt", "input"),
+            LLMResponseCache.key("gpt-5", "high", "prompt", "input"),
+            LLMResponseCache.key("gpt-5", None, "prompt 2", "input"),
+            LLMResponseCache.key("gpt-5", None, "prompt", "input 2"),
+            LLMResponseCache.key(*base, endpoint="https://openrouter.ai/api/v1"),
+        }
+        assert len(keys) == 6
+        assert LLMResponseCache.key(*base) == LLMResponseCache.key(*base)
+
+    def test_expired_entries_are_dropped(self, tmp_path, monkeypatch):
+        cache = _cache(tmp_path, ttl_seconds=60)
+        cache.put("k", ANSWER, TOKENS)
+        now = time.time()
+        monkeypatch.setattr("ankify.llm.llm_response_cache.time.time", lambda: now + 61)
+        assert cache.get("k") is None
+        assert not (tmp_path / "cache" / "k.json").exists()
+
+    def test_least_recently_used_are_evicted(self, tmp_path):
+        cache = _cache(tmp_path)
+        for key in ["a", "b", "c"]:
+            cache.put(key, ANSWER, TOKENS)
+        # sizes differ by a few bytes with the length of the timestamps
+        entry_size = max(
+            (tmp_path / "cache" / f"{key}.json").stat().st_size + 8
+            for key in ["a", "b", "c"]
+        )
+        # "a" is the oldest, but it is used last
+        for age, key in [(30, "a"), (20, "b"), (10, "c")]:
+            mtime = time.time() - age
+            os.utime(tmp_path / "cache" / f"{key}.json", (mtime, mtime))
+        assert cache.get("a") is not None
+
+        cache.max_size_bytes = 3 * entry_size
+        cache.put("d", ANSWER, TOKENS)
+        assert {p.stem for p in (tmp_path / "cache").glob("*.json")} == {"a", "c", "d"}
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path):
+        cache = _cache(tmp_path)
+        cache.put("k", ANSWER, TOKENS)
+        (tmp_path / "cache" / "k.json").write_text("{not json")
+        assert cache.get("k") is None
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            '{"answer": "a"}',
+            '["not", "an", "object"]',
+            '{"created_at": "yesterday", "answer": "a", "token_usage": {}}',
+            '{"created_at": 0, "answer": "a", "token_usage": {"unknown": 1}}',
+        ],
+    )
+    def test_malformed_entry_is_a_miss(self, tmp_path, content):
+        cache = _cache(tmp_path)
+        cache.put("k", ANSWER, TOKENS)
+        (tmp_path / "cache" / "k.json").write_text(content)
+        assert cache.get("k") is None
+
+
+class FakeLLMClient(LLMClient):
+    """Answers every request with `answer` and counts the calls."""
+
+    def __init__(self, response_cache, answer=ANSWER):
+        super().__init__("gpt-5", response_cache=response_cache)
+        self.answer = answer
+        self.calls = 0
+
+    def _call_llm(self, instructions, input_text):
+        self.calls += 1
+        usage = CompletionUsage(
+            prompt_tokens=100, completion_tokens=20, total_tokens=120
+        )
+        return self.answer, usage
+
+
+class TestGenerateVocabularyWithCache:
+    """Tests for LLMClient.generate_vocabulary with a response cache."""
+
+    @pytest.fixture(autouse=True)
+    def pricing(self, mocker):
+        mocker.patch.object(LLMPricingLoader, "get_pricing", return_value=LLMPricing())
+
+    def test_identical_request_is_served_from_cache(self, tmp_path, mocker):
+        cache_hit = mocker.spy(LLMUsage, "from_cache_hit")
+        client = FakeLLMClient(_cache(tmp_path))
+        first = client.generate_vocabulary("prompt", "input")
+        second = client.generate_vocabulary("prompt", "input")
+        assert first == second
+        assert client.calls == 1
+        assert cache_hit.call_count == 1
+
+        client.generate_vocabulary("prompt", "other input")
+        assert client.calls == 2
+
+    def test_answers_without_entries_are_not_cached(self, tmp_path):
+        client = FakeLLMClient(_cache(tmp_path), answer="Sorry, I cannot help.")
+        client.generate_vocabulary("prompt", "input")
+        client.generate_vocabulary("prompt", "input")
+        assert client.calls == 2
+
+    def test_without_cache(self):
+        client = FakeLLMClient(None)
+        client.generate_vocabulary("prompt", "input")
+        client.generate_vocabulary("prompt", "input")
+        assert client.calls == 2
@@ -0,0 +1,214 @@
+"""Unit tests for bulk vocabulary generation with the Batch API."""
+
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from ankify.llm.llm_cost_tracker import LLMPricing, LLMPricingLoader
+from ankify.llm.openai_batch import (
+    BatchStatus,
+    LLMBatchRunner,
+    LocalBatchBackend,
+    OpenAIBatchBackend,
+)
+from ankify.vocab_entry import VocabEntry
+
+
+PRICING = LLMPricing(
+    Decimal("0.000001"), Decimal("0.000002"), Decimal("0.000004"), Decimal("0.000004")
+)
+
+
+@pytest.fixture(autouse=True)
+def pricing(mocker):
+    mocker.patch.object(LLMPricingLoader, "get_pricing", return_value=PRICING)
+
+
+def complete(body):
+    """Chat completion echoing the user message as a vocabulary row."""
+    text = body["messages"][1]["content"]
+    if text == "boom":
+        raise ConnectionError("provider unavailable")
+    return {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body["model"],
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {
+                    "role": "assistant",
+                    "content": f"{text}\tx\tGerman\tEnglish",
+                },
+            }
+        ],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+    }
+
+
+def _runner(backend, **kwargs):
+    return LLMBatchRunner(
+        backend, "gpt-5", poll_interval_seconds=0, timeout_seconds=5, **kwargs
+    )
+
+
+class TestLLMBatchRunner:
+    """Tests for LLMBatchRunner."""
+
+    def test_build_input(self):
+        runner = _runner(LocalBatchBackend(complete), reasoning_effort="low")
+        lines = runner.build_input("prompt", {"a": "Hund", "b": "Katze"}).splitlines()
+        requests = [json.loads(line) for line in lines]
+        assert [r["custom_id"] for r in requests] == ["a", "b"]
+        assert requests[0]["method"] == "POST"
+        assert requests[0]["url"] == "/v1/chat/completions"
+        assert requests[0]["body"] == {
+            "model": "gpt-5",
+            "messages": [
+                {"role": "system", "content": "prompt"},
+                {"role": "user", "content": "Hund"},
+            ],
+            "reasoning_effort": "low",
+        }
+
+    def test_run(self):
+        result = _runner(LocalBatchBackend(complete)).run(
+            "prompt", {"a": "Hund", "b": "boom", "c": "Katze"}
+        )
+        assert result.vocabularies == {
+            "a": [VocabEntry("Hund", "x", "German", "English")],
+            "c": [VocabEntry("Katze", "x", "German", "English")],
+        }
+        assert result.errors == {"b": "provider unavailable"}
+        assert result.usage.num_calls == 2
+        assert result.usage.token_usage.total == 220
+
+    def test_batch_prices(self):
+        backend = LocalBatchBackend(complete)
+        backend.price_factor = Decimal("0.5")
+        result = _runner(backend).run("prompt", {"a": "Hund"})
+        assert result.usage.pricing.uncached_input == Decimal("0.000001")
+        assert result.usage.cost.total == Decimal("0.00012")
+
+    def test_failed_batch_reports_every_input(self, mocker):
+        backend = LocalBatchBackend(complete)
+        mocker.patch.object(
+            backend,
+            "retrieve",
+            side_effect=lambda batch_id: BatchStatus(batch_id, "failed"),
+        )
+        result = _runner(backend).run("prompt", {"a": "Hund"})
+        assert result.vocabularies == {}
+        assert result.errors == {"a": "no result (batch failed)"}
+
+    def test_timeout_cancels_batch(self, mocker):
+        backend = LocalBatchBackend(complete)
+        mocker.patch.object(
+            backend,
+            "retrieve",
+            side_effect=lambda batch_id: BatchStatus(batch_id, "in_progress"),
+        )
+        cancel = mocker.spy(backend, "cancel")
+        runner = LLMBatchRunner(
+            backend, "gpt-5", poll_interval_seconds=0, timeout_seconds=0
+        )
+        with pytest.raises(TimeoutError):
+            runner.run("prompt", {"a": "Hund"})
+        cancel.assert_called_once()
+
+    def test_error_responses_in_output_file(self):
+        backend = LocalBatchBackend(complete)
+        output = json.dumps(
+            {
+                "custom_id": "a",
+                "response": {
+                    "status_code": 429,
+                    "body": {"error": {"message": "rate limited"}},
+                },
+                "error": None,
+            }
+        ).encode()
+        backend.retrieve = lambda batch_id: BatchStatus(
+            batch_id, "completed", output_file_id=backend.upload(output)
+        )
+        result = _runner(backend).run("prompt", {"a": "Hund"})
+        assert result.errors == {"a": "rate limited"}
+        assert result.usage is None
+
+    def test_items_without_answer_are_errors(self):
+        backend = LocalBatchBackend(complete)
+        answered, refused = (
+            complete({"model": "gpt-5", "messages": [{}, {"content": text}]})
+            for text in ["Hund", "Waffe"]
+        )
+        refused["choices"][0]["finish_reason"] = "content_filter"
+        refused["choices"][0]["message"].update(content=None, refusal="I can't.")
+        output = "\n".join(
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "response": {"status_code": 200, "body": body},
+                    "error": None,
+                }
+            )
+            for custom_id, body in [
+                ("a", answered),
+                ("b", refused),
+                ("c", {"id": "chatcmpl-1"}),
+            ]
+        ).encode()
+        backend.retrieve = lambda batch_id: BatchStatus(
+            batch_id, "completed", output_file_id=backend.upload(output)
+        )
+
+        result = _runner(backend).run("prompt", {"a": "Hund", "b": "Waffe", "c": "x"})
+
+        assert result.vocabularies == {
+            "a": [VocabEntry("Hund", "x", "German", "English")]
+        }
+        assert result.errors["b"] == (
+            "no answer (finish_reason: content_filter, refusal: I can't.)"
+        )
+        assert result.errors["c"].startswith("malformed response")
+        # the refused request was paid for
+        assert result.usage.num_calls == 2
+
+
+def test_openai_batch_backend():
+    batch = SimpleNamespace(
+        id="batch_1",
+        status="in_progress",
+        output_file_id=None,
+        error_file_id=None,
+        request_counts=SimpleNamespace(completed=3, failed=1, total=10),
+    )
+    calls = {}
+
+    def create_file(file, purpose):
+        calls["file"] = (file[1].read(), purpose)
+        return SimpleNamespace(id="file_1")
+
+    def create_batch(**kwargs):
+        calls["batch"] = kwargs
+        return batch
+
+    client = SimpleNamespace(
+        files=SimpleNamespace(
+            create=create_file,
+            content=lambda file_id: SimpleNamespace(content=b"output"),
+        ),
+        batches=SimpleNamespace(create=create_batch, retrieve=lambda batch_id: batch),
+    )
+    backend = OpenAIBatchBackend(client)
+
+    assert backend.upload(b"{}") == "file_1"
+    assert calls["file"] == (b"{}", "batch")
+    status = backend.create("file_1")
+    assert calls["batch"]["endpoint"] == "/v1/chat/completions"
+    assert calls["batch"]["completion_window"] == "24h"
+    assert status == BatchStatus("batch_1", "in_progress", None, None, 3, 1, 10)
+    assert backend.download("file_2") == b"output"
@@ -0,0 +1,115 @@
+"""Unit tests for the SQLite translation memory."""
+
+import pytest
+
+from ankify.llm.translation_memory import (
+    TranslationMemory,
+    normalize_term,
+    prompt_version,
+)
+from ankify.vocab_entry import VocabEntry
+
+
+def _memory(tmp_path, note_type="forward_and_backward", version="v1"):
+    return TranslationMemory(
+        tmp_path / "tm" / "memory.sqlite3", "German", "English", note_type, version
+    )
+
+
+def _entry(front, back, front_lang="German", back_lang="English"):
+    return VocabEntry(front, back, front_lang, back_lang)
+
+
+class TestNormalizeTerm:
+    """Tests for normalize_term."""
+
+    @pytest.mark.parametrize(
+        "line",
+        [
+            "der Hund",
+            "  Der   HUND ",
+            "- der Hund",
+            "3. der Hund;",
+            "der Hund.",
+        ],
+    )
+    def test_variants_match(self, line):
+        assert normalize_term(line) == "der hund"
+
+    def test_unicode_forms_match(self):
+        assert normalize_term("Mu\u0308ller") == normalize_term("M\u00fcller")
+
+
+class TestTranslationMemory:
+    """Tests for TranslationMemory."""
+
+    def test_record_and_lookup(self, tmp_path):
+        memory = _memory(tmp_path)
+        assert (
+            memory.record([_entry("der Hund", "the dog"), _entry("Katze", "cat")]) == 2
+        )
+        known = memory.lookup(["der hund", "maus"])
+        assert known == {"der hund": [_entry("der Hund", "the dog")]}
+
+    def test_record_replaces_term(self, tmp_path):
+        memory = _memory(tmp_path)
+        memory.record([_entry("der Hund", "the dog")])
+        memory.record([_entry("der Hund", "the hound")])
+        assert memory.lookup(["der hund"])["der hund"] == [
+            _entry("der Hund", "the hound")
+        ]
+
+    def test_forward_only_keeps_reversed_entries_with_term(self, tmp_path):
+        memory = _memory(tmp_path, note_type="forward_only")
+        entries = [
+            _entry("the dog", "der Hund", "English", "German"),  # no term yet
+            _entry("der Hund", "the dog"),
+            _entry("the dog", "der Hund", "English", "German"),
+            _entry("die Katze", "the cat"),
+        ]
+        memory.record(entries)
+        assert memory.lookup(["der hund"])["der hund"] == entries[1:3]
+
+    def test_scoped_by_language_pair_note_type_and_prompt(self, tmp_path):
+        _memory(tmp_path).record([_entry("der Hund", "the dog")])
+        assert _memory(tmp_path, version="v2").lookup(["der hund"]) == {}
+        assert _memory(tmp_path, note_type="forward_only").lookup(["der hund"]) == {}
+        other_pair = TranslationMemory(
+            tmp_path / "tm" / "memory.sqlite3",
+            "German",
+            "Russian",
+            "forward_and_backward",
+            "v1",
+        )
+        assert other_pair.lookup(["der hund"]) == {}
+
+    def test_lookup_many_terms(self, tmp_path):
+        memory = _memory(tmp_path)
+        memory.record([_entry(f"Wort {i}", f"word {i}") for i in range(1200)])
+        known = memory.lookup(f"wort {i}" for i in range(0, 1200, 2))
+        assert len(known) == 600
+
+    def test_split_known_terms(self, tmp_path):
+        memory = _memory(tmp_path)
+        memory.record([_entry("der Hund", "the dog"), _entry("die Katze", "the cat")])
+
+        entries, remaining = memory.split_known_terms(
+            "- der Hund\ndie Maus\n\nDer Hund\ndie Katze\n"
+        )
+        assert entries == [
+            _entry("der Hund", "the dog"),
+            _entry("die Katze", "the cat"),
+        ]
+        assert remaining == "die Maus\n"
+
+    def test_split_running_text(self, tmp_path):
+        memory = _memory(tmp_path)
+        memory.record([_entry("der Hund", "the dog")])
+        text = "Der Hund schläft im Garten."
+        assert memory.split_known_terms(text) == ([], text)
+
+
+def test_prompt_version():
+    assert prompt_version("prompt") == prompt_version("prompt")
+    assert prompt_version("prompt") != prompt_version("prompt ")
+    assert len(prompt_version("prompt")) == 16
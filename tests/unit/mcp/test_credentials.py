@@ -0,0 +1,135 @@
+"""Unit tests for cached provider credentials."""
+
+import pytest
+
+from ankify.mcp import credentials
+from ankify.mcp.credentials import CachedSecret, azure_subscription_key_from_env
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(credentials.time, "monotonic", fake)
+    return fake
+
+
+class Source:
+    """Secret source returning a new version on every fetch."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self) -> str:
+        if self.fail:
+            raise ConnectionError("secrets manager unavailable")
+        self.calls += 1
+        return f"key-{self.calls}"
+
+
+class TestCachedSecret:
+    """Tests for CachedSecret."""
+
+    def test_lazy_and_cached(self, clock):
+        source = Source()
+        secret = CachedSecret(source, "key", ttl_seconds=100, refresh_ahead_seconds=10)
+        assert source.calls == 0
+        assert secret.get() == "key-1"
+        clock.now += 50
+        assert secret.get() == "key-1"
+        assert source.calls == 1
+
+    def test_refetched_after_ttl(self, clock):
+        source = Source()
+        secret = CachedSecret(source, "key", ttl_seconds=100, refresh_ahead_seconds=0)
+        secret.get()
+        clock.now += 100
+        assert secret.get() == "key-2"
+
+    def test_background_refresh_before_expiry(self, clock):
+        source = Source()
+        secret = CachedSecret(source, "key", ttl_seconds=100, refresh_ahead_seconds=10)
+        secret.get()
+        clock.now += 95
+        # the cached value is returned immediately, the refresh runs in background
+        assert secret.get() in ("key-1", "key-2")
+        secret._refresh_thread.join()
+        assert secret.get() == "key-2"
+        assert source.calls == 2
+
+    def test_stale_value_on_refresh_error(self, clock):
+        source = Source()
+        secret = CachedSecret(source, "key", ttl_seconds=100, refresh_ahead_seconds=0)
+        secret.get()
+        source.fail = True
+        clock.now += 200
+        assert secret.get() == "key-1"
+
+    def test_first_fetch_error_raises(self, clock):
+        source = Source()
+        source.fail = True
+        secret = CachedSecret(source, "key")
+        with pytest.raises(ConnectionError):
+            secret.get()
+
+    def test_invalidate(self, clock):
+        source = Source()
+        secret = CachedSecret(source, "key", ttl_seconds=100)
+        secret.get()
+        secret.invalidate()
+        assert secret.get() == "key-2"
+
+
+class TestAzureKeyFromEnv:
+    """Tests for selecting the Azure key source from the environment."""
+
+    @pytest.fixture(autouse=True)
+    def clean_env(self, monkeypatch):
+        for name in (
+            "ANKIFY_AZURE_SECRET_ARN",
+            "ANKIFY_AZURE_SECRET_FILE",
+            "ANKIFY__PROVIDERS__AZURE__SUBSCRIPTION_KEY",
+            "ANKIFY_SECRET_TTL",
+        ):
+            monkeypatch.delenv(name, raising=False)
+
+    def test_no_source(self):
+        assert azure_subscription_key_from_env() is None
+
+    def test_env_variable(self, monkeypatch):
+        monkeypatch.setenv("ANKIFY__PROVIDERS__AZURE__SUBSCRIPTION_KEY", "env-key")
+        assert azure_subscription_key_from_env().get() == "env-key"
+
+    def test_file_reread_on_refresh(self, monkeypatch, tmp_path):
+        secret_file = tmp_path / "azure_key"
+        secret_file.write_text("file-key-1\n")
+        monkeypatch.setenv("ANKIFY_AZURE_SECRET_FILE", str(secret_file))
+        monkeypatch.setenv("ANKIFY__PROVIDERS__AZURE__SUBSCRIPTION_KEY", "env-key")
+        secret = azure_subscription_key_from_env()
+        assert secret.get() == "file-key-1"
+        secret_file.write_text("file-key-2\n")
+        secret.invalidate()
+        assert secret.get() == "file-key-2"
+
+    def test_secrets_manager_is_not_called_on_creation(self, monkeypatch, mocker):
+        monkeypatch.setenv("ANKIFY_AZURE_SECRET_ARN", "arn:aws:secretsmanager:x")
+        boto3 = pytest.importorskip("boto3")
+        client_factory = mocker.patch.object(boto3, "client")
+        client_factory.return_value.get_secret_value.return_value = {
+            "SecretString": "sm-key"
+        }
+        monkeypatch.setenv("ANKIFY_SECRET_TTL", "60")
+        secret = azure_subscription_key_from_env()
+        client_factory.assert_not_called()
+        assert secret.ttl_seconds == 60
+        assert secret.get() == "sm-key"
+        assert secret.get() == "sm-key"
+        client_factory.assert_called_once_with("secretsmanager")
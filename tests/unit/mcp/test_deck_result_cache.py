@@ -0,0 +1,147 @@
+"""Unit tests for the content-addressed deck result cache."""
+
+import os
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from ankify.mcp.deck_result_cache import DeckResultCache, safe_file_stem
+from ankify.mcp.s3_deck_uploader import MIN_PART_SIZE, S3DeckUploader
+from ankify.vocab_entry import VocabEntry
+
+
+botocore_exceptions = pytest.importorskip("botocore.exceptions")
+
+
+def _entries() -> list[VocabEntry]:
+    return [
+        VocabEntry("Hello", "Hallo", "english", "german"),
+        VocabEntry("World", "Welt", "english", "german"),
+    ]
+
+
+class FakeS3Client:
+    """In-memory stand-in for head_object/generate_presigned_url."""
+
+    def __init__(self):
+        self.last_modified: dict[str, datetime] = {}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.last_modified:
+            raise botocore_exceptions.ClientError(
+                {"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject"
+            )
+        return {"LastModified": self.last_modified[Key]}
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.test/{Params['Key']}?expires={ExpiresIn}"
+
+
+class TestFileName:
+    """Tests for DeckResultCache.file_name."""
+
+    def test_deterministic(self, tmp_path):
+        cache = DeckResultCache(tmp_path)
+        name = cache.file_name(_entries(), "forward_only", "My Deck")
+        assert name == cache.file_name(_entries(), "forward_only", "My Deck")
+        assert name.startswith("My_Deck-") and name.endswith(".apkg")
+
+    @pytest.mark.parametrize(
+        "note_type, deck_name",
+        [("forward_and_backward", "My Deck"), ("forward_only", "Other Deck")],
+    )
+    def test_arguments_change_name(self, tmp_path, note_type, deck_name):
+        cache = DeckResultCache(tmp_path)
+        base = cache.file_name(_entries(), "forward_only", "My Deck")
+        assert cache.file_name(_entries(), note_type, deck_name) != base
+
+    def test_entries_and_fingerprint_change_name(self, tmp_path):
+        base = DeckResultCache(tmp_path).file_name(_entries(), "forward_only", "D")
+        other_entries = _entries()[:1]
+        assert (
+            DeckResultCache(tmp_path).file_name(other_entries, "forward_only", "D")
+            != base
+        )
+        assert (
+            DeckResultCache(tmp_path, fingerprint="azure").file_name(
+                _entries(), "forward_only", "D"
+            )
+            != base
+        )
+
+    def test_safe_file_stem(self):
+        assert safe_file_stem("Deutsch  A1 / Woche 2") == "Deutsch_A1__Woche_2"
+        assert safe_file_stem("Русский") == "Ankify"
+
+
+class TestLocalLookup:
+    """Tests for lookups in the local decks directory."""
+
+    def test_miss_then_hit(self, tmp_path):
+        cache = DeckResultCache(tmp_path)
+        name = cache.file_name(_entries(), "forward_only", "D")
+        assert cache.get(name) is None
+        (tmp_path / name).write_bytes(b"apkg")
+        assert cache.get(name) == (tmp_path / name).resolve().as_uri()
+
+    def test_expired(self, tmp_path):
+        cache = DeckResultCache(tmp_path, ttl_seconds=60)
+        (tmp_path / "D.apkg").write_bytes(b"apkg")
+        old = time.time() - 120
+        os.utime(tmp_path / "D.apkg", (old, old))
+        assert cache.get("D.apkg") is None
+
+    def test_disabled(self, tmp_path):
+        cache = DeckResultCache(tmp_path, ttl_seconds=0)
+        (tmp_path / "D.apkg").write_bytes(b"apkg")
+        assert cache.get("D.apkg") is None
+
+    def test_shards(self, tmp_path):
+        cache = DeckResultCache(tmp_path)
+        assert cache.get_shards("D.apkg") is None
+        for name in ["D.part1.apkg", "D.part2.apkg"]:
+            (tmp_path / name).write_bytes(b"apkg")
+        assert cache.get_shards("D.apkg") == [
+            (tmp_path / "D.part1.apkg").resolve().as_uri(),
+            (tmp_path / "D.part2.apkg").resolve().as_uri(),
+        ]
+        (tmp_path / "D.apkg").write_bytes(b"apkg")
+        assert cache.get_shards("D.apkg") == [(tmp_path / "D.apkg").resolve().as_uri()]
+
+
+class TestS3Lookup:
+    """Tests for lookups in the S3 bucket."""
+
+    def _cache(self, tmp_path, client) -> DeckResultCache:
+        uploader = S3DeckUploader(
+            bucket="bucket",
+            region_name="eu-central-1",
+            presigned_url_expiry=3600,
+            part_size=MIN_PART_SIZE,
+            client=client,
+        )
+        return DeckResultCache(tmp_path, s3_uploader=uploader, ttl_seconds=86400)
+
+    def test_miss(self, tmp_path):
+        assert self._cache(tmp_path, FakeS3Client()).get("D.apkg") is None
+
+    def test_hit_is_resigned(self, tmp_path):
+        client = FakeS3Client()
+        client.last_modified["decks/D.apkg"] = datetime.now(timezone.utc)
+        url = self._cache(tmp_path, client).get("D.apkg")
+        assert url == "https://s3.test/decks/D.apkg?expires=3600"
+
+    def test_url_does_not_outlive_object(self, tmp_path):
+        client = FakeS3Client()
+        created = datetime.fromtimestamp(time.time() - 86400 + 600, timezone.utc)
+        client.last_modified["decks/D.apkg"] = created
+        url = self._cache(tmp_path, client).get("D.apkg")
+        expires = int(url.rsplit("=", 1)[1])
+        assert 0 < expires <= 600
+
+    def test_expired(self, tmp_path):
+        client = FakeS3Client()
+        created = datetime.fromtimestamp(time.time() - 90000, timezone.utc)
+        client.last_modified["decks/D.apkg"] = created
+        assert self._cache(tmp_path, client).get("D.apkg") is None
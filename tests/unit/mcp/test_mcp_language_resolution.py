@@ -1,5 +1,7 @@
 """Integration tests for MCP language resolution."""
 
+import pytest
+
 
 class TestLanguageAliasResolution:
     """Tests for _resolve_language_alias function."""
@@ -72,3 +74,24 @@ class TestLanguageAliasResolution:
         assert _resolve_language_alias("jp") == "japanese"
         assert _resolve_language_alias("kr") == "korean"
         assert _resolve_language_alias("cn") == "chinese"
+
+
+class TestVocabPromptCache:
+    """Tests for the rendered vocab prompt cache."""
+
+    def test_equivalent_arguments_share_the_rendered_prompt(self):
+        from ankify.mcp.ankify_mcp_server import _render_vocab_prompt, _vocab_prompt
+
+        _render_vocab_prompt.cache_clear()
+        first = _vocab_prompt("de", "EN", "fb")
+        second = _vocab_prompt("German", "english", "Forward and backward")
+
+        assert first is second
+        assert _render_vocab_prompt.cache_info().hits == 1
+        assert "german" in first
+
+    def test_invalid_note_type_is_not_cached(self):
+        from ankify.mcp.ankify_mcp_server import _vocab_prompt
+
+        with pytest.raises(ValueError):
+            _vocab_prompt("de", "en", "backward_only")
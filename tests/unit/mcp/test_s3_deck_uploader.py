@@ -0,0 +1,166 @@
+"""Unit tests for the streaming S3 deck uploader against an in-memory S3 stand-in."""
+
+import io
+import threading
+import zipfile
+
+import pytest
+
+from ankify.anki.anki_deck_creator import AnkiDeckCreator
+from ankify.mcp.s3_deck_uploader import MIN_PART_SIZE, S3DeckUploader
+from ankify.vocab_entry import VocabEntry
+
+
+class FakeS3Client:
+    """Minimal in-memory stand-in for the boto3 S3 client methods we use."""
+
+    def __init__(self, fail_on_part: int | None = None):
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self.uploads: dict[str, dict[int, bytes]] = {}
+        self.aborted: list[str] = []
+        self.put_calls = 0
+        self._fail_on_part = fail_on_part
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.put_calls += 1
+        self.objects[(Bucket, Key)] = Body
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self._fail_on_part:
+            raise ConnectionError("upload failed")
+        with self._lock:
+            self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        assert numbers == sorted(parts)
+        self.objects[(Bucket, Key)] = b"".join(parts[n] for n in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+        self.aborted.append(UploadId)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.test/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+def _uploader(client: FakeS3Client, max_concurrency: int = 2) -> S3DeckUploader:
+    return S3DeckUploader(
+        bucket="bucket",
+        region_name="eu-central-1",
+        part_size=MIN_PART_SIZE,
+        max_concurrency=max_concurrency,
+        client=client,
+    )
+
+
+class TestS3MultipartWriter:
+    """Tests for streaming multipart uploads."""
+
+    def test_small_object_uses_put_object(self):
+        client = FakeS3Client()
+        with _uploader(client).open_writer("decks/a.apkg") as stream:
+            stream.write(b"small deck")
+        assert client.objects[("bucket", "decks/a.apkg")] == b"small deck"
+        assert client.put_calls == 1
+        assert not client.uploads
+
+    def test_large_object_uses_multipart_in_order(self):
+        client = FakeS3Client()
+        data = bytes(range(256)) * (MIN_PART_SIZE // 256 * 3 + 100)
+        with _uploader(client).open_writer("decks/b.apkg") as stream:
+            # write in uneven chunks, as zipfile does
+            view = memoryview(data)
+            for start in range(0, len(data), 1_000_003):
+                stream.write(view[start : start + 1_000_003])
+        assert client.objects[("bucket", "decks/b.apkg")] == data
+        assert client.put_calls == 0
+
+    def test_exception_in_block_aborts(self):
+        client = FakeS3Client()
+        with pytest.raises(RuntimeError):
+            with _uploader(client).open_writer("decks/c.apkg") as stream:
+                stream.write(b"x" * (MIN_PART_SIZE + 1))
+                raise RuntimeError("packaging failed")
+        assert ("bucket", "decks/c.apkg") not in client.objects
+        assert client.aborted == ["upload-0"]
+
+    def test_exception_in_small_block_stores_nothing(self):
+        client = FakeS3Client()
+        with pytest.raises(RuntimeError):
+            with _uploader(client).open_writer("decks/d.apkg") as stream:
+                stream.write(b"partial")
+                raise RuntimeError("packaging failed")
+        assert client.objects == {}
+
+    def test_failed_part_aborts(self):
+        client = FakeS3Client(fail_on_part=2)
+        with pytest.raises(ConnectionError):
+            with _uploader(client, max_concurrency=1).open_writer("k") as stream:
+                stream.write(b"x" * (3 * MIN_PART_SIZE))
+        assert ("bucket", "k") not in client.objects
+        assert client.aborted == ["upload-0"]
+
+
+class TestS3DeckUploader:
+    """Tests for S3DeckUploader configuration."""
+
+    def test_from_env_without_bucket(self, monkeypatch):
+        monkeypatch.delenv("ANKIFY_S3_BUCKET", raising=False)
+        assert S3DeckUploader.from_env() is None
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("ANKIFY_S3_BUCKET", "decks-bucket")
+        monkeypatch.setenv("AWS_REGION", "us-east-1")
+        monkeypatch.setenv("ANKIFY_S3_UPLOAD_PART_SIZE_MB", "16")
+        monkeypatch.setenv("ANKIFY_S3_UPLOAD_CONCURRENCY", "8")
+        monkeypatch.delenv("ANKIFY_S3_ENDPOINT_URL", raising=False)
+        uploader = S3DeckUploader.from_env()
+        assert uploader.bucket == "decks-bucket"
+        assert uploader.part_size == 16 * 1024 * 1024
+        assert uploader.max_concurrency == 8
+        assert uploader.endpoint_url == "https://s3.us-east-1.amazonaws.com"
+
+    def test_part_size_below_s3_minimum_raises(self):
+        with pytest.raises(ValueError):
+            S3DeckUploader(bucket="b", region_name="r", part_size=1024)
+
+    def test_presigned_url(self):
+        uploader = _uploader(FakeS3Client())
+        assert uploader.presigned_url("decks/x.apkg") == (
+            "https://s3.test/bucket/decks/x.apkg?expires=86400"
+        )
+
+
+def test_anki_deck_streams_to_s3(tmp_path):
+    """A deck written into the uploader stream is a valid .apkg in the bucket."""
+    front_audio = tmp_path / "front.mp3"
+    back_audio = tmp_path / "back.mp3"
+    front_audio.write_bytes(b"front audio")
+    back_audio.write_bytes(b"back audio")
+    entries = [
+        VocabEntry("Hello", "Hallo", "english", "german", front_audio, back_audio)
+    ]
+    client = FakeS3Client()
+    creator = AnkiDeckCreator(
+        output_file=tmp_path / "unused.apkg",
+        deck_name="Test",
+        note_type="forward_only",
+    )
+
+    with _uploader(client).open_writer("decks/test.apkg") as stream:
+        creator.write_anki_deck(entries, output_stream=stream)
+
+    assert not (tmp_path / "unused.apkg").exists()
+    package = client.objects[("bucket", "decks/test.apkg")]
+    with zipfile.ZipFile(io.BytesIO(package)) as apkg:
+        assert set(apkg.namelist()) == {"collection.anki2", "media", "0", "1"}
+        assert {apkg.read("0"), apkg.read("1")} == {b"front audio", b"back audio"}
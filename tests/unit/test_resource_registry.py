@@ -0,0 +1,76 @@
+"""Unit tests for the prompt resource registry."""
+
+import os
+
+import pytest
+
+from ankify.llm import jinja2_prompt_formatter
+from ankify.llm.jinja2_prompt_formatter import PromptRenderer
+from ankify.resource_registry import (
+    language_aliases,
+    language_instructions,
+    packaged_text,
+    read_text_file,
+    resolve_language_alias,
+)
+
+
+class TestPackagedResources:
+    """Tests for resources packaged with ankify."""
+
+    def test_language_aliases_are_loaded_once(self):
+        assert language_aliases() is language_aliases()
+        assert resolve_language_alias("DE") == "german"
+        assert resolve_language_alias("klingon") == "klingon"
+
+    def test_language_aliases_are_read_only(self):
+        with pytest.raises(TypeError):
+            language_aliases()["xx"] = "yy"
+
+    def test_language_instructions(self):
+        assert language_instructions("unknown_language") == ""
+        assert language_instructions("German") == language_instructions("german")
+        assert language_instructions("german")
+
+    def test_only_packaged_languages_are_cached(self):
+        packaged_text.cache_clear()
+        for i in range(100):
+            language_instructions(f"language {i}")
+        assert packaged_text.cache_info().currsize == 0
+
+
+class TestReadTextFile:
+    """Tests for read_text_file."""
+
+    def test_reread_only_when_file_changes(self, tmp_path, mocker):
+        path = tmp_path / "prompt.md.j2"
+        path.write_text("first", encoding="utf-8")
+        assert read_text_file(path) == "first"
+
+        read_text = mocker.spy(type(path), "read_text")
+        assert read_text_file(path) == "first"
+        read_text.assert_not_called()
+
+        path.write_text("second version", encoding="utf-8")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert read_text_file(path) == "second version"
+
+    def test_missing_file(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            read_text_file(tmp_path / "missing.md.j2")
+
+
+class TestCompiledTemplates:
+    """Tests for template compilation in PromptRenderer."""
+
+    def test_template_is_compiled_once(self, mocker):
+        template = "Hello {{ name }} from the compiled template cache"
+        compile_ = mocker.spy(jinja2_prompt_formatter._environment, "from_string")
+        assert PromptRenderer.render(template, {"name": "A"}) == (
+            "Hello A from the compiled template cache"
+        )
+        assert PromptRenderer.render(template, {"name": "B"}) == (
+            "Hello B from the compiled template cache"
+        )
+        assert compile_.call_count == 1
@@ -0,0 +1,168 @@
+"""Unit tests for the local offline TTS provider."""
+
+import shutil
+import struct
+import sys
+import threading
+import time
+
+import pytest
+
+from ankify.settings import (
+    LanguageTTSConfig,
+    ProviderAccessSettings,
+    Text2SpeechSettings,
+    TTSAudioProfile,
+    TTSVoiceOptions,
+)
+from ankify.tts.default_tts_configuration import DefaultTTSConfigurator
+from ankify.tts.local_tts import LocalTTSSingleLanguageClient, _fix_wav_header
+from ankify.tts.tts_cost_tracker import LocalTTSCostTracker
+from ankify.tts.tts_manager import TTSManager, create_tts_single_language_client
+from ankify.vocab_entry import VocabEntry
+
+
+# Writes a WAV whose samples are the text and whose chunk sizes are unknown,
+# as espeak-ng does on a pipe; `fail` in the text makes it exit with an error.
+FAKE_ESPEAK = """
+import sys, time
+voice = sys.argv[sys.argv.index("-v") + 1]
+text = sys.stdin.buffer.read()
+time.sleep({delay})
+if b"fail" in text:
+    sys.stderr.write("cannot speak")
+    sys.exit(3)
+fmt = b"fmt " + (16).to_bytes(4, "little") + bytes(16)
+data = voice.encode() + b":" + text
+sys.stdout.buffer.write(
+    b"RIFF" + b"\\xff" * 4 + b"WAVE" + fmt + b"data" + b"\\xff" * 4 + data
+)
+"""
+
+FAKE_PIPER = """
+import sys
+path = sys.argv[sys.argv.index("--output_file") + 1]
+model = sys.argv[sys.argv.index("--model") + 1]
+with open(path, "wb") as f:
+    f.write(b"piper:" + model.encode() + b":" + sys.stdin.buffer.read())
+"""
+
+
+@pytest.fixture
+def fake_engines(tmp_path, monkeypatch):
+    """Only fake espeak-ng and piper are on PATH; `delay` slows espeak-ng down."""
+
+    def install(delay: float = 0.0) -> None:
+        for name, script in [
+            ("espeak-ng", FAKE_ESPEAK.format(delay=delay)),
+            ("piper", FAKE_PIPER),
+        ]:
+            path = tmp_path / "bin" / name
+            path.parent.mkdir(exist_ok=True)
+            path.write_text(f"#!{sys.executable}\n{script}")
+            path.chmod(0o755)
+        monkeypatch.setenv("PATH", str(tmp_path / "bin"))
+
+    install()
+    return install
+
+
+def _options(voice_id: str = "de", **kwargs) -> TTSVoiceOptions:
+    return TTSVoiceOptions(
+        voice_id=voice_id, audio=TTSAudioProfile(format="wav"), **kwargs
+    )
+
+
+class TestLocalTTSClient:
+    """Tests for LocalTTSSingleLanguageClient."""
+
+    def test_espeak_ng(self, fake_engines):
+        client = LocalTTSSingleLanguageClient(_options())
+        tracker = LocalTTSCostTracker()
+        entities = dict.fromkeys(["Hallo", "auf/für"])
+        client.synthesize(entities, "german", tracker)
+
+        audio = entities["Hallo"]
+        assert audio.endswith(b"data" + struct.pack("<I", 8) + b"de:Hallo")
+        assert struct.unpack_from("<I", audio, 4)[0] == len(audio) - 8
+        # separators are spoken as plain text
+        assert b"/" not in entities["auf/für"]
+        assert client.audio_file_extension == "wav"
+        assert sum(u.chars for u in tracker._usage.values()) == 12
+
+    def test_piper(self, fake_engines):
+        client = LocalTTSSingleLanguageClient(
+            _options("de_DE-thorsten-medium.onnx", engine="neural")
+        )
+        entities = dict.fromkeys(["Hallo"])
+        client.synthesize(entities, "german")
+        assert entities["Hallo"] == b"piper:de_DE-thorsten-medium.onnx:Hallo"
+
+    def test_engine_error(self, fake_engines):
+        client = LocalTTSSingleLanguageClient(_options())
+        with pytest.raises(RuntimeError, match="exit code 3: cannot speak"):
+            client.synthesize(dict.fromkeys(["fail"]), "german")
+
+    def test_missing_engine(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("PATH", str(tmp_path))
+        with pytest.raises(RuntimeError, match="requires 'espeak-ng' on PATH"):
+            LocalTTSSingleLanguageClient(_options())
+
+    def test_encoding_requires_ffmpeg(self, fake_engines):
+        with pytest.raises(RuntimeError, match="requires 'ffmpeg' on PATH"):
+            LocalTTSSingleLanguageClient(TTSVoiceOptions(voice_id="de"))
+
+    def test_unsupported_profile(self, fake_engines):
+        options = TTSVoiceOptions(
+            voice_id="de", audio=TTSAudioProfile(format="ogg_opus")
+        )
+        with pytest.raises(ValueError, match="not supported by provider 'local'"):
+            LocalTTSSingleLanguageClient(options)
+
+
+def test_fix_wav_header_leaves_other_audio_alone():
+    assert _fix_wav_header(b"ID3\x04 not a wav") == b"ID3\x04 not a wav"
+
+
+def test_defaults_and_factory(fake_engines):
+    config = DefaultTTSConfigurator(
+        "local", audio=TTSAudioProfile(format="wav")
+    ).get_config("German")
+    assert config == LanguageTTSConfig(
+        provider="local", options=_options("de", engine="standard")
+    )
+    client, provider = create_tts_single_language_client(
+        config, ProviderAccessSettings()
+    )
+    assert provider == "local"
+    assert isinstance(client, LocalTTSSingleLanguageClient)
+
+
+def test_tts_manager_runs_engines_in_parallel(tmp_path, fake_engines, monkeypatch):
+    fake_engines(delay=0.3)
+    monkeypatch.setattr(LocalTTSSingleLanguageClient, "max_concurrency", 4)
+    monkeypatch.setattr(
+        "ankify.tts.local_tts._engine_slots", threading.BoundedSemaphore(4)
+    )
+    settings = Text2SpeechSettings(
+        default_provider="local", audio=TTSAudioProfile(format="wav")
+    )
+    manager = TTSManager(settings, ProviderAccessSettings(), single_flight=None)
+    entries = [VocabEntry(word, word, "german", "german") for word in "abcd"]
+
+    started = time.monotonic()
+    manager.synthesize(entries, tmp_path)
+    # four engine runs at once rather than one after another
+    assert time.monotonic() - started < 4 * 0.3
+    assert entries[0].front_audio.suffix == ".wav"
+    assert entries[0].front_audio.read_bytes().endswith(b"de:a")
+
+
+@pytest.mark.skipif(shutil.which("espeak-ng") is None, reason="espeak-ng not installed")
+def test_real_espeak_ng():
+    client = LocalTTSSingleLanguageClient(_options("en-us"))
+    entities = dict.fromkeys(["Hello"])
+    client.synthesize(entities, "english")
+    audio = entities["Hello"]
+    assert audio[:4] == b"RIFF"
+    assert struct.unpack_from("<I", audio, 4)[0] == len(audio) - 8
@@ -0,0 +1,144 @@
+"""Unit tests for seeding the TTS audio cache from existing decks."""
+
+import pytest
+
+from ankify.anki.anki_deck_creator import AnkiDeckCreator
+from ankify.settings import LanguageTTSConfig, Text2SpeechSettings, TTSVoiceOptions
+from ankify.tts.tts_audio_cache import AudioCacheSeeder, find_packages
+from ankify.tts.tts_base import TTSSingleLanguageClient
+from ankify.tts.tts_manager import TTSManager
+from ankify.vocab_entry import VocabEntry
+
+
+class CountingClient(TTSSingleLanguageClient):
+    def __init__(self):
+        self.texts = []
+
+    def synthesize(self, entities, language, cost_tracker=None):
+        for text in entities:
+            self.texts.append(text)
+            entities[text] = f"audio of {text}".encode()
+
+
+@pytest.fixture
+def client(mocker):
+    client = CountingClient()
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client",
+        return_value=(client, "edge"),
+    )
+    return client
+
+
+def _manager(voice="de-DE-KatjaNeural"):
+    languages = {
+        language: LanguageTTSConfig(
+            provider="edge", options=TTSVoiceOptions(voice_id=voice)
+        )
+        for language in ["english", "german"]
+    }
+    return TTSManager(
+        tts_settings=Text2SpeechSettings(languages=languages),
+        provider_settings=None,
+        single_flight=None,
+    )
+
+
+def _vocab():
+    return [
+        VocabEntry("Hello", "Hallo", "English", "German"),
+        VocabEntry("World", "Welt", "English", "German"),
+    ]
+
+
+def _deck(tmp_path, name, vocab, manager=None, **creator_args):
+    audio_dir = tmp_path / f"{name}_audio"
+    audio_dir.mkdir()
+    (manager or _manager()).synthesize(vocab, audio_dir)
+    package = tmp_path / f"{name}.apkg"
+    AnkiDeckCreator(package, name, "forward_only", **creator_args).write_anki_deck(
+        vocab
+    )
+    return package
+
+
+class TestAudioCacheSeeder:
+    """Tests for AudioCacheSeeder."""
+
+    def test_seeded_clips_are_reused(self, client, tmp_path):
+        package = _deck(tmp_path, "deck", _vocab())
+        cache_dir = tmp_path / "cache"
+
+        result = AudioCacheSeeder(_manager(), cache_dir).seed([package])
+
+        assert result.imported == 4
+        assert result.failed_packages == []
+        client.texts.clear()
+        vocab = _vocab() + [VocabEntry("Cat", "Katze", "English", "German")]
+        _manager().synthesize(vocab, cache_dir)
+        assert sorted(client.texts) == ["Cat", "Katze"]
+        assert vocab[0].back_audio.read_bytes() == b"audio of Hallo"
+
+    def test_already_cached_and_duplicates(self, client, tmp_path):
+        first = _deck(tmp_path, "first", _vocab())
+        second = _deck(tmp_path, "second", _vocab()[:1])
+        cache_dir = tmp_path / "cache"
+
+        result = AudioCacheSeeder(_manager(), cache_dir).seed([first, second])
+        assert (result.imported, result.already_cached) == (4, 2)
+
+        result = AudioCacheSeeder(_manager(), cache_dir).seed([first])
+        assert (result.imported, result.already_cached) == (0, 4)
+
+    def test_clips_of_other_voices_are_skipped(self, client, tmp_path):
+        package = _deck(tmp_path, "deck", _vocab(), _manager(voice="other"))
+
+        result = AudioCacheSeeder(_manager(), tmp_path / "cache").seed([package])
+
+        assert (result.imported, result.skipped) == (0, 4)
+
+    def test_legacy_names_are_filed_under_the_current_voice(self, client, tmp_path):
+        vocab = _vocab()[:1]
+        for entry in vocab:
+            entry.front_audio = tmp_path / "front_0.mp3"
+            entry.back_audio = tmp_path / "back_0.mp3"
+            entry.front_audio.write_bytes(b"old audio")
+            entry.back_audio.write_bytes(b"old audio")
+        package = tmp_path / "legacy.apkg"
+        AnkiDeckCreator(package, "Legacy", "forward_only").write_anki_deck(vocab)
+        cache_dir = tmp_path / "cache"
+
+        assert AudioCacheSeeder(_manager(), cache_dir).seed([package]).imported == 2
+        name = _manager().audio_file_name("german", "Hallo")
+        assert (cache_dir / name).read_bytes() == b"old audio"
+
+    def test_anki21b(self, client, tmp_path):
+        pytest.importorskip("zstandard")
+        package = _deck(tmp_path, "deck", _vocab(), package_format="anki21b")
+        cache_dir = tmp_path / "cache"
+
+        assert AudioCacheSeeder(_manager(), cache_dir).seed([package]).imported == 4
+        name = _manager().audio_file_name("english", "World")
+        assert (cache_dir / name).read_bytes() == b"audio of World"
+
+    def test_broken_package(self, client, tmp_path):
+        broken = tmp_path / "broken.apkg"
+        broken.write_bytes(b"not a zip")
+        package = _deck(tmp_path, "deck", _vocab())
+
+        result = AudioCacheSeeder(_manager(), tmp_path / "cache").seed(
+            [broken, package]
+        )
+
+        assert result.failed_packages == [broken]
+        assert result.imported == 4
+
+    def test_find_packages(self, tmp_path):
+        (tmp_path / "a" / "b").mkdir(parents=True)
+        for name in ["a/1.apkg", "a/b/2.apkg", "a/notes.txt", "3.apkg"]:
+            (tmp_path / name).write_bytes(b"")
+        assert find_packages([tmp_path / "a", tmp_path / "3.apkg"]) == [
+            tmp_path / "a" / "1.apkg",
+            tmp_path / "a" / "b" / "2.apkg",
+            tmp_path / "3.apkg",
+        ]
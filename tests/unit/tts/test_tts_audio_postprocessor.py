@@ -0,0 +1,170 @@
+"""Unit tests for lossless MP3 post-processing."""
+
+import pytest
+
+from ankify.settings import Text2SpeechSettings, TTSPostprocessingOptions
+from ankify.tts.tts_audio_postprocessor import (
+    _write_bits,
+    normalize_loudness,
+    parse_mp3_frames,
+    postprocess_audio,
+    trim_silence,
+)
+from ankify.tts.tts_base import TTSSingleLanguageClient
+from ankify.tts.tts_manager import TTSManager
+from ankify.vocab_entry import VocabEntry
+
+
+# MPEG-2 Layer III, no CRC, 32 kbps, 16 kHz, mono: 144-byte frames of 36 ms
+_FRAME_HEADER = bytes([0xFF, 0xF3, 0x48, 0xC0])
+_FRAME_LENGTH = 144
+# main_data_begin (8 bits) + private_bits (1 bit), then the granule block
+_GRANULE_BIT_OFFSET = 32 + 9
+
+
+def _frame(part2_3_length: int, global_gain: int) -> bytes:
+    frame = bytearray(_FRAME_HEADER + bytes(_FRAME_LENGTH - 4))
+    _write_bits(frame, _GRANULE_BIT_OFFSET, 12, part2_3_length)
+    _write_bits(frame, _GRANULE_BIT_OFFSET + 21, 8, global_gain)
+    return bytes(frame)
+
+
+def _clip(leading: int, voiced_gains: list[int], trailing: int) -> bytes:
+    silence = _frame(0, 100)
+    voiced = b"".join(_frame(800, gain) for gain in voiced_gains)
+    return silence * leading + voiced + silence * trailing
+
+
+class TestParseMP3Frames:
+    """Tests for parse_mp3_frames."""
+
+    def test_parses_all_frames(self):
+        frames = parse_mp3_frames(_clip(3, [150, 160], 2))
+        assert len(frames) == 7
+        assert frames[0].sample_rate == 16000
+        assert frames[0].duration_ms == pytest.approx(36.0)
+
+    def test_reads_side_info(self):
+        frames = parse_mp3_frames(_clip(1, [150], 0))
+        assert frames[0].is_silent
+        assert not frames[1].is_silent
+        assert frames[1].granules[0].global_gain == 150
+        assert frames[1].granules[0].part2_3_length == 800
+
+    def test_skips_id3v2_tag(self):
+        tag = b"ID3\x04\x00\x00\x00\x00\x00\x05" + b"\x00" * 5
+        frames = parse_mp3_frames(tag + _clip(1, [150], 1))
+        assert len(frames) == 3
+        assert frames[0].offset == len(tag)
+
+    def test_stops_at_trailing_garbage(self):
+        frames = parse_mp3_frames(_clip(1, [150], 1) + b"TAG" + b"\x00" * 125)
+        assert len(frames) == 3
+
+    def test_not_mp3(self):
+        assert parse_mp3_frames(b"OggS\x00\x02" + b"\x00" * 100) == []
+
+
+class TestTrimSilence:
+    """Tests for trim_silence."""
+
+    def test_trims_to_padding(self):
+        data = _clip(10, [150, 160], 10)
+        trimmed, frames = trim_silence(data, parse_mp3_frames(data), padding_ms=72)
+        # 72 ms = 2 frames of padding on both sides
+        assert len(frames) == 6
+        assert len(trimmed) == 6 * _FRAME_LENGTH
+        assert parse_mp3_frames(trimmed) == frames
+
+    def test_padding_is_bounded_by_clip(self):
+        data = _clip(1, [150], 1)
+        trimmed, frames = trim_silence(data, parse_mp3_frames(data), padding_ms=500)
+        assert trimmed == data
+        assert len(frames) == 3
+
+    def test_all_silent_is_unchanged(self):
+        data = _clip(5, [], 0)
+        trimmed, _ = trim_silence(data, parse_mp3_frames(data), padding_ms=0)
+        assert trimmed == data
+
+    def test_drops_info_frame(self):
+        info = bytearray(_frame(0, 0))
+        # Info tag right after the 4-byte header and the 9-byte side info
+        info[13:17] = b"Info"
+        data = bytes(info) + _clip(0, [150], 0)
+        trimmed, frames = trim_silence(data, parse_mp3_frames(data), padding_ms=0)
+        assert len(frames) == 1
+        assert trimmed == _clip(0, [150], 0)
+
+
+class TestNormalizeLoudness:
+    """Tests for normalize_loudness."""
+
+    def test_shifts_voiced_granules_only(self):
+        data = _clip(1, [150, 150, 150], 1)
+        result = normalize_loudness(
+            data, parse_mp3_frames(data), target_gain=156, max_change_db=30
+        )
+        frames = parse_mp3_frames(result)
+        assert [f.granules[0].global_gain for f in frames] == [100, 156, 156, 156, 100]
+
+    def test_change_is_limited(self):
+        data = _clip(0, [150], 0)
+        result = normalize_loudness(
+            data, parse_mp3_frames(data), target_gain=200, max_change_db=6
+        )
+        # 6 dB = 4 steps of 1.5 dB
+        assert parse_mp3_frames(result)[0].granules[0].global_gain == 154
+
+    def test_at_target_is_unchanged(self):
+        data = _clip(0, [150], 0)
+        assert normalize_loudness(data, parse_mp3_frames(data), 150, 12) == data
+
+
+class TestPostprocessAudio:
+    """Tests for postprocess_audio."""
+
+    def test_non_mp3_is_unchanged(self):
+        audio = b"OggS" + b"\x00" * 100
+        options = TTSPostprocessingOptions(trim_silence=True, normalize_loudness=True)
+        assert postprocess_audio(audio, options) == audio
+
+    def test_both_steps(self):
+        options = TTSPostprocessingOptions(
+            trim_silence=True,
+            silence_padding_ms=0,
+            normalize_loudness=True,
+            target_global_gain=160,
+            max_gain_change_db=30,
+        )
+        result = postprocess_audio(_clip(4, [150], 4), options)
+        assert result == _clip(0, [160], 0)
+
+
+class _FakeClient(TTSSingleLanguageClient):
+    def synthesize(self, entities, language, cost_tracker=None):
+        for text in entities:
+            entities[text] = _clip(3, [150], 3)
+
+
+def test_tts_manager_postprocesses_audio(tmp_path, mocker):
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client",
+        return_value=(_FakeClient(), "edge"),
+    )
+    settings = Text2SpeechSettings(
+        postprocessing=TTSPostprocessingOptions(
+            trim_silence=True, silence_padding_ms=0, max_workers=2
+        )
+    )
+    manager = TTSManager(tts_settings=settings, provider_settings=None)
+    entries = [
+        VocabEntry("Hello", "Hallo", "english", "german"),
+        VocabEntry("World", "Welt", "english", "german"),
+    ]
+
+    manager.synthesize(entries, tmp_path)
+
+    for entry in entries:
+        assert entry.front_audio.read_bytes() == _clip(0, [150], 0)
+        assert entry.back_audio.read_bytes() == _clip(0, [150], 0)
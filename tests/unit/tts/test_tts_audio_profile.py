@@ -0,0 +1,118 @@
+"""Unit tests for TTS audio profile resolution."""
+
+import pytest
+
+from ankify.settings import TTSAudioProfile, TTSVoiceOptions
+from ankify.tts.audio_profile import AUDIO_FILE_EXTENSIONS, resolve_output_format
+from ankify.tts.aws_tts import AWSPollySingleLanguageClient
+from ankify.tts.azure_tts import AzureTTSSingleLanguageClient, _OutputFormat
+from ankify.tts.default_tts_configuration import DefaultTTSConfigurator
+from ankify.tts.edge_tts import EdgeTTSSingleLanguageClient
+
+
+SUPPORTED = [
+    ("mp3", 16000, 32, "mp3-16-32"),
+    ("mp3", 16000, 64, "mp3-16-64"),
+    ("mp3", 24000, 48, "mp3-24-48"),
+    ("ogg_opus", 16000, None, "opus-16"),
+]
+
+
+class TestResolveOutputFormat:
+    """Tests for resolve_output_format."""
+
+    def test_default_profile_picks_first_entry(self):
+        """Unset fields pick the first (smallest) entry of the format."""
+        assert resolve_output_format(TTSAudioProfile(), SUPPORTED, "x") == "mp3-16-32"
+
+    def test_sample_rate_only(self):
+        """Sample rate alone picks the lowest bitrate for that rate."""
+        profile = TTSAudioProfile(sample_rate=24000)
+        assert resolve_output_format(profile, SUPPORTED, "x") == "mp3-24-48"
+
+    def test_bitrate_only(self):
+        """Bitrate alone picks the first sample rate offering it."""
+        profile = TTSAudioProfile(bitrate_kbps=64)
+        assert resolve_output_format(profile, SUPPORTED, "x") == "mp3-16-64"
+
+    def test_format_without_selectable_bitrate(self):
+        """Formats without a selectable bitrate match when bitrate is unset."""
+        profile = TTSAudioProfile(format="ogg_opus")
+        assert resolve_output_format(profile, SUPPORTED, "x") == "opus-16"
+
+    def test_unsupported_raises(self):
+        """Unsupported combinations raise ValueError listing the options."""
+        profile = TTSAudioProfile(format="ogg_opus", bitrate_kbps=24)
+        with pytest.raises(ValueError, match="not supported by provider 'x'"):
+            resolve_output_format(profile, SUPPORTED, "x")
+
+    def test_file_extensions(self):
+        """Every audio format has a file extension."""
+        assert AUDIO_FILE_EXTENSIONS["mp3"] == "mp3"
+        assert AUDIO_FILE_EXTENSIONS["ogg_opus"] == "ogg"
+        assert AUDIO_FILE_EXTENSIONS["ogg_vorbis"] == "ogg"
+
+
+class TestProviderOutputFormats:
+    """Tests for provider-specific mappings of audio profiles."""
+
+    def test_azure_default_is_unchanged(self):
+        """Default profile keeps the historical Azure MP3 format."""
+        fmt = resolve_output_format(
+            TTSAudioProfile(),
+            AzureTTSSingleLanguageClient.supported_output_formats,
+            "azure",
+        )
+        assert fmt == _OutputFormat.Audio16Khz32KBitRateMonoMp3
+
+    def test_azure_ogg_opus(self):
+        fmt = resolve_output_format(
+            TTSAudioProfile(format="ogg_opus", sample_rate=24000),
+            AzureTTSSingleLanguageClient.supported_output_formats,
+            "azure",
+        )
+        assert fmt == _OutputFormat.Ogg24Khz16BitMonoOpus
+
+    def test_aws_default_sends_no_sample_rate(self):
+        """Without a sample rate, Polly uses its engine default."""
+        params = AWSPollySingleLanguageClient.output_params(TTSAudioProfile())
+        assert params == {"OutputFormat": "mp3"}
+
+    def test_aws_ogg_vorbis_with_sample_rate(self):
+        params = AWSPollySingleLanguageClient.output_params(
+            TTSAudioProfile(format="ogg_vorbis", sample_rate=16000)
+        )
+        assert params == {"OutputFormat": "ogg_vorbis", "SampleRate": "16000"}
+
+    def test_aws_bitrate_not_supported(self):
+        with pytest.raises(ValueError):
+            AWSPollySingleLanguageClient.output_params(
+                TTSAudioProfile(bitrate_kbps=32)
+            )
+
+    def test_edge_rejects_non_mp3(self):
+        """Edge TTS only streams MP3, other profiles fail at client creation."""
+        options = TTSVoiceOptions(
+            voice_id="en-US-AndrewNeural", audio=TTSAudioProfile(format="ogg_opus")
+        )
+        with pytest.raises(ValueError, match="edge"):
+            EdgeTTSSingleLanguageClient(options)
+
+    def test_edge_default_profile(self):
+        client = EdgeTTSSingleLanguageClient(
+            TTSVoiceOptions(voice_id="en-US-AndrewNeural")
+        )
+        assert client.audio_file_extension == "mp3"
+
+
+class TestDefaultConfiguratorAudio:
+    """Tests for applying an audio profile to default voices."""
+
+    def test_audio_profile_applied(self):
+        profile = TTSAudioProfile(format="ogg_opus", sample_rate=16000)
+        config = DefaultTTSConfigurator("azure", audio=profile).get_config("english")
+        assert config.options.audio == profile
+
+    def test_no_audio_profile_keeps_default(self):
+        config = DefaultTTSConfigurator("azure").get_config("english")
+        assert config.options.audio == TTSAudioProfile()
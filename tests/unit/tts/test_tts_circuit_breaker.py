@@ -0,0 +1,232 @@
+"""Unit tests for the TTS provider circuit breaker."""
+
+import pytest
+from tenacity import retry, retry_if_exception_type, stop_after_attempt
+
+from ankify.settings import (
+    LanguageTTSConfig,
+    Text2SpeechSettings,
+    TTSCircuitBreakerOptions,
+    TTSVoiceOptions,
+)
+from ankify.tts import tts_circuit_breaker
+from ankify.tts.tts_base import TTSSingleLanguageClient
+from ankify.tts.tts_circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+    circuit_guarded,
+)
+from ankify.tts.tts_hedging import HedgedTTSClient
+from ankify.tts.tts_manager import TTSManager
+
+
+OPTIONS = TTSCircuitBreakerOptions(
+    failure_rate_threshold=0.5, minimum_calls=4, window_size=4, open_seconds=10
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    class Clock:
+        now = 100.0
+
+    monkeypatch.setattr(tts_circuit_breaker.time, "monotonic", lambda: Clock.now)
+    return Clock
+
+
+class FlakyClient(TTSSingleLanguageClient):
+    """Provider client with a retried, circuit-guarded single call."""
+
+    def __init__(self, fail: bool):
+        self.fail = fail
+        self.provider_calls = 0
+
+    def synthesize(self, entities, language, cost_tracker=None):
+        for text in entities:
+            entities[text] = self._synthesize_single(text)
+
+    @retry(
+        reraise=True,
+        stop=stop_after_attempt(3),
+        retry=retry_if_exception_type(RuntimeError),
+    )
+    @circuit_guarded
+    def _synthesize_single(self, text: str) -> bytes:
+        self.provider_calls += 1
+        if self.fail:
+            raise RuntimeError("provider error")
+        return text.encode()
+
+
+class TestCircuitBreaker:
+    """Tests for CircuitBreaker state transitions."""
+
+    def _fail(self, breaker: CircuitBreaker, count: int) -> None:
+        for _ in range(count):
+            breaker.before_call()
+            breaker.record_failure()
+
+    def test_opens_at_failure_rate(self, clock):
+        breaker = CircuitBreaker("azure:westeurope", OPTIONS)
+        breaker.before_call()
+        breaker.record_success()
+        self._fail(breaker, 2)
+        assert breaker.state == "closed"  # below minimum_calls
+        self._fail(breaker, 1)
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_successes_keep_it_closed(self, clock):
+        breaker = CircuitBreaker("aws", OPTIONS)
+        for _ in range(10):
+            for _ in range(3):
+                breaker.before_call()
+                breaker.record_success()
+            self._fail(breaker, 1)
+        # failure rate 1/4 < 0.5
+        assert breaker.state == "closed"
+
+    def test_half_open_probe_success_closes(self, clock):
+        breaker = CircuitBreaker("aws", OPTIONS)
+        self._fail(breaker, 4)
+        clock.now += 10
+        assert breaker.state == "half_open"
+        breaker.before_call()
+        # only one probe at a time
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.snapshot()["recent_failures"] == 0
+
+    def test_half_open_probe_failure_reopens(self, clock):
+        breaker = CircuitBreaker("aws", OPTIONS)
+        self._fail(breaker, 4)
+        clock.now += 10
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        clock.now += 9
+        assert breaker.state == "open"
+
+    def test_registry_shares_breakers(self):
+        registry = CircuitBreakerRegistry()
+        assert registry.get("edge", OPTIONS) is registry.get("edge", OPTIONS)
+        assert registry.get("edge", OPTIONS) is not registry.get("aws", OPTIONS)
+        assert registry.snapshot()["edge"]["state"] == "closed"
+
+
+class TestCircuitGuarded:
+    """Tests for guarding retried provider calls."""
+
+    def test_open_circuit_stops_retries(self, clock):
+        client = FlakyClient(fail=True)
+        client.circuit_breaker = CircuitBreaker(
+            "azure", OPTIONS.model_copy(update={"minimum_calls": 2, "window_size": 2})
+        )
+        with pytest.raises(CircuitOpenError):
+            client.synthesize(dict.fromkeys(["a"]), "en")
+        # the third attempt was rejected without calling the provider
+        assert client.provider_calls == 2
+        with pytest.raises(CircuitOpenError):
+            client.synthesize(dict.fromkeys(["b"]), "en")
+        assert client.provider_calls == 2
+
+    def test_without_breaker(self):
+        client = FlakyClient(fail=False)
+        entities = dict.fromkeys(["a"])
+        client.synthesize(entities, "en")
+        assert entities == {"a": b"a"}
+
+
+def test_tts_manager_fails_over_to_default_provider(mocker, clock):
+    registry = CircuitBreakerRegistry()
+    mocker.patch("ankify.tts.tts_manager.circuit_breakers", registry)
+    clients = {"azure": FlakyClient(fail=True), "edge": FlakyClient(fail=False)}
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client",
+        side_effect=lambda config, providers: (
+            clients[config.provider],
+            config.provider,
+        ),
+    )
+    settings = Text2SpeechSettings(
+        default_provider="edge",
+        languages={
+            "english": LanguageTTSConfig(
+                provider="azure", options=TTSVoiceOptions(voice_id="en-US-AvaNeural")
+            )
+        },
+        circuit_breaker=TTSCircuitBreakerOptions(minimum_calls=3, window_size=3),
+    )
+    manager = TTSManager(settings, None, single_flight=None)
+    client = manager.tts_clients["english"]
+    assert isinstance(client, HedgedTTSClient)
+    assert [link.provider for link in client.links] == ["azure", "edge"]
+
+    entities = dict.fromkeys(["one", "two"])
+    client.synthesize(entities, "english")
+    assert entities == {"one": b"one", "two": b"two"}
+    # azure failed 3 times and its circuit opened: "two" did not call it
+    assert clients["azure"].provider_calls == 3
+    assert registry.snapshot()["azure"]["state"] == "open"
+
+
+def _azure_english(audio_format="mp3"):
+    return Text2SpeechSettings(
+        default_provider="edge",
+        languages={
+            "english": LanguageTTSConfig(
+                provider="azure",
+                options=TTSVoiceOptions(
+                    voice_id="en-US-AvaNeural", audio={"format": audio_format}
+                ),
+            )
+        },
+    )
+
+
+def test_no_failover_to_default_voice_of_another_audio_format(mocker):
+    created = []
+
+    def create(config, providers):
+        created.append(config.provider)
+        client = FlakyClient(fail=False)
+        client.audio_file_extension = "ogg" if config.provider == "azure" else "mp3"
+        return client, config.provider
+
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client", side_effect=create
+    )
+    manager = TTSManager(_azure_english("ogg_opus"), None, single_flight=None)
+
+    assert not isinstance(manager.tts_clients["english"], HedgedTTSClient)
+    assert manager.tts_clients["english"].audio_file_extension == "ogg"
+    assert created == ["azure"]
+
+
+def test_default_provider_failover_is_created_lazily(mocker, clock):
+    registry = CircuitBreakerRegistry()
+    mocker.patch("ankify.tts.tts_manager.circuit_breakers", registry)
+    created = []
+
+    def create(config, providers):
+        created.append(config.provider)
+        if config.provider == "edge":
+            raise ImportError("Edge TTS provider requires 'edge-tts'")
+        return FlakyClient(fail=True), config.provider
+
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client", side_effect=create
+    )
+    manager = TTSManager(_azure_english(), None, single_flight=None)
+    client = manager.tts_clients["english"]
+    assert [link.provider for link in client.links] == ["azure", "edge"]
+    assert created == ["azure"]
+
+    # the failover cannot be created: the synthesis fails, startup did not
+    with pytest.raises(RuntimeError, match="unavailable for failover"):
+        client.synthesize(dict.fromkeys(["one"]), "english")
+    assert created == ["azure", "edge"]
@@ -0,0 +1,155 @@
+"""Unit tests for the batch TTS client interface and the legacy client adapter."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ankify.settings import Text2SpeechSettings
+from ankify.tts.tts_base import (
+    SynthesisRequest,
+    SynthesisResult,
+    TTSClient,
+    TTSSingleLanguageClient,
+)
+from ankify.tts.tts_client_adapter import LegacyTTSClientAdapter, run_coroutine_sync
+from ankify.tts.tts_cost_tracker import EdgeTTSCostTracker
+from ankify.tts.tts_manager import TTSManager
+from ankify.vocab_entry import VocabEntry
+
+
+class LegacyClient(TTSSingleLanguageClient):
+    """Legacy client: sleeps `delays[text]`, fails on texts in `failing`."""
+
+    def __init__(self, delays=None, failing=()):
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def synthesize(self, entities, language, cost_tracker=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            for text in entities:
+                time.sleep(self.delays.get(text, 0))
+                if text in self.failing:
+                    raise ConnectionError(f"cannot synthesize {text}")
+                if cost_tracker:
+                    cost_tracker.track_usage(text, None, language)
+                entities[text] = f"{language}:{text}".encode()
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+async def _collect(
+    client: TTSClient, texts, cost_tracker=None
+) -> list[SynthesisResult]:
+    requests = [SynthesisRequest(text, "en") for text in texts]
+    return [r async for r in client.synthesize_stream(requests, cost_tracker)]
+
+
+class TestLegacyTTSClientAdapter:
+    """Tests for LegacyTTSClientAdapter."""
+
+    def test_results_and_timing(self):
+        tracker = EdgeTTSCostTracker()
+        adapter = LegacyTTSClientAdapter(LegacyClient())
+        results = asyncio.run(_collect(adapter, ["a", "b"], tracker))
+        assert {r.request.text: r.audio for r in results} == {
+            "a": b"en:a",
+            "b": b"en:b",
+        }
+        assert all(r.ok and r.elapsed_seconds >= 0 for r in results)
+        assert sum(u.chars for u in tracker._usage.values()) == 2
+
+    def test_per_item_errors(self):
+        adapter = LegacyTTSClientAdapter(LegacyClient(failing={"b"}))
+        results = asyncio.run(_collect(adapter, ["a", "b", "c"]))
+        by_text = {r.request.text: r for r in results}
+        assert by_text["a"].ok and by_text["c"].ok
+        assert isinstance(by_text["b"].error, ConnectionError)
+        assert by_text["b"].audio is None
+
+    def test_results_are_yielded_as_completed(self):
+        client = LegacyClient(delays={"slow": 0.2})
+        adapter = LegacyTTSClientAdapter(client, max_concurrency=2)
+        results = asyncio.run(_collect(adapter, ["slow", "fast"]))
+        assert [r.request.text for r in results] == ["fast", "slow"]
+
+    @pytest.mark.parametrize("max_concurrency", [1, 3])
+    def test_concurrency_is_bounded(self, max_concurrency):
+        client = LegacyClient(delays={t: 0.05 for t in "abcdef"})
+        adapter = LegacyTTSClientAdapter(client, max_concurrency=max_concurrency)
+        asyncio.run(_collect(adapter, list("abcdef")))
+        assert client.max_active == max_concurrency
+
+    def test_audio_file_extension(self):
+        client = LegacyClient()
+        client.audio_file_extension = "ogg"
+        assert LegacyTTSClientAdapter(client).audio_file_extension == "ogg"
+
+
+class TestRunCoroutineSync:
+    """Tests for run_coroutine_sync."""
+
+    def test_without_running_loop(self):
+        async def answer():
+            return 42
+
+        assert run_coroutine_sync(answer) == 42
+
+    def test_inside_running_loop(self):
+        async def inner():
+            return "inner"
+
+        async def outer():
+            return run_coroutine_sync(inner)
+
+        assert asyncio.run(outer()) == "inner"
+
+
+def _patch_client(mocker, client):
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client",
+        return_value=(client, "edge"),
+    )
+
+
+def test_tts_manager_runs_languages_concurrently(tmp_path, mocker):
+    client = LegacyClient(delays={"Hello": 0.2, "Hallo": 0.2})
+    _patch_client(mocker, client)
+    manager = TTSManager(Text2SpeechSettings(), None, single_flight=None)
+    entries = [VocabEntry("Hello", "Hallo", "english", "german")]
+
+    started = time.monotonic()
+    manager.synthesize(entries, tmp_path)
+
+    assert time.monotonic() - started < 0.35
+    assert entries[0].front_audio.read_bytes() == b"english:Hello"
+    assert entries[0].back_audio.read_bytes() == b"german:Hallo"
+
+
+def test_tts_manager_reports_failed_texts(tmp_path, mocker):
+    _patch_client(mocker, LegacyClient(failing={"World"}))
+    manager = TTSManager(Text2SpeechSettings(), None, single_flight=None)
+    entries = [
+        VocabEntry("Hello", "Hallo", "english", "german"),
+        VocabEntry("World", "Welt", "english", "german"),
+    ]
+    with pytest.raises(RuntimeError, match="1 of 2 texts in language 'english'"):
+        manager.synthesize(entries, tmp_path)
+
+
+def test_tts_manager_max_concurrency(tmp_path, mocker):
+    client = LegacyClient(delays={t: 0.05 for t in ["a", "b", "c", "d"]})
+    _patch_client(mocker, client)
+    settings = Text2SpeechSettings(max_concurrency=4)
+    manager = TTSManager(settings, None, single_flight=None)
+    entries = [VocabEntry(t, t, "english", "english") for t in "abcd"]
+    manager.synthesize(entries, tmp_path)
+    assert client.max_active == 4
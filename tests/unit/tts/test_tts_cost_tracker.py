@@ -7,6 +7,7 @@ from ankify.tts.tts_cost_tracker import (
     AWSPollyCostTracker,
     AzureTTSCostTracker,
     EdgeTTSCostTracker,
+    LocalTTSCostTracker,
     MultiProviderCostTracker,
     EngineUsage,
     LanguageUsageKey,
@@ -198,6 +199,13 @@ class TestMultiProviderCostTracker:
         tracker = multi.get_tracker("edge")
         assert isinstance(tracker, EdgeTTSCostTracker)
 
+    def test_get_tracker_local(self):
+        """get_tracker returns the free local tracker for 'local'."""
+        multi = MultiProviderCostTracker()
+        tracker = multi.get_tracker("local")
+        assert isinstance(tracker, LocalTTSCostTracker)
+        assert tracker.calculate_cost("test", "standard") == Decimal("0.00")
+
     def test_get_tracker_unknown_raises(self):
         """get_tracker raises for unknown provider."""
         multi = MultiProviderCostTracker()
@@ -0,0 +1,265 @@
+"""Unit tests for TTS fallback chains and hedged requests."""
+
+import pickle
+import threading
+import time
+
+import pytest
+
+from ankify.settings import (
+    LanguageTTSConfig,
+    Text2SpeechSettings,
+    TTSHedgingOptions,
+    TTSVoiceOptions,
+)
+from ankify.tts.tts_base import TTSSingleLanguageClient
+from ankify.tts.tts_cost_tracker import MultiProviderCostTracker
+from ankify.tts.tts_hedging import (
+    FallbackAudio,
+    HedgedTTSClient,
+    LatencyTracker,
+    TTSChainLink,
+)
+from ankify.tts.tts_manager import TTSManager
+from ankify.vocab_entry import VocabEntry
+
+
+class FakeClient(TTSSingleLanguageClient):
+    """Returns `<name>:<text>`; the first `stalls` calls sleep, `failures` calls raise."""
+
+    def __init__(self, name: str, stalls: int = 0, failures: int = 0, stall_s=1.0):
+        self.name = name
+        self.stalls = stalls
+        self.failures = failures
+        self.stall_s = stall_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def synthesize(self, entities, language, cost_tracker=None):
+        with self._lock:
+            self.calls += 1
+            stall = self.stalls > 0
+            fail = not stall and self.failures > 0
+            self.stalls -= stall
+            self.failures -= fail
+        if stall:
+            time.sleep(self.stall_s)
+        if fail:
+            raise ConnectionError(f"{self.name} unavailable")
+        for text in entities:
+            if cost_tracker:
+                cost_tracker.track_usage(text, None, language)
+            entities[text] = f"{self.name}:{text}".encode()
+
+
+def _hedged(*clients, hedging=None, latencies=None, costs=None):
+    costs = costs or MultiProviderCostTracker()
+    providers = ["edge", "azure", "aws"]
+    links = [
+        TTSChainLink(client, providers[i], f"voice-{i}")
+        for i, client in enumerate(clients)
+    ]
+    return HedgedTTSClient(
+        links,
+        hedging or TTSHedgingOptions(),
+        cost_tracker_for=costs.get_tracker,
+        latencies=latencies or LatencyTracker(),
+    )
+
+
+class TestLatencyTracker:
+    """Tests for LatencyTracker."""
+
+    def test_not_enough_samples(self):
+        tracker = LatencyTracker()
+        tracker.record("v", 1.0)
+        assert tracker.percentile("v", 95, min_samples=2) is None
+
+    def test_percentile(self):
+        tracker = LatencyTracker()
+        for i in range(1, 101):
+            tracker.record("v", i / 100)
+        assert tracker.percentile("v", 95, min_samples=10) == pytest.approx(0.95, abs=0.01)
+        assert tracker.percentile("v", 50, min_samples=10) == pytest.approx(0.5, abs=0.01)
+
+    def test_window(self):
+        tracker = LatencyTracker(window=10)
+        for _ in range(100):
+            tracker.record("v", 5.0)
+        for _ in range(10):
+            tracker.record("v", 0.1)
+        assert tracker.percentile("v", 99, min_samples=10) == pytest.approx(0.1)
+
+
+class TestFallbackChain:
+    """Tests for fallbacks on errors."""
+
+    def test_primary_used_when_healthy(self):
+        primary, fallback = FakeClient("a"), FakeClient("b")
+        entities = dict.fromkeys(["x", "y"])
+        _hedged(primary, fallback).synthesize(entities, "en")
+        assert entities == {"x": b"a:x", "y": b"a:y"}
+        assert fallback.calls == 0
+
+    def test_falls_back_on_error(self):
+        costs = MultiProviderCostTracker()
+        primary, fallback = FakeClient("a", failures=1), FakeClient("b")
+        entities = dict.fromkeys(["x", "y"])
+        _hedged(primary, fallback, costs=costs).synthesize(entities, "en")
+        assert entities == {"x": b"b:x", "y": b"a:y"}
+        # each request is tracked by its own provider
+        assert costs.get_tracker("azure")._usage
+        assert costs.get_tracker("edge")._usage
+        # fallback audio names its voice, also after pickling for post-processing
+        assert isinstance(entities["x"], FallbackAudio)
+        assert not isinstance(entities["y"], FallbackAudio)
+        assert pickle.loads(pickle.dumps(entities["x"])).voice_key == "voice-1"
+
+    def test_all_fail_raises_last_error(self):
+        client = _hedged(FakeClient("a", failures=1), FakeClient("b", failures=1))
+        with pytest.raises(ConnectionError, match="b unavailable"):
+            client.synthesize(dict.fromkeys(["x"]), "en")
+
+    def test_chain_must_share_file_format(self):
+        other = FakeClient("b")
+        other.audio_file_extension = "ogg"
+        with pytest.raises(ValueError, match="same audio"):
+            _hedged(FakeClient("a"), other)
+
+
+class TestHedging:
+    """Tests for hedged requests."""
+
+    def test_slow_request_is_hedged_to_next_voice(self):
+        primary, fallback = FakeClient("a", stalls=1), FakeClient("b")
+        hedging = TTSHedgingOptions(
+            enabled=True, initial_delay_seconds=0.05, min_delay_seconds=0
+        )
+        entities = dict.fromkeys(["x"])
+        started = time.monotonic()
+        _hedged(primary, fallback, hedging=hedging).synthesize(entities, "en")
+        assert time.monotonic() - started < 0.5
+        assert entities == {"x": b"b:x"}
+
+    def test_single_voice_hedges_to_itself(self):
+        client = FakeClient("a", stalls=1)
+        hedging = TTSHedgingOptions(
+            enabled=True, initial_delay_seconds=0.05, min_delay_seconds=0
+        )
+        entities = dict.fromkeys(["x"])
+        _hedged(client, hedging=hedging).synthesize(entities, "en")
+        assert entities == {"x": b"a:x"}
+        assert client.calls == 2
+
+    def test_delay_follows_observed_latency(self):
+        latencies = LatencyTracker()
+        for _ in range(20):
+            latencies.record("voice-0", 2.0)
+        primary = FakeClient("a", stalls=1, stall_s=0.3)
+        fallback = FakeClient("b")
+        hedging = TTSHedgingOptions(
+            enabled=True, initial_delay_seconds=0.01, min_samples=20
+        )
+        entities = dict.fromkeys(["x"])
+        _hedged(primary, fallback, hedging=hedging, latencies=latencies).synthesize(
+            entities, "en"
+        )
+        # 0.3s is well within the usual 2s of this voice: no hedge
+        assert entities == {"x": b"a:x"}
+        assert fallback.calls == 0
+
+    def test_disabled_never_hedges(self):
+        primary = FakeClient("a", stalls=1, stall_s=0.2)
+        fallback = FakeClient("b")
+        entities = dict.fromkeys(["x"])
+        _hedged(primary, fallback).synthesize(entities, "en")
+        assert entities == {"x": b"a:x"}
+        assert fallback.calls == 0
+
+
+def test_tts_manager_builds_default_fallback_chain(mocker):
+    clients = {"edge": FakeClient("edge", failures=1), "azure": FakeClient("azure")}
+
+    def create(config, providers):
+        return clients[config.provider], config.provider
+
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client", side_effect=create
+    )
+    settings = Text2SpeechSettings(
+        default_provider="edge", fallback_providers=["azure"]
+    )
+    manager = TTSManager(settings, None, single_flight=None)
+    language = manager._ensure_client_for_language("english")
+    entities = dict.fromkeys(["Hello"])
+    manager.tts_clients[language].synthesize(entities, language)
+    assert entities == {"Hello": b"azure:Hello"}
+
+
+def test_tts_manager_explicit_fallbacks(mocker):
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client",
+        side_effect=lambda config, providers: (
+            FakeClient(config.options.voice_id),
+            config.provider,
+        ),
+    )
+    settings = Text2SpeechSettings(
+        languages={
+            "english": LanguageTTSConfig(
+                provider="edge",
+                options=TTSVoiceOptions(voice_id="en-edge"),
+                fallbacks=[
+                    LanguageTTSConfig(
+                        provider="azure", options=TTSVoiceOptions(voice_id="en-azure")
+                    )
+                ],
+            )
+        }
+    )
+    manager = TTSManager(settings, None, single_flight=None)
+    client = manager.tts_clients["english"]
+    assert isinstance(client, HedgedTTSClient)
+    assert [link.provider for link in client.links] == ["edge", "azure"]
+    assert len(manager.client_voice_keys["english"].split("|")) == 2
+
+
+def test_tts_manager_without_chain_uses_plain_client(mocker):
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client",
+        return_value=(FakeClient("edge"), "edge"),
+    )
+    manager = TTSManager(Text2SpeechSettings(), None, single_flight=None)
+    language = manager._ensure_client_for_language("english")
+    assert isinstance(manager.tts_clients[language], FakeClient)
+
+
+def test_tts_manager_logs_hedging_stats_once_per_language(mocker, tmp_path, caplog):
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client",
+        side_effect=lambda config, providers: (
+            FakeClient(config.provider),
+            config.provider,
+        ),
+    )
+    settings = Text2SpeechSettings(
+        default_provider="edge", fallback_providers=["azure"]
+    )
+    manager = TTSManager(settings, None, single_flight=None)
+    vocab = [
+        VocabEntry(f"word {i}", f"Wort {i}", "english", "german") for i in range(8)
+    ]
+    vocab.append(VocabEntry("word 0", "Wort 8", "english", "german"))
+
+    with caplog.at_level("INFO", logger="ankify.tts"):
+        manager.synthesize(vocab, tmp_path)
+
+    summaries = [
+        record.getMessage()
+        for record in caplog.records
+        if "latency p50" in record.getMessage()
+    ]
+    assert sorted(summary.split(" texts, ")[0] for summary in summaries) == [
+        "Language 'english': 8",
+        "Language 'german': 9",
+    ]
@@ -0,0 +1,158 @@
+"""Unit tests for content-derived audio file names."""
+
+import pytest
+
+from ankify.settings import (
+    LanguageTTSConfig,
+    Text2SpeechSettings,
+    TTSPostprocessingOptions,
+    TTSVoiceOptions,
+)
+from ankify.tts.tts_base import TTSSingleLanguageClient
+from ankify.tts.tts_manager import TTSManager, media_file_name
+from ankify.vocab_entry import VocabEntry
+
+
+class CountingClient(TTSSingleLanguageClient):
+    def __init__(self):
+        self.texts = []
+
+    def synthesize(self, entities, language, cost_tracker=None):
+        for text in entities:
+            self.texts.append(text)
+            entities[text] = f"audio of {text}".encode()
+
+
+@pytest.fixture
+def client(mocker):
+    client = CountingClient()
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client",
+        return_value=(client, "edge"),
+    )
+    return client
+
+
+def _manager(voice="de-DE-KatjaNeural", **settings):
+    languages = {
+        language: LanguageTTSConfig(
+            provider="edge", options=TTSVoiceOptions(voice_id=voice)
+        )
+        for language in ["english", "german"]
+    }
+    return TTSManager(
+        tts_settings=Text2SpeechSettings(languages=languages, **settings),
+        provider_settings=None,
+        single_flight=None,
+    )
+
+
+def _entries():
+    return [VocabEntry("Hello", "Hallo", "english", "german")]
+
+
+class TestMediaFileNames:
+    """Tests for the audio file names of TTSManager.synthesize."""
+
+    def test_name_is_derived_from_voice_and_text(self):
+        name = media_file_name("edge:german:{}", "", "Hallo", "mp3")
+        assert name == media_file_name("edge:german:{}", "", "Hallo", "mp3")
+        assert name.startswith("ankify-") and name.endswith(".mp3")
+        assert name != media_file_name("edge:german:{}", "", "Hallo!", "mp3")
+        assert name != media_file_name("azure:german:{}", "", "Hallo", "mp3")
+
+    def test_same_clip_same_name_across_decks(self, client, tmp_path):
+        first, second = _entries(), _entries()
+        (tmp_path / "deck1").mkdir()
+        (tmp_path / "deck2").mkdir()
+        _manager().synthesize(first, tmp_path / "deck1")
+        _manager().synthesize(second, tmp_path / "deck2")
+        assert first[0].back_audio.name == second[0].back_audio.name
+        assert first[0].front_audio.name != first[0].back_audio.name
+
+    def test_voice_and_postprocessing_change_the_name(self, client, tmp_path):
+        names = set()
+        for manager in [
+            _manager(),
+            _manager(voice="de-DE-ConradNeural"),
+            _manager(postprocessing=TTSPostprocessingOptions(trim_silence=True)),
+        ]:
+            entries = _entries()
+            audio_dir = tmp_path / str(len(names))
+            audio_dir.mkdir()
+            manager.synthesize(entries, audio_dir)
+            names.add(entries[0].back_audio.name)
+        assert len(names) == 3
+
+    def test_existing_audio_is_reused(self, client, tmp_path):
+        _manager().synthesize(_entries(), tmp_path)
+        assert sorted(client.texts) == ["Hallo", "Hello"]
+
+        entries = _entries() + [VocabEntry("World", "Welt", "english", "german")]
+        _manager().synthesize(entries, tmp_path)
+        assert sorted(client.texts) == ["Hallo", "Hello", "Welt", "World"]
+        assert entries[0].back_audio.read_bytes() == b"audio of Hallo"
+        assert not list(tmp_path.glob("*.part"))
+
+    def test_existing_media_is_not_synthesized(self, client, tmp_path):
+        (tmp_path / "old").mkdir()
+        old = _entries()
+        _manager().synthesize(old, tmp_path / "old")
+
+        entries = _entries()
+        _manager().synthesize(
+            entries, tmp_path, existing_media={old[0].back_audio.name}
+        )
+        assert sorted(client.texts) == ["Hallo", "Hello", "Hello"]
+        assert entries[0].back_audio.name == old[0].back_audio.name
+        assert not entries[0].back_audio.exists()
+
+
+class FailingClient(TTSSingleLanguageClient):
+    def synthesize(self, entities, language, cost_tracker=None):
+        raise ConnectionError("primary voice unavailable")
+
+
+def test_fallback_audio_is_named_after_its_voice(mocker, tmp_path):
+    primary = {"client": FailingClient()}
+    fallback = CountingClient()
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client",
+        side_effect=lambda config, providers: (
+            primary["client"] if config.provider == "edge" else fallback,
+            config.provider,
+        ),
+    )
+
+    def manager():
+        languages = {
+            language: LanguageTTSConfig(
+                provider="edge",
+                options=TTSVoiceOptions(voice_id=f"{language}-edge"),
+                fallbacks=[
+                    LanguageTTSConfig(
+                        provider="azure",
+                        options=TTSVoiceOptions(voice_id=f"{language}-azure"),
+                    )
+                ],
+            )
+            for language in ["english", "german"]
+        }
+        return TTSManager(
+            tts_settings=Text2SpeechSettings(languages=languages),
+            provider_settings=None,
+            single_flight=None,
+        )
+
+    first = _entries()
+    manager().synthesize(first, tmp_path)
+    assert first[0].back_audio.read_bytes() == b"audio of Hallo"
+    assert first[0].back_audio.name != manager().audio_file_name("german", "Hallo")
+
+    # the primary voice is back: its clips are synthesized, not the fallback's reused
+    primary["client"] = CountingClient()
+    second = _entries()
+    manager().synthesize(second, tmp_path)
+    assert sorted(primary["client"].texts) == ["Hallo", "Hello"]
+    assert second[0].back_audio.name == manager().audio_file_name("german", "Hallo")
+    assert not list(tmp_path.glob("*.part"))
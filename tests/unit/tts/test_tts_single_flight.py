@@ -0,0 +1,120 @@
+"""Unit tests for coalescing of concurrent identical synthesis requests."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ankify.settings import Text2SpeechSettings
+from ankify.tts.tts_base import TTSSingleLanguageClient
+from ankify.tts.tts_manager import TTSManager
+from ankify.tts.tts_single_flight import SynthesisSingleFlight
+from ankify.vocab_entry import VocabEntry
+
+
+class BlockingClient(TTSSingleLanguageClient):
+    """Records requested texts; blocks inside synthesize until released."""
+
+    def __init__(self, fail: bool = False):
+        self.requested: list[str] = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def synthesize(self, entities, language, cost_tracker=None):
+        with self._lock:
+            self.requested.extend(entities)
+        self.started.set()
+        assert self.release.wait(timeout=5)
+        if self.fail:
+            self.fail = False
+            raise ConnectionError("provider unavailable")
+        for text in entities:
+            entities[text] = f"{language}:{text}".encode()
+
+
+class TestSynthesisSingleFlight:
+    """Tests for SynthesisSingleFlight."""
+
+    def _run_two(self, single_flight, client, first, second, voice_keys=("v", "v")):
+        first_entities = dict.fromkeys(first)
+        second_entities = dict.fromkeys(second)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            f1 = pool.submit(
+                single_flight.synthesize, client, voice_keys[0], first_entities, "en"
+            )
+            assert client.started.wait(timeout=5)
+            f2 = pool.submit(
+                single_flight.synthesize, client, voice_keys[1], second_entities, "en"
+            )
+            # give the second request time to register before releasing the first
+            threading.Event().wait(0.05)
+            client.release.set()
+            errors = [f.exception() for f in (f1, f2)]
+        return first_entities, second_entities, errors
+
+    def test_overlapping_texts_are_synthesized_once(self):
+        client = BlockingClient()
+        first, second, errors = self._run_two(
+            SynthesisSingleFlight(), client, ["a", "b"], ["b", "c"]
+        )
+        assert errors == [None, None]
+        assert sorted(client.requested) == ["a", "b", "c"]
+        assert first == {"a": b"en:a", "b": b"en:b"}
+        assert second == {"b": b"en:b", "c": b"en:c"}
+
+    def test_different_voices_are_not_coalesced(self):
+        client = BlockingClient()
+        _, _, errors = self._run_two(
+            SynthesisSingleFlight(), client, ["a"], ["a"], voice_keys=("v1", "v2")
+        )
+        assert errors == [None, None]
+        assert client.requested == ["a", "a"]
+
+    def test_waiter_retries_when_owner_fails(self):
+        client = BlockingClient(fail=True)
+        _, second, errors = self._run_two(SynthesisSingleFlight(), client, ["a"], ["a"])
+        assert isinstance(errors[0], ConnectionError)
+        assert errors[1] is None
+        assert second == {"a": b"en:a"}
+
+    def test_registry_is_empty_after_completion(self):
+        single_flight = SynthesisSingleFlight()
+        client = BlockingClient()
+        client.release.set()
+        single_flight.synthesize(client, "v", dict.fromkeys(["a"]), "en")
+        with pytest.raises(ConnectionError):
+            client.fail = True
+            single_flight.synthesize(client, "v", dict.fromkeys(["b"]), "en")
+        assert single_flight._in_flight == {}
+
+
+def test_tts_managers_share_in_flight_synthesis(tmp_path, mocker):
+    client = BlockingClient()
+    mocker.patch(
+        "ankify.tts.tts_manager.create_tts_single_language_client",
+        return_value=(client, "edge"),
+    )
+    single_flight = SynthesisSingleFlight()
+    managers = [
+        TTSManager(Text2SpeechSettings(), None, single_flight=single_flight)
+        for _ in range(2)
+    ]
+    entries = [
+        [VocabEntry("Hello", "Hallo", "english", "german")],
+        [VocabEntry("Hello", "Tschüss", "english", "german")],
+    ]
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [
+            pool.submit(manager.synthesize, manager_entries, tmp_path)
+            for manager, manager_entries in zip(managers, entries)
+        ]
+        threading.Event().wait(0.1)
+        client.release.set()
+        for future in futures:
+            future.result()
+
+    assert client.requested.count("Hello") == 1
+    assert entries[0][0].front_audio.read_bytes() == b"english:Hello"
+    assert entries[1][0].front_audio.read_bytes() == b"english:Hello"